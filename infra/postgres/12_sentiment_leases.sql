@@ -0,0 +1,5 @@
+-- Lease columns so multiple sentiment-engine replicas can claim disjoint
+-- batches (same idea as processing_queue.leased_at / lease_owner)
+ALTER TABLE articles
+ADD COLUMN IF NOT EXISTS sentiment_leased_at TIMESTAMPTZ,
+ADD COLUMN IF NOT EXISTS sentiment_lease_owner TEXT;
@@ -0,0 +1,21 @@
+-- Running least-squares sums per cluster for the incremental trend engine
+-- (sentiment-engine/trends.py). x = hours since origin_ts, y = cumulative
+-- article count; slope = (n*Σxy - Σx*Σy) / (n*Σx² - (Σx)²).
+CREATE TABLE IF NOT EXISTS cluster_trend_stats (
+    cluster_id BIGINT PRIMARY KEY REFERENCES clusters(id) ON DELETE CASCADE,
+    origin_ts DOUBLE PRECISION NOT NULL,
+    n BIGINT NOT NULL DEFAULT 0,
+    sum_x DOUBLE PRECISION NOT NULL DEFAULT 0,
+    sum_y DOUBLE PRECISION NOT NULL DEFAULT 0,
+    sum_xy DOUBLE PRECISION NOT NULL DEFAULT 0,
+    sum_xx DOUBLE PRECISION NOT NULL DEFAULT 0,
+    updated_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+-- Articles not yet folded into cluster_trend_stats
+ALTER TABLE articles
+ADD COLUMN IF NOT EXISTS trend_counted_at TIMESTAMPTZ;
+
+CREATE INDEX IF NOT EXISTS idx_articles_trend_pending
+ON articles(id)
+WHERE trend_counted_at IS NULL AND cluster_id IS NOT NULL;
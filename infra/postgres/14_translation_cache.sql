@@ -0,0 +1,11 @@
+-- Provider results for translation-engine, keyed by
+-- sha256(normalized text, source lang, target lang) so syndicated and
+-- repeated headlines are translated once
+CREATE TABLE IF NOT EXISTS translation_cache (
+    key BYTEA PRIMARY KEY,
+    source_lang VARCHAR(16) NOT NULL,
+    target_lang VARCHAR(16) NOT NULL,
+    translated TEXT NOT NULL,
+    detected_lang VARCHAR(16),
+    created_at TIMESTAMPTZ DEFAULT NOW()
+);
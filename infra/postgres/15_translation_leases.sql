@@ -0,0 +1,6 @@
+-- Lease columns for translation-engine: rows are claimed and committed up
+-- front, then translated with no row locks held (same scheme as
+-- sentiment_leased_at / sentiment_lease_owner)
+ALTER TABLE articles
+ADD COLUMN IF NOT EXISTS translation_leased_at TIMESTAMPTZ,
+ADD COLUMN IF NOT EXISTS translation_lease_owner TEXT;
@@ -0,0 +1,47 @@
+-- Wake idle workers when work arrives instead of having them poll. NOTIFY
+-- is delivered on commit and collapsed per transaction, so a bulk insert
+-- wakes each listener once. Workers still poll on a long timeout.
+
+-- sentiment-engine: articles still to be analyzed
+CREATE OR REPLACE FUNCTION notify_sentiment_work() RETURNS trigger AS $$
+BEGIN
+    IF NEW.sentiment_processed_at IS NULL THEN
+        PERFORM pg_notify('sentiment_work', '');
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS articles_sentiment_work ON articles;
+CREATE TRIGGER articles_sentiment_work
+AFTER INSERT OR UPDATE OF sentiment_processed_at ON articles
+FOR EACH ROW EXECUTE FUNCTION notify_sentiment_work();
+
+-- translation-engine: same condition as its claim query
+CREATE OR REPLACE FUNCTION notify_translation_work() RETURNS trigger AS $$
+BEGIN
+    IF NEW.original_title IS NULL AND (
+        NEW.language <> 'en'
+        OR (NEW.language IS NULL
+            AND EXISTS (SELECT 1 FROM sources s WHERE s.id = NEW.source_id AND s.should_translate))
+    ) THEN
+        PERFORM pg_notify('translation_work', '');
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS articles_translation_work ON articles;
+CREATE TRIGGER articles_translation_work
+AFTER INSERT OR UPDATE OF language, original_title ON articles
+FOR EACH ROW EXECUTE FUNCTION notify_translation_work();
+
+-- Partial indexes matching the claim queries, so finding pending rows no
+-- longer scans and sorts processed ones
+CREATE INDEX IF NOT EXISTS idx_articles_sentiment_pending
+ON articles(published_at DESC)
+WHERE sentiment_processed_at IS NULL;
+
+CREATE INDEX IF NOT EXISTS idx_articles_translation_pending
+ON articles(created_at DESC)
+WHERE original_title IS NULL AND (language IS NULL OR language <> 'en');
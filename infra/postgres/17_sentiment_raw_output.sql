@@ -0,0 +1,32 @@
+-- Raw sentiment model output, kept so scores can be recomputed without
+-- inference (sentiment-engine/scoring.py, recompute.py).
+-- sentiment_scoring_version is the formula the derived columns were
+-- computed with; NULL means they are stale.
+ALTER TABLE articles
+ADD COLUMN IF NOT EXISTS sentiment_model_label TEXT,
+ADD COLUMN IF NOT EXISTS sentiment_model_score FLOAT,
+ADD COLUMN IF NOT EXISTS sentiment_scoring_version INT;
+
+-- Virality depends on image quality: when it changes after analysis, mark
+-- the row stale and wake the worker to rescore it
+CREATE OR REPLACE FUNCTION mark_sentiment_stale() RETURNS trigger AS $$
+BEGIN
+    IF NEW.sentiment_model_label IS NOT NULL THEN
+        NEW.sentiment_scoring_version := NULL;
+        PERFORM pg_notify('sentiment_work', '');
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS articles_sentiment_stale ON articles;
+CREATE TRIGGER articles_sentiment_stale
+BEFORE UPDATE OF image_quality_score ON articles
+FOR EACH ROW
+WHEN (OLD.image_quality_score IS DISTINCT FROM NEW.image_quality_score)
+EXECUTE FUNCTION mark_sentiment_stale();
+
+-- What the worker rescores when idle
+CREATE INDEX IF NOT EXISTS idx_articles_sentiment_stale
+ON articles(id)
+WHERE sentiment_scoring_version IS NULL AND sentiment_model_label IS NOT NULL;
@@ -0,0 +1,69 @@
+"""Compare embedding response formats: serialization time and payload size.
+
+Encodes and decodes batches of 1, 32 and 256 random 384-dim vectors in every
+format /embed and /embed/batch can serve. No model is needed.
+
+    python bench/bench_formats.py [--repeat 200]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+import formats  # noqa: E402
+
+DIMENSIONS = 384
+BATCH_SIZES = (1, 32, 256)
+
+
+def json_roundtrip(vectors):
+    body = json.dumps({"vectors": vectors.tolist(), "dimensions": DIMENSIONS}).encode()
+    return body, lambda: np.asarray(json.loads(body)["vectors"], dtype=np.float32)
+
+
+def binary_roundtrip(fmt):
+    def run(vectors):
+        body, _ = formats.encode_vectors(vectors, fmt)
+        return body, lambda: formats.decode_vectors(body, fmt, DIMENSIONS)
+    return run
+
+
+def timed(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return (time.perf_counter() - start) / repeat * 1e6, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    variants = [("json", json_roundtrip)]
+    variants.append(("float32", binary_roundtrip(formats.FLOAT32)))
+    variants.append(("float16", binary_roundtrip(formats.FLOAT16)))
+    if formats.msgpack is not None:
+        variants.append(("msgpack", binary_roundtrip(formats.MSGPACK)))
+    else:
+        print("msgpack not installed, skipping")
+
+    rng = np.random.default_rng(0)
+    print(f"{'batch':>6} {'format':>8} {'bytes':>10} {'encode us':>11} {'decode us':>11} {'max abs err':>12}")
+    for batch in BATCH_SIZES:
+        vectors = rng.standard_normal((batch, DIMENSIONS)).astype(np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+
+        for name, roundtrip in variants:
+            encode_us, (body, decode) = timed(lambda: roundtrip(vectors), args.repeat)
+            decode_us, decoded = timed(decode, args.repeat)
+            err = float(np.max(np.abs(decoded.astype(np.float32) - vectors)))
+            print(f"{batch:>6} {name:>8} {len(body):>10} {encode_us:>11.1f} {decode_us:>11.1f} {err:>12.2e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""Load test a running embedding service: latency percentiles under concurrency.
+
+Each client thread keeps one HTTP connection open and sends requests back to
+back for --duration seconds. Texts are random word strings, so with
+--unique 1.0 every request misses the cache and hits the model. 503s (queue
+full, still warming) are counted separately from the latencies.
+
+    python bench/load_test.py [--url http://localhost:8000] [--endpoint /embed]
+        [--clients 1,8,32] [--duration 10] [--batch 16] [--unique 1.0]
+"""
+import argparse
+import http.client
+import json
+import random
+import threading
+import time
+from collections import Counter
+from urllib.parse import urlsplit
+
+WORDS = (
+    "market storm election budget court vaccine strike rally ceasefire inflation "
+    "flood minister merger drought protest summit tariff wildfire launch verdict "
+    "quarterly earnings outage heatwave transfer championship border satellite"
+).split()
+
+
+def make_text(rng):
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(6, 16)))
+
+
+def make_body(endpoint, args, rng, seen):
+    # Repeats an earlier text with probability 1 - unique (cache hit)
+    def text():
+        if seen and rng.random() > args.unique:
+            return rng.choice(seen)
+        t = make_text(rng)
+        seen.append(t)
+        return t
+
+    if endpoint == "/embed/batch":
+        return {"texts": [text() for _ in range(args.batch)]}
+    if endpoint == "/match":
+        return {"text": text(), "max_distance": 0.22, "window_hours": 24}
+    return {"text": text()}
+
+
+def client(args, stop_at, latencies, statuses, seed):
+    url = urlsplit(args.url)
+    rng = random.Random(seed)
+    seen = []
+    conn = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=30)
+    headers = {"Content-Type": "application/json"}
+    while time.monotonic() < stop_at:
+        body = json.dumps(make_body(args.endpoint, args, rng, seen))
+        start = time.perf_counter()
+        try:
+            conn.request("POST", args.endpoint, body, headers)
+            resp = conn.getresponse()
+            resp.read()
+        except (OSError, http.client.HTTPException):
+            statuses["error"] += 1
+            conn.close()
+            conn = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=30)
+            continue
+        elapsed = time.perf_counter() - start
+        statuses[resp.status] += 1
+        if resp.status == 200:
+            latencies.append(elapsed)
+        elif resp.status == 503:
+            time.sleep(float(resp.getheader("Retry-After") or 1))
+    conn.close()
+
+
+def percentile(values, q):
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def run_level(args, clients):
+    latencies = []
+    statuses = Counter()
+    stop_at = time.monotonic() + args.duration
+    threads = [
+        threading.Thread(target=client, args=(args, stop_at, latencies, statuses, args.seed + i))
+        for i in range(clients)
+    ]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    texts = args.batch if args.endpoint == "/embed/batch" else 1
+    ok = len(latencies)
+    print(f"{clients:>7} {ok / elapsed:>9.1f} {ok * texts / elapsed:>9.1f} "
+          f"{percentile(latencies, 0.5) * 1000:>8.1f} {percentile(latencies, 0.9) * 1000:>8.1f} "
+          f"{percentile(latencies, 0.99) * 1000:>8.1f} {statuses[503]:>6} {statuses['error']:>6}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Embedding service load test")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--endpoint", default="/embed", choices=["/embed", "/embed/batch", "/match"])
+    parser.add_argument("--clients", default="1,8,32", help="comma-separated concurrency levels")
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--batch", type=int, default=16, help="texts per /embed/batch request")
+    parser.add_argument("--unique", type=float, default=1.0, help="share of never-seen texts")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    print(f"{args.url}{args.endpoint}  {args.duration:g}s per level  unique={args.unique:g}")
+    print(f"{'clients':>7} {'req/s':>9} {'texts/s':>9} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} {'503':>6} {'errors':>6}")
+    for level in args.clients.split(","):
+        run_level(args, int(level))
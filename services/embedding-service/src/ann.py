@@ -0,0 +1,95 @@
+import threading
+import time
+
+import numpy as np
+
+INITIAL_CAPACITY = 1024
+
+
+# In-memory nearest-cluster index over the active window of cluster
+# centroids. Brute force over one contiguous float32 matrix: a few thousand
+# 384-d rows is a sub-millisecond matmul, cheaper than an HNSW probe plus a
+# network round trip. Distances are cosine distances, like pgvector's <=>.
+class ClusterIndex:
+    def __init__(self, dimensions, retention_seconds):
+        self.dimensions = dimensions
+        self.retention_seconds = retention_seconds
+        self._vectors = np.zeros((INITIAL_CAPACITY, dimensions), dtype=np.float32)
+        self._ids = np.zeros(INITIAL_CAPACITY, dtype=np.int64)
+        self._updated = np.zeros(INITIAL_CAPACITY, dtype=np.float64)
+        self._rows = {}  # cluster id -> row
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._count
+
+    def __contains__(self, cluster_id):
+        return cluster_id in self._rows
+
+    def _grow(self):
+        capacity = len(self._ids) * 2
+        for name in ("_vectors", "_ids", "_updated"):
+            old = getattr(self, name)
+            new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:self._count] = old[:self._count]
+            setattr(self, name, new)
+
+    def upsert(self, cluster_id, vector, updated_at=None):
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        if vector.shape != (self.dimensions,) or not norm:
+            return
+        updated_at = time.time() if updated_at is None else updated_at
+        with self._lock:
+            row = self._rows.get(cluster_id)
+            if row is None:
+                if self._count == len(self._ids):
+                    self._grow()
+                row = self._count
+                self._rows[cluster_id] = row
+                self._ids[row] = cluster_id
+                self._count += 1
+            self._vectors[row] = vector / norm
+            self._updated[row] = max(self._updated[row], updated_at)
+
+    def touch(self, cluster_id, updated_at=None):
+        # A cluster that gained an article stays in the window longer
+        with self._lock:
+            row = self._rows.get(cluster_id)
+            if row is not None:
+                self._updated[row] = max(self._updated[row], updated_at or time.time())
+            return row is not None
+
+    def search(self, vector, window_seconds=None):
+        # (cluster id, distance) of the nearest cluster updated within the
+        # window, or None if there is none
+        vector = np.asarray(vector, dtype=np.float32)
+        vector = vector / max(float(np.linalg.norm(vector)), 1e-12)
+        cutoff = time.time() - (window_seconds or self.retention_seconds)
+        with self._lock:
+            if not self._count:
+                return None
+            distances = 1.0 - self._vectors[:self._count] @ vector
+            distances[self._updated[:self._count] <= cutoff] = np.inf
+            row = int(np.argmin(distances))
+            if not np.isfinite(distances[row]):
+                return None
+            return int(self._ids[row]), float(distances[row])
+
+    def prune(self):
+        # Drop clusters that fell out of the retention window; keeps the
+        # matrix dense
+        cutoff = time.time() - self.retention_seconds
+        with self._lock:
+            keep = np.nonzero(self._updated[:self._count] > cutoff)[0]
+            if len(keep) == self._count:
+                return 0
+            removed = self._count - len(keep)
+            self._vectors[:len(keep)] = self._vectors[keep]
+            self._ids[:len(keep)] = self._ids[keep]
+            self._updated[:len(keep)] = self._updated[keep]
+            self._updated[len(keep):self._count] = 0
+            self._count = len(keep)
+            self._rows = {int(cluster_id): row for row, cluster_id in enumerate(self._ids[:self._count])}
+            return removed
@@ -0,0 +1,94 @@
+import json
+import logging
+import os
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_SEQ_LENGTH = 256
+
+
+# Full PyTorch model via sentence-transformers (the reference implementation)
+class TorchBackend:
+    name = "torch"
+
+    def __init__(self, model_name, threads=0):
+        # Imported here so the ONNX backend never pulls torch into memory
+        import torch
+        from sentence_transformers import SentenceTransformer
+
+        if threads:
+            torch.set_num_threads(threads)
+        self.model = SentenceTransformer(model_name, device="cpu")
+        self.cache_id = f"{model_name}:torch"
+        self.dimensions = self.model.get_sentence_embedding_dimension()
+
+    def encode(self, texts, batch_size=32):
+        return self.model.encode(texts, batch_size=batch_size).astype(np.float32, copy=False)
+
+
+# Exported transformer graph (see export_onnx.py) run with onnxruntime.
+# Reproduces the sentence-transformers head: mean pooling over the attention
+# mask followed by L2 normalization.
+class OnnxBackend:
+    name = "onnx"
+
+    def __init__(self, model_name, model_dir, model_file="model_quantized.onnx", threads=0):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        config_path = os.path.join(model_dir, "backend.json")
+        config = {}
+        if os.path.exists(config_path):
+            with open(config_path) as f:
+                config = json.load(f)
+
+        max_seq_length = config.get("max_seq_length", DEFAULT_MAX_SEQ_LENGTH)
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=max_seq_length)
+        self.tokenizer.enable_padding(pad_id=config.get("pad_token_id", 0), pad_token=config.get("pad_token", "[PAD]"))
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(
+            os.path.join(model_dir, model_file), options, providers=["CPUExecutionProvider"]
+        )
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        self.cache_id = f"{config.get('model_name', model_name)}:onnx:{model_file}"
+        self.dimensions = self.session.get_outputs()[0].shape[-1]
+
+    def encode(self, texts, batch_size=32):
+        if isinstance(texts, str):
+            return self.encode([texts], batch_size)[0]
+
+        chunks = []
+        for start in range(0, len(texts), batch_size):
+            encodings = self.tokenizer.encode_batch(texts[start:start + batch_size])
+            input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+            attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+            feeds = {"input_ids": input_ids, "attention_mask": attention_mask}
+            if "token_type_ids" in self.input_names:
+                feeds["token_type_ids"] = np.array([e.type_ids for e in encodings], dtype=np.int64)
+
+            token_embeddings = self.session.run(None, feeds)[0]
+
+            mask = attention_mask[..., None].astype(np.float32)
+            summed = (token_embeddings * mask).sum(axis=1)
+            pooled = summed / np.clip(mask.sum(axis=1), 1e-9, None)
+            norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+            chunks.append((pooled / np.clip(norms, 1e-12, None)).astype(np.float32))
+
+        return np.concatenate(chunks) if chunks else np.zeros((0, self.dimensions), dtype=np.float32)
+
+
+def load_backend(name, model_name, onnx_dir=None, onnx_file="model_quantized.onnx", threads=0):
+    if name == "torch":
+        return TorchBackend(model_name, threads)
+    if name == "onnx":
+        if not onnx_dir:
+            raise ValueError("EMBED_ONNX_DIR must point at an export from export_onnx.py")
+        return OnnxBackend(model_name, onnx_dir, onnx_file, threads)
+    raise ValueError(f"Unknown embedding backend: {name}")
@@ -0,0 +1,80 @@
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+# Merges concurrent single-text requests into one encode call.
+# A background task takes the first queued text, keeps collecting for up to
+# `max_wait_ms` (or until `max_batch_size` texts are pending) and encodes
+# them together. `on_batch(size, waited_seconds)`, if given, is told about
+# every batch and how long its oldest text sat in the queue. Batches are
+# encoded on `executor` (the loop's default executor if None).
+class MicroBatcher:
+    def __init__(self, encode_fn, max_batch_size=32, max_wait_ms=5.0, on_batch=None, executor=None):
+        self.encode_fn = encode_fn
+        self.on_batch = on_batch
+        self.executor = executor
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self._queue = None
+        self._task = None
+
+    def start(self):
+        if self._task is None:
+            self._queue = asyncio.Queue()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def submit(self, text):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        await self._queue.put((text, future, loop.time()))
+        return await future
+
+    async def _collect(self):
+        batch = [await self._queue.get()]
+        deadline = asyncio.get_running_loop().time() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - asyncio.get_running_loop().time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+
+        # Anything already queued rides along for free
+        while len(batch) < self.max_batch_size and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            texts = [text for text, _, _ in batch]
+            if self.on_batch:
+                self.on_batch(len(batch), loop.time() - batch[0][2])
+            try:
+                # Encoding is CPU-bound, keep it off the event loop
+                vectors = await loop.run_in_executor(self.executor, self.encode_fn, texts)
+            except Exception as e:
+                logger.error(f"Batch encode of {len(texts)} texts failed: {e}")
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            for (_, future, _), vector in zip(batch, vectors):
+                if not future.done():
+                    future.set_result(vector)
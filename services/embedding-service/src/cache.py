@@ -0,0 +1,132 @@
+import hashlib
+import logging
+import sqlite3
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Rough per-entry bookkeeping cost (dict slot, key bytes object, node) so the
+# byte budget tracks real memory rather than just vector payloads.
+ENTRY_OVERHEAD_BYTES = 160
+# How often (in inserts) the disk tier checks its row budget
+DISK_TRIM_EVERY = 1000
+
+
+# Two-tier embedding cache keyed by sha256(model name + normalized text).
+# Tier 1 is an in-process LRU bounded by bytes, tier 2 an optional SQLite file
+# that survives restarts. Vectors are stored as raw float32 bytes, so a hit
+# returns exactly what the model produced.
+class EmbeddingCache:
+    def __init__(self, model_name, max_bytes, disk_path=None, disk_max_entries=1_000_000):
+        self.model_name = model_name
+        self.max_bytes = max_bytes
+        self.disk_max_entries = disk_max_entries
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._disk = None
+        self._disk_inserts = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.disk_evictions = 0
+
+        if disk_path:
+            self._open_disk(disk_path)
+
+    def _open_disk(self, path):
+        try:
+            self._disk = sqlite3.connect(path, check_same_thread=False)
+            self._disk.execute("PRAGMA journal_mode=WAL")
+            self._disk.execute("PRAGMA synchronous=NORMAL")
+            self._disk.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings (key BLOB PRIMARY KEY, vector BLOB NOT NULL)"
+            )
+            self._disk.commit()
+            logger.info(f"Embedding cache disk tier at {path}")
+        except Exception as e:
+            logger.error(f"Failed to open embedding cache at {path}, running memory-only: {e}")
+            self._disk = None
+
+    def key(self, text):
+        return hashlib.sha256(f"{self.model_name}\0{text}".encode("utf-8")).digest()
+
+    def get(self, key):
+        with self._lock:
+            blob = self._entries.get(key)
+            if blob is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return np.frombuffer(blob, dtype=np.float32)
+
+            if self._disk is not None:
+                row = self._disk.execute(
+                    "SELECT vector FROM embeddings WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    blob = bytes(row[0])
+                    self._remember(key, blob)
+                    self.disk_hits += 1
+                    return np.frombuffer(blob, dtype=np.float32)
+
+            self.misses += 1
+            return None
+
+    def put(self, key, vector):
+        blob = np.ascontiguousarray(vector, dtype=np.float32).tobytes()
+        with self._lock:
+            self._remember(key, blob)
+            if self._disk is not None:
+                self._persist(key, blob)
+
+    def _remember(self, key, blob):
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            return
+        self._entries[key] = blob
+        self._bytes += len(blob) + len(key) + ENTRY_OVERHEAD_BYTES
+        while self._bytes > self.max_bytes and self._entries:
+            old_key, old_blob = self._entries.popitem(last=False)
+            self._bytes -= len(old_blob) + len(old_key) + ENTRY_OVERHEAD_BYTES
+            self.evictions += 1
+
+    def _persist(self, key, blob):
+        try:
+            self._disk.execute(
+                "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)", (key, blob)
+            )
+            self._disk.commit()
+            self._disk_inserts += 1
+            if self._disk_inserts % DISK_TRIM_EVERY == 0:
+                self._trim_disk()
+        except Exception as e:
+            logger.warning(f"Embedding cache disk write failed: {e}")
+
+    def _trim_disk(self):
+        # Oldest inserts have the lowest rowids
+        cur = self._disk.execute(
+            "DELETE FROM embeddings WHERE rowid <= (SELECT MAX(rowid) FROM embeddings) - ?",
+            (self.disk_max_entries,),
+        )
+        self._disk.commit()
+        self.disk_evictions += max(cur.rowcount, 0)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "disk_evictions": self.disk_evictions,
+                "hit_rate": round((self.hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+                "disk_enabled": self._disk is not None,
+            }
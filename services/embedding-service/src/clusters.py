@@ -0,0 +1,100 @@
+import logging
+import threading
+import time
+
+import numpy as np
+import psycopg2
+
+logger = logging.getLogger(__name__)
+
+# Clusters touched inside a transaction that commits after we poll carry an
+# older last_updated_at; look back this far each time so they aren't missed
+POLL_OVERLAP_SECONDS = 60
+
+WARM_SQL = """
+    SELECT id, embedding::text, extract(epoch FROM last_updated_at)
+    FROM clusters
+    WHERE last_updated_at > NOW() - make_interval(secs => %s)
+      AND embedding IS NOT NULL
+"""
+
+CHANGED_SQL = """
+    SELECT id, extract(epoch FROM last_updated_at)
+    FROM clusters
+    WHERE last_updated_at > to_timestamp(%s)
+      AND embedding IS NOT NULL
+"""
+
+EMBEDDINGS_SQL = "SELECT id, embedding::text FROM clusters WHERE id = ANY(%s)"
+
+
+def parse_vector(text):
+    # pgvector's text form: '[0.1,0.2,...]'
+    return np.array(text.strip("[]").split(","), dtype=np.float32)
+
+
+# Keeps a ClusterIndex in step with the clusters table: one bulk load of
+# the retention window, then a cheap poll of recently updated ids. Only
+# clusters the index hasn't seen cost an embedding fetch.
+class ClusterSync:
+    def __init__(self, index, dsn, interval=5.0):
+        self.index = index
+        self.dsn = dsn
+        self.interval = interval
+        self.ready = threading.Event()
+        self.newest = 0.0
+        self._conn = None
+
+    def start(self):
+        threading.Thread(target=self.run, name="cluster-sync", daemon=True).start()
+
+    def _connect(self):
+        if self._conn is None or self._conn.closed:
+            self._conn = psycopg2.connect(self.dsn)
+            self._conn.autocommit = True
+        return self._conn
+
+    def warm(self):
+        start = time.monotonic()
+        # Polls start at the window's edge even if it holds no clusters,
+        # rather than scanning the whole table from the epoch
+        self.newest = max(self.newest, time.time() - self.index.retention_seconds)
+        with self._connect().cursor() as cur:
+            cur.execute(WARM_SQL, (self.index.retention_seconds,))
+            for cluster_id, embedding, updated_at in cur:
+                self.index.upsert(cluster_id, parse_vector(embedding), float(updated_at))
+                self.newest = max(self.newest, float(updated_at))
+        logger.info(f"Cluster index warmed with {len(self.index)} clusters in {time.monotonic() - start:.2f}s")
+
+    def poll(self):
+        with self._connect().cursor() as cur:
+            cur.execute(CHANGED_SQL, (self.newest - POLL_OVERLAP_SECONDS,))
+            unknown = {}
+            for cluster_id, updated_at in cur.fetchall():
+                updated_at = float(updated_at)
+                self.newest = max(self.newest, updated_at)
+                if not self.index.touch(cluster_id, updated_at):
+                    unknown[cluster_id] = updated_at
+            if unknown:
+                cur.execute(EMBEDDINGS_SQL, (list(unknown),))
+                for cluster_id, embedding in cur:
+                    self.index.upsert(cluster_id, parse_vector(embedding), unknown[cluster_id])
+        return len(unknown)
+
+    def run(self):
+        while True:
+            try:
+                if self.ready.is_set():
+                    self.poll()
+                else:
+                    self.warm()
+                    self.ready.set()
+                removed = self.index.prune()
+                if removed:
+                    logger.info(f"Dropped {removed} clusters older than the retention window")
+            except psycopg2.Error as e:
+                logger.warning(f"Cluster sync failed: {e}")
+                if self._conn is not None:
+                    self._conn.close()
+                    self._conn = None
+            time.sleep(self.interval)
@@ -0,0 +1,41 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+
+class Saturated(Exception):
+    pass
+
+
+# Runs encodes on threads of its own, away from the event loop and from the
+# default executor FastAPI uses for sync endpoints. Work is admitted per
+# text: once `max_pending` texts are queued or encoding, callers are turned
+# away (503) instead of piling up latency behind the backlog. A request
+# bigger than the limit still gets in when nothing else is pending.
+class InferenceExecutor:
+    def __init__(self, workers=1, max_pending=1024):
+        self.pool = ThreadPoolExecutor(max_workers=max(workers, 1), thread_name_prefix="inference")
+        self.max_pending = max_pending
+        self.pending = 0
+        self.rejected = 0
+
+    @contextmanager
+    def admit(self, count=1):
+        # Only called on the event loop thread, so no lock
+        if self.pending and self.pending + count > self.max_pending:
+            self.rejected += 1
+            raise Saturated()
+        self.pending += count
+        try:
+            yield
+        finally:
+            self.pending -= count
+
+    async def run(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.pool, fn, *args)
+
+    def stats(self):
+        return {"pending": self.pending, "max_pending": self.max_pending, "rejected": self.rejected}
+
+    def shutdown(self):
+        self.pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,81 @@
+"""Export the sentence-transformers model to ONNX with dynamic int8 weights.
+
+Writes model.onnx (fp32), model_quantized.onnx (int8), tokenizer.json and
+backend.json into OUTPUT_DIR, ready for EMBED_BACKEND=onnx:
+
+    python export_onnx.py /models/all-MiniLM-L6-v2-onnx
+"""
+import argparse
+import json
+import os
+
+import torch
+from onnxruntime.quantization import QuantType, quantize_dynamic
+from sentence_transformers import SentenceTransformer
+
+DEFAULT_MODEL = "all-MiniLM-L6-v2"
+
+
+class TokenEmbeddings(torch.nn.Module):
+    # Exposes just last_hidden_state; pooling happens in OnnxBackend
+    def __init__(self, transformer):
+        super().__init__()
+        self.transformer = transformer
+
+    def forward(self, input_ids, attention_mask, token_type_ids):
+        return self.transformer(
+            input_ids=input_ids,
+            attention_mask=attention_mask,
+            token_type_ids=token_type_ids,
+        ).last_hidden_state
+
+
+def export(model_name, output_dir, opset):
+    os.makedirs(output_dir, exist_ok=True)
+    model = SentenceTransformer(model_name, device="cpu")
+    tokenizer = model.tokenizer
+    wrapper = TokenEmbeddings(model[0].auto_model).eval()
+
+    sample = tokenizer(["Warm up the exporter", "with two sentences"], padding=True, return_tensors="pt")
+    fp32_path = os.path.join(output_dir, "model.onnx")
+    int8_path = os.path.join(output_dir, "model_quantized.onnx")
+
+    dynamic = {0: "batch", 1: "sequence"}
+    with torch.no_grad():
+        torch.onnx.export(
+            wrapper,
+            (sample["input_ids"], sample["attention_mask"], sample["token_type_ids"]),
+            fp32_path,
+            input_names=["input_ids", "attention_mask", "token_type_ids"],
+            output_names=["last_hidden_state"],
+            dynamic_axes={
+                "input_ids": dynamic,
+                "attention_mask": dynamic,
+                "token_type_ids": dynamic,
+                "last_hidden_state": dynamic,
+            },
+            opset_version=opset,
+        )
+    print(f"Exported {fp32_path}")
+
+    quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8)
+    print(f"Quantized {int8_path}")
+
+    tokenizer.backend_tokenizer.save(os.path.join(output_dir, "tokenizer.json"))
+    with open(os.path.join(output_dir, "backend.json"), "w") as f:
+        json.dump({
+            "model_name": model_name,
+            "max_seq_length": model.max_seq_length,
+            "pad_token": tokenizer.pad_token,
+            "pad_token_id": tokenizer.pad_token_id,
+        }, f, indent=2)
+    print(f"Wrote tokenizer and backend config to {output_dir}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the embedding model to quantized ONNX")
+    parser.add_argument("output_dir")
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--opset", type=int, default=14)
+    args = parser.parse_args()
+    export(args.model, args.output_dir, args.opset)
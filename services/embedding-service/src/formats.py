@@ -0,0 +1,91 @@
+import numpy as np
+
+try:
+    import msgpack
+except ImportError:  # msgpack is optional, JSON and raw formats still work
+    msgpack = None
+
+JSON = "application/json"
+FLOAT32 = "application/x-float32"
+FLOAT16 = "application/x-float16"
+MSGPACK = "application/msgpack"
+
+# Media types callers may send in Accept, mapped to the format we serve
+ACCEPTED_TYPES = {
+    "application/json": JSON,
+    "application/x-float32": FLOAT32,
+    "application/octet-stream": FLOAT32,
+    "application/x-float16": FLOAT16,
+    "application/msgpack": MSGPACK,
+    "application/x-msgpack": MSGPACK,
+}
+
+# Little-endian regardless of host byte order
+DTYPES = {
+    FLOAT32: np.dtype("<f4"),
+    FLOAT16: np.dtype("<f2"),
+}
+
+
+def negotiate(accept):
+    # Pick the highest-q supported media type, JSON when nothing matches
+    if not accept:
+        return JSON
+
+    candidates = []
+    for position, part in enumerate(accept.split(",")):
+        fields = [f.strip() for f in part.split(";")]
+        media_type = fields[0].lower()
+        q = 1.0
+        for param in fields[1:]:
+            if param.startswith("q="):
+                try:
+                    q = float(param[2:])
+                except ValueError:
+                    q = 0.0
+        fmt = ACCEPTED_TYPES.get(media_type)
+        if fmt == MSGPACK and msgpack is None:
+            fmt = None
+        if fmt and q > 0:
+            candidates.append((-q, position, fmt))
+
+    if not candidates:
+        return JSON
+    return min(candidates)[2]
+
+
+def encode_vectors(vectors, fmt):
+    # `vectors` is a 2-D (count, dimensions) array.
+    # Returns (body, headers); JSON is left to the caller.
+    vectors = np.atleast_2d(vectors)
+    count, dimensions = vectors.shape
+    headers = {
+        "X-Embedding-Count": str(count),
+        "X-Embedding-Dimensions": str(dimensions),
+    }
+
+    if fmt in DTYPES:
+        dtype = DTYPES[fmt]
+        headers["X-Embedding-Dtype"] = dtype.name
+        return vectors.astype(dtype, copy=False).tobytes(), headers
+
+    if fmt == MSGPACK:
+        body = msgpack.packb({
+            "count": count,
+            "dimensions": dimensions,
+            "dtype": "<f4",
+            "data": vectors.astype("<f4", copy=False).tobytes(),
+        })
+        return body, headers
+
+    raise ValueError(f"Unsupported format: {fmt}")
+
+
+def decode_vectors(body, fmt, dimensions):
+    # Client-side inverse of encode_vectors (see bench/bench_formats.py)
+    if fmt in DTYPES:
+        return np.frombuffer(body, dtype=DTYPES[fmt]).reshape(-1, dimensions)
+    if fmt == MSGPACK:
+        payload = msgpack.unpackb(body)
+        return np.frombuffer(payload["data"], dtype=payload["dtype"]).reshape(-1, payload["dimensions"])
+    raise ValueError(f"Unsupported format: {fmt}")
@@ -0,0 +1,43 @@
+# Multi-worker serving: gunicorn -c gunicorn.conf.py main:app
+#
+# The master imports the app (preload_app) and with it loads the model once;
+# workers are forked from it and share the weights copy-on-write rather than
+# each holding a copy. Every worker then warms up, opens its own cache and
+# cluster index, and serves on a uvicorn event loop. Each worker's cluster
+# index syncs on its own, so a cluster registered through /clusters on one
+# worker reaches the others at their next sync.
+import gc
+import os
+import shutil
+
+bind = os.getenv("EMBED_BIND", "0.0.0.0:8000")
+workers = int(os.getenv("EMBED_WORKERS", "2"))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+
+os.environ.setdefault("EMBED_PRELOAD", "true")
+# Split the cores between workers instead of each one using all of them
+os.environ.setdefault("EMBED_INFERENCE_THREADS", str(max(1, len(os.sched_getaffinity(0)) // workers)))
+# Workers write their metrics here; a scrape of any worker sums them up
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", "/tmp/embedding-metrics")
+shutil.rmtree(os.environ["PROMETHEUS_MULTIPROC_DIR"], ignore_errors=True)
+os.makedirs(os.environ["PROMETHEUS_MULTIPROC_DIR"], exist_ok=True)
+
+# Python's gc.freeze recipe for fork servers: no collections in the master
+# (they leave freed holes in pages the workers share), everything it
+# allocated moved to the permanent generation right before fork (so worker
+# collections never write to those objects), collections back on in workers.
+gc.disable()
+
+
+def pre_fork(server, worker):
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    gc.enable()
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
@@ -1,51 +1,334 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Header, Response
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel
-from sentence_transformers import SentenceTransformer
+from ann import ClusterIndex
+from backends import load_backend
+from batcher import MicroBatcher
+from cache import EmbeddingCache
+from clusters import ClusterSync
+from executor import InferenceExecutor, Saturated
+from pycommon import metrics, profiler
+from pycommon.text import normalize_text
+import formats
+import numpy as np
+import threading
 import uvicorn
 import logging
+import time
+import os
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="Embedding Service")
+# Batching config
+# Concurrent /embed calls are merged into one forward pass of up to
+# EMBED_MAX_BATCH_SIZE texts, waiting at most EMBED_MAX_WAIT_MS for company.
+MAX_BATCH_SIZE = int(os.getenv("EMBED_MAX_BATCH_SIZE", "32"))
+MAX_WAIT_MS = float(os.getenv("EMBED_MAX_WAIT_MS", "5"))
+# Hard cap on the number of texts accepted by /embed/batch
+MAX_REQUEST_TEXTS = int(os.getenv("EMBED_MAX_REQUEST_TEXTS", "1024"))
+
+# Inference queue
+# Encodes run on EMBED_INFERENCE_WORKERS dedicated threads. Once
+# EMBED_MAX_QUEUE_TEXTS texts are waiting or encoding, requests get a 503
+# with Retry-After: EMBED_RETRY_AFTER_SECONDS rather than joining the queue.
+INFERENCE_WORKERS = int(os.getenv("EMBED_INFERENCE_WORKERS", "1"))
+MAX_QUEUE_TEXTS = int(os.getenv("EMBED_MAX_QUEUE_TEXTS", "1024"))
+RETRY_AFTER_SECONDS = int(os.getenv("EMBED_RETRY_AFTER_SECONDS", "1"))
+
+# Multi-worker serving (gunicorn.conf.py sets this): the gunicorn master
+# loads the model before forking so workers share it copy-on-write
+PRELOAD = os.getenv("EMBED_PRELOAD", "false").lower() == "true"
+
+# Cache config
+# In-process LRU budget, plus an optional SQLite file that survives restarts
+CACHE_MAX_MB = float(os.getenv("EMBED_CACHE_MAX_MB", "64"))
+CACHE_PATH = os.getenv("EMBED_CACHE_PATH")
+CACHE_DISK_MAX_ENTRIES = int(os.getenv("EMBED_CACHE_DISK_MAX_ENTRIES", "1000000"))
+
+# Backend config
+# "torch" runs the full sentence-transformers model, "onnx" an int8 export
+# produced by export_onnx.py (check drift with parity_check.py first)
+BACKEND = os.getenv("EMBED_BACKEND", "torch")
+ONNX_DIR = os.getenv("EMBED_ONNX_DIR")
+ONNX_FILE = os.getenv("EMBED_ONNX_FILE", "model_quantized.onnx")
+INFERENCE_THREADS = int(os.getenv("EMBED_INFERENCE_THREADS", "0"))
+# Warm-up passes per batch shape before /health reports ready
+WARMUP_ROUNDS = int(os.getenv("EMBED_WARMUP_ROUNDS", "3"))
+
+# Cluster matching config
+# /match searches an in-memory copy of the clusters updated in the last
+# EMBED_MATCH_RETENTION_HOURS (must cover the indexer's clustering window),
+# loaded from DATABASE_URL and refreshed every EMBED_MATCH_SYNC_SECONDS.
+DATABASE_URL = os.getenv("DATABASE_URL")
+MATCH_RETENTION_HOURS = float(os.getenv("EMBED_MATCH_RETENTION_HOURS", "48"))
+MATCH_SYNC_SECONDS = float(os.getenv("EMBED_MATCH_SYNC_SECONDS", "5"))
 
-# Load model at startup
 # "all-MiniLM-L6-v2" generates 384-dimensional vectors
 # It's fast and effective for clustering
-try:
-    logger.info("Loading SentenceTransformer model...")
-    model = SentenceTransformer('all-MiniLM-L6-v2')
+MODEL_NAME = 'all-MiniLM-L6-v2'
+DIMENSIONS = 384
+
+WARMUP_TEXTS = [
+    "Markets rally as inflation cools",
+    "Storm forces evacuations along the coast after days of heavy rain and flooding",
+    "Government unveils budget",
+    "Scientists report a breakthrough in battery technology that could double range",
+]
+
+app = FastAPI(title="Embedding Service")
+app.mount("/metrics", metrics.asgi_app())
+
+# Filled in by prepare_model() once the backend is loaded and warm
+backend = None
+cache = None
+readiness = {"status": "loading", "backend": BACKEND, "load_seconds": None}
+
+cluster_index = ClusterIndex(DIMENSIONS, retention_seconds=MATCH_RETENTION_HOURS * 3600)
+cluster_sync = ClusterSync(cluster_index, DATABASE_URL, interval=MATCH_SYNC_SECONDS) if DATABASE_URL else None
+
+def load_model():
+    global backend
+    logger.info(f"Loading {MODEL_NAME} with {BACKEND} backend...")
+    backend = load_backend(BACKEND, MODEL_NAME, ONNX_DIR, ONNX_FILE, INFERENCE_THREADS)
     logger.info("Model loaded successfully.")
-except Exception as e:
-    logger.error(f"Failed to load model: {e}")
-    raise e
+
+def open_cache():
+    # Per process: the SQLite connection must not cross a fork
+    global cache
+    cache = EmbeddingCache(
+        backend.cache_id,
+        max_bytes=int(CACHE_MAX_MB * 1024 * 1024),
+        disk_path=CACHE_PATH,
+        disk_max_entries=CACHE_DISK_MAX_ENTRIES,
+    )
+
+def warm_up():
+    # First calls pay for lazy allocations and kernel selection;
+    # take that hit before traffic does, for single and batched shapes
+    batch = (WARMUP_TEXTS * MAX_BATCH_SIZE)[:MAX_BATCH_SIZE]
+    for _ in range(WARMUP_ROUNDS):
+        backend.encode(WARMUP_TEXTS[:1], batch_size=MAX_BATCH_SIZE)
+        backend.encode(batch, batch_size=MAX_BATCH_SIZE)
+
+def prepare_model():
+    start = time.monotonic()
+    try:
+        if backend is None:
+            load_model()
+        open_cache()
+        readiness["status"] = "warming"
+        warm_up()
+    except Exception as e:
+        logger.error(f"Failed to load model: {e}")
+        # Same outcome as failing at import: let the orchestrator restart us
+        os._exit(1)
+    readiness["load_seconds"] = round(time.monotonic() - start, 2)
+    readiness["status"] = "ok"
+    logger.info(f"Model ready in {readiness['load_seconds']}s")
+
+# onnxruntime sessions own thread pools that don't survive a fork, so with
+# EMBED_BACKEND=onnx each worker loads its own (small, int8) model instead
+if PRELOAD and BACKEND == "torch":
+    load_model()
+
+def ensure_ready():
+    if readiness["status"] != "ok":
+        raise HTTPException(
+            status_code=503,
+            detail=f"Model is {readiness['status']}",
+            headers={"Retry-After": "5"},
+        )
+
+def encode_texts(texts):
+    # The normalized text is what gets encoded, so a cache hit is
+    # byte-identical to recomputing it
+    texts = [normalize_text(t) for t in texts]
+    keys = [cache.key(t) for t in texts]
+    vectors = [cache.get(k) for k in keys]
+    metrics.observe_batch('encode', len(texts))
+
+    # Encode each distinct miss once, even if repeated within the batch
+    pending = {}
+    for i, vector in enumerate(vectors):
+        if vector is None:
+            pending.setdefault(keys[i], texts[i])
+
+    metrics.count_cache('embedding', len(texts) - len(pending), len(pending))
+    if pending:
+        metrics.observe_batch('inference', len(pending))
+        with metrics.timed('inference'):
+            encoded = backend.encode(list(pending.values()), batch_size=MAX_BATCH_SIZE)
+        fresh = {}
+        for key, vector in zip(pending.keys(), encoded):
+            vector = vector.astype(np.float32, copy=False)
+            cache.put(key, vector)
+            fresh[key] = vector
+        vectors = [fresh[keys[i]] if v is None else v for i, v in enumerate(vectors)]
+
+    return np.stack(vectors)
+
+def observe_micro_batch(size, waited):
+    metrics.observe_batch('micro_batch', size)
+    metrics.observe_lag('embed', waited)
+
+inference = InferenceExecutor(workers=INFERENCE_WORKERS, max_pending=MAX_QUEUE_TEXTS)
+batcher = MicroBatcher(encode_texts, max_batch_size=MAX_BATCH_SIZE, max_wait_ms=MAX_WAIT_MS,
+                       on_batch=observe_micro_batch, executor=inference.pool)
 
 class TextRequest(BaseModel):
     text: str
 
+class BatchTextRequest(BaseModel):
+    texts: list[str]
+
+class MatchRequest(BaseModel):
+    text: str
+    max_distance: float = 0.22
+    window_hours: float = 24
+
+class ClusterRequest(BaseModel):
+    id: int
+    vector: list[float]
+
 class EmbeddingResponse(BaseModel):
     vector: list[float]
     dimensions: int
 
+class BatchEmbeddingResponse(BaseModel):
+    vectors: list[list[float]]
+    dimensions: int
+
+class MatchResponse(BaseModel):
+    cluster_id: int | None
+    distance: float | None
+    vector: list[float]
+    dimensions: int
+
+@app.on_event("startup")
+async def start_batcher():
+    profiler.install('embedding-service')
+    batcher.start()
+    if cluster_sync:
+        cluster_sync.start()
+    # Load and warm in the background so the port is up while /health says why we're not ready
+    threading.Thread(target=prepare_model, name="model-loader", daemon=True).start()
+
+@app.on_event("shutdown")
+async def stop_batcher():
+    await batcher.stop()
+    inference.shutdown()
+
+@app.exception_handler(Saturated)
+async def queue_full(request, exc):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Inference queue is full"},
+        headers={"Retry-After": str(RETRY_AFTER_SECONDS)},
+    )
+
 @app.get("/health")
 def health_check():
-    return {"status": "ok"}
+    if readiness["status"] != "ok":
+        return JSONResponse(status_code=503, content=readiness)
+    return {**readiness, "cache": cache.stats(), "queue": inference.stats(), "clusters": {
+        "size": len(cluster_index),
+        "ready": cluster_sync.ready.is_set() if cluster_sync else None,
+    }}
+
+def binary_response(vectors, fmt):
+    body, headers = formats.encode_vectors(vectors, fmt)
+    return Response(content=body, media_type=fmt, headers=headers)
 
+# Callers can ask for raw vectors instead of JSON via the Accept header:
+# application/x-float32 (or octet-stream), application/x-float16, application/msgpack
 @app.post("/embed", response_model=EmbeddingResponse)
-async def create_embedding(request: TextRequest):
-    if not request.text:
+async def create_embedding(request: TextRequest, accept: str | None = Header(default=None)):
+    # Empty once normalized (whitespace only) counts as empty
+    if not normalize_text(request.text):
         raise HTTPException(status_code=400, detail="Text cannot be empty")
-    
-    try:
-        # Encode
-        embedding = model.encode(request.text)
-        return {
-            "vector": embedding.tolist(),
-            "dimensions": len(embedding)
-        }
-    except Exception as e:
-        logger.error(f"Error generating embedding: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+    ensure_ready()
+
+    with inference.admit():
+        try:
+            # Encode (merged with any concurrent requests)
+            embedding = await batcher.submit(request.text)
+            fmt = formats.negotiate(accept)
+            if fmt != formats.JSON:
+                return binary_response(embedding, fmt)
+            return {
+                "vector": embedding.tolist(),
+                "dimensions": len(embedding)
+            }
+        except Exception as e:
+            logger.error(f"Error generating embedding: {e}")
+            raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/embed/batch", response_model=BatchEmbeddingResponse)
+async def create_embeddings(request: BatchTextRequest, accept: str | None = Header(default=None)):
+    if not request.texts:
+        raise HTTPException(status_code=400, detail="Texts cannot be empty")
+    if any(not normalize_text(text) for text in request.texts):
+        raise HTTPException(status_code=400, detail="Texts cannot contain empty strings")
+    if len(request.texts) > MAX_REQUEST_TEXTS:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_REQUEST_TEXTS} texts per request")
+    ensure_ready()
+
+    with inference.admit(len(request.texts)):
+        try:
+            # Already a batch, no point queueing it behind single requests
+            embeddings = await inference.run(encode_texts, request.texts)
+            fmt = formats.negotiate(accept)
+            if fmt != formats.JSON:
+                return binary_response(embeddings, fmt)
+            return {
+                "vectors": embeddings.tolist(),
+                "dimensions": embeddings.shape[1]
+            }
+        except Exception as e:
+            logger.error(f"Error generating batch embeddings: {e}")
+            raise HTTPException(status_code=500, detail=str(e))
+
+# Embeds the text and finds the nearest cluster updated within window_hours,
+# in one round trip. cluster_id is null unless that cluster is within
+# max_distance (cosine); the vector comes back either way so a caller that
+# opens a new cluster can store it.
+@app.post("/match", response_model=MatchResponse)
+async def match_cluster(request: MatchRequest):
+    if not normalize_text(request.text):
+        raise HTTPException(status_code=400, detail="Text cannot be empty")
+    ensure_ready()
+    # Without a sync source the index is empty, not authoritative: send
+    # callers to their own fallback rather than answer "no cluster"
+    if cluster_sync is None:
+        raise HTTPException(status_code=503, detail="Cluster matching needs DATABASE_URL")
+    if not cluster_sync.ready.is_set():
+        raise HTTPException(status_code=503, detail="Cluster index is loading", headers={"Retry-After": "5"})
+
+    with inference.admit():
+        try:
+            embedding = await batcher.submit(request.text)
+            with metrics.timed('cluster_search'):
+                best = cluster_index.search(embedding, window_seconds=request.window_hours * 3600)
+            cluster_id, distance = best if best else (None, None)
+            return {
+                "cluster_id": cluster_id if best and distance < request.max_distance else None,
+                "distance": distance,
+                "vector": embedding.tolist(),
+                "dimensions": len(embedding)
+            }
+        except Exception as e:
+            logger.error(f"Error matching cluster: {e}")
+            raise HTTPException(status_code=500, detail=str(e))
+
+# Lets the caller that just created a cluster make it matchable right away
+# rather than after the next sync
+@app.post("/clusters", status_code=204)
+def register_cluster(request: ClusterRequest):
+    if len(request.vector) != DIMENSIONS:
+        raise HTTPException(status_code=400, detail=f"Vector must have {DIMENSIONS} dimensions")
+    cluster_index.upsert(request.id, request.vector)
+    return Response(status_code=204)
 
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,102 @@
+"""Report cosine drift of the ONNX backend against the PyTorch reference.
+
+Embeds a fixed headline corpus with both backends and prints per-text cosine
+similarity plus how often the clustering decision (distance below the
+indexer's CLUSTER_DISTANCE_THRESHOLD) flips between them:
+
+    python parity_check.py /models/all-MiniLM-L6-v2-onnx [--min-cosine 0.99]
+
+Exits non-zero when the worst cosine falls below --min-cosine.
+"""
+import argparse
+import sys
+
+import numpy as np
+
+from backends import OnnxBackend, TorchBackend
+from export_onnx import DEFAULT_MODEL
+
+# Pairs of near-duplicate wire headlines mixed with unrelated stories, so the
+# cluster-decision check sees both sides of the threshold
+CORPUS = [
+    "Fed holds interest rates steady, signals two cuts later this year",
+    "Federal Reserve keeps rates unchanged and hints at cuts in 2024",
+    "Apple unveils new iPhone with upgraded camera and longer battery life",
+    "Apple's latest iPhone gets a better camera and bigger battery",
+    "Wildfire forces thousands to evacuate in northern California",
+    "Thousands flee as wildfire spreads across Northern California",
+    "Manchester City beat Arsenal 2-1 to go top of the Premier League",
+    "City edge Arsenal in title clash to move top of the table",
+    "Scientists discover new species of deep-sea octopus off Australia",
+    "Oil prices climb after OPEC+ agrees to extend production cuts",
+    "OPEC+ extends output cuts, sending crude prices higher",
+    "Earthquake of magnitude 6.8 strikes off the coast of Japan",
+    "Strong quake hits Japan coast; no tsunami warning issued",
+    "Parliament passes landmark climate bill after marathon debate",
+    "Tech giant announces layoffs affecting 10,000 employees",
+    "Company to cut 10,000 jobs in latest round of tech layoffs",
+    "New study links ultra-processed food to higher heart disease risk",
+    "Stock markets rally as inflation cools more than expected",
+    "Election results: incumbent concedes after tight race",
+    "Mars rover finds evidence of ancient river delta",
+    "Local bakery wins national award for sourdough bread",
+    "Government announces free school meals expansion",
+    "Champions League final to be played in Munich next year",
+    "Heatwave warning issued as temperatures set to hit 40C",
+    "UN warns of famine risk as conflict blocks aid deliveries",
+    "Electric car sales surge to record high in Europe",
+    "Bitcoin tops $70,000 for the first time",
+    "Startup raises $200 million to build small nuclear reactors",
+    "Hospital waiting lists hit record high, new figures show",
+    "Police arrest suspect after overnight shooting downtown",
+]
+
+
+def cosine_rows(a, b):
+    a = a / np.linalg.norm(a, axis=1, keepdims=True)
+    b = b / np.linalg.norm(b, axis=1, keepdims=True)
+    return (a * b).sum(axis=1)
+
+
+def pairwise_distance(vectors):
+    vectors = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    return 1.0 - vectors @ vectors.T
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ONNX vs PyTorch embedding parity")
+    parser.add_argument("onnx_dir")
+    parser.add_argument("--onnx-file", default="model_quantized.onnx")
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--threshold", type=float, default=0.22)
+    parser.add_argument("--min-cosine", type=float, default=0.99)
+    args = parser.parse_args()
+
+    reference = TorchBackend(args.model).encode(CORPUS)
+    candidate = OnnxBackend(args.model, args.onnx_dir, args.onnx_file).encode(CORPUS)
+
+    cos = cosine_rows(reference, candidate)
+    print(f"Texts: {len(CORPUS)}  backend: onnx/{args.onnx_file}")
+    print(f"Cosine vs torch: mean={cos.mean():.5f} min={cos.min():.5f} p5={np.percentile(cos, 5):.5f}")
+    worst = int(np.argmin(cos))
+    print(f"Worst text: {CORPUS[worst]!r} ({cos[worst]:.5f})")
+
+    ref_dist = pairwise_distance(reference)
+    cand_dist = pairwise_distance(candidate)
+    upper = np.triu_indices(len(CORPUS), k=1)
+    ref_match = ref_dist[upper] < args.threshold
+    cand_match = cand_dist[upper] < args.threshold
+    flips = int((ref_match != cand_match).sum())
+    drift = np.abs(ref_dist[upper] - cand_dist[upper])
+    print(f"Pair distance drift: mean={drift.mean():.5f} max={drift.max():.5f}")
+    print(f"Cluster decisions at threshold {args.threshold}: {flips} of {len(ref_match)} pairs flipped "
+          f"({int(ref_match.sum())} matching pairs in reference)")
+
+    if cos.min() < args.min_cosine:
+        print(f"FAIL: min cosine below {args.min_cosine}")
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""Per-candidate CPU time and peak memory: legacy vs decode-once ranker.
+
+Builds a fixture set of JPEG/PNG/WebP images (photo-like noise over gradients,
+small to 4000px) and runs each through scoring plus winner encoding, the way
+image-ranker treats a best candidate. "legacy" is the previous pipeline (PIL
+open for size, cv2.imdecode for blur, a fresh PIL decode for the WebP);
+"decode-once" is ranker.CandidateImage. Each (fixture, variant) runs in a fresh
+process so ru_maxrss reflects only that work.
+
+    python bench/bench_ranker.py [--repeat 5]
+"""
+import argparse
+import multiprocessing as mp
+import os
+import resource
+import sys
+import time
+from io import BytesIO
+
+import cv2
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+import ranker  # noqa: E402
+
+FIXTURES = [
+    ("jpeg-4000x3000", "JPEG", (4000, 3000)),
+    ("jpeg-2400x1350", "JPEG", (2400, 1350)),
+    ("jpeg-1200x675", "JPEG", (1200, 675)),
+    ("png-2000x1125", "PNG", (2000, 1125)),
+    ("webp-1600x900", "WEBP", (1600, 900)),
+]
+
+
+def make_fixture(fmt, size):
+    width, height = size
+    rng = np.random.default_rng(width * height)
+    y, x = np.mgrid[0:height, 0:width]
+    base = np.stack([x * 255 // width, y * 255 // height, (x + y) * 255 // (width + height)], axis=-1)
+    noise = rng.integers(-40, 40, size=(height, width, 3))
+    pixels = np.clip(base + noise, 0, 255).astype(np.uint8)
+    out = BytesIO()
+    Image.fromarray(pixels).save(out, format=fmt, quality=90)
+    return out.getvalue()
+
+
+def legacy_candidate(data):
+    img = Image.open(BytesIO(data))
+    width, height = img.size
+    gray = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_GRAYSCALE)
+    cv2.Laplacian(gray, cv2.CV_64F).var()
+
+    img = Image.open(BytesIO(data))
+    if img.width > 1200:
+        img = img.resize((1200, int(img.height * 1200 / img.width)), Image.Resampling.LANCZOS)
+    out = BytesIO()
+    img.save(out, format="WEBP", quality=85)
+    return out.getvalue()
+
+
+def decode_once_candidate(data):
+    image = ranker.CandidateImage(data)
+    ranker.score_candidate({}, image)
+    return ranker.process_image(image)
+
+
+VARIANTS = {"legacy": legacy_candidate, "decode-once": decode_once_candidate}
+
+
+def measure(variant, data, repeat, results):
+    fn = VARIANTS[variant]
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.process_time()
+    for _ in range(repeat):
+        fn(data)
+    cpu_ms = (time.process_time() - start) / repeat * 1000
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - baseline
+    results.put((cpu_ms, peak_kb))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ranker decode microbenchmark")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    # OpenCV threads would make CPU time depend on core count
+    cv2.setNumThreads(1)
+    ctx = mp.get_context("fork")
+
+    print(f"{'fixture':>16} {'variant':>12} {'cpu ms':>9} {'peak MiB':>9}")
+    for name, fmt, size in FIXTURES:
+        data = make_fixture(fmt, size)
+        for variant in VARIANTS:
+            results = ctx.Queue()
+            proc = ctx.Process(target=measure, args=(variant, data, args.repeat, results))
+            proc.start()
+            cpu_ms, peak_kb = results.get()
+            proc.join()
+            print(f"{name:>16} {variant:>12} {cpu_ms:>9.1f} {peak_kb / 1024:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
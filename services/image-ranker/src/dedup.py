@@ -0,0 +1,179 @@
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from ranker import MeasuredImage
+
+logger = logging.getLogger(__name__)
+
+HASH_BITS = 64
+# Near-duplicates must also agree on shape; dHash squashes every image to
+# 9x8, so a square crop of a landscape photo can otherwise collide
+MAX_ASPECT_DRIFT = 0.05
+# How often (in inserts) the disk store checks its row budget
+DISK_TRIM_EVERY = 1000
+
+
+def hamming(a, b):
+    return bin(a ^ b).count('1')
+
+
+def covers(size, other):
+    return size[0] >= other[0] and size[1] >= other[1]
+
+
+def _signed(h):
+    # SQLite integers are signed 64-bit
+    return h - (1 << HASH_BITS) if h >= 1 << (HASH_BITS - 1) else h
+
+
+# Perceptual-hash index of images already scored, so the same wire photo
+# under another URL or CDN size is neither rescored nor re-encoded. Only
+# entries at least as large as the candidate match: a thumbnail says
+# nothing about the blur of, and is no substitute for, a bigger copy.
+# Entries live in a bounded LRU; lookups within max_distance bits go through
+# max_distance + 1 exact-match bands (two hashes within k bits must agree on
+# at least one of k + 1 bands). An optional SQLite file keeps the index
+# across restarts and shares it between pool workers at startup.
+class PerceptualIndex:
+    def __init__(self, max_entries=50_000, max_distance=6, disk_path=None):
+        self.max_entries = max_entries
+        self.max_distance = max_distance
+        self._entries = OrderedDict()
+        self._bands = [{} for _ in range(max_distance + 1)]
+        self._masks = self._band_masks(max_distance + 1)
+        self._lock = threading.Lock()
+        self._disk = None
+        self._disk_inserts = 0
+
+        if disk_path:
+            self._open_disk(disk_path)
+
+    @staticmethod
+    def _band_masks(count):
+        masks = []
+        start = 0
+        for i in range(count):
+            width = HASH_BITS // count + (1 if i < HASH_BITS % count else 0)
+            masks.append(((1 << width) - 1) << start)
+            start += width
+        return masks
+
+    def _open_disk(self, path):
+        try:
+            self._disk = sqlite3.connect(path, check_same_thread=False)
+            self._disk.execute("PRAGMA journal_mode=WAL")
+            self._disk.execute("PRAGMA synchronous=NORMAL")
+            self._disk.execute(
+                "CREATE TABLE IF NOT EXISTS phashes ("
+                "hash INTEGER PRIMARY KEY, width INTEGER, height INTEGER, "
+                "blur REAL, key TEXT, seen_at REAL)"
+            )
+            self._disk.commit()
+            rows = self._disk.execute(
+                "SELECT hash, width, height, blur, key FROM phashes ORDER BY seen_at DESC LIMIT ?",
+                (self.max_entries,)
+            ).fetchall()
+            # Oldest first so the LRU order matches
+            for h, width, height, blur, key in reversed(rows):
+                self._insert(h & ((1 << HASH_BITS) - 1), MeasuredImage(width, height, blur, key))
+            logger.info(f"Perceptual index at {path} ({len(rows)} entries loaded)")
+        except Exception as e:
+            logger.error(f"Failed to open perceptual index at {path}, running memory-only: {e}")
+            self._disk = None
+
+    def _insert(self, h, entry):
+        if h not in self._entries:
+            for band, mask in zip(self._bands, self._masks):
+                band.setdefault(h & mask, set()).add(h)
+        self._entries[h] = entry
+        self._entries.move_to_end(h)
+        while len(self._entries) > self.max_entries:
+            old, _ = self._entries.popitem(last=False)
+            for band, mask in zip(self._bands, self._masks):
+                bucket = band.get(old & mask)
+                if bucket is not None:
+                    bucket.discard(old)
+                    if not bucket:
+                        del band[old & mask]
+
+    def _persist(self, h, entry):
+        if self._disk is None:
+            return
+        try:
+            width, height = entry.size
+            self._disk.execute(
+                "INSERT OR REPLACE INTO phashes (hash, width, height, blur, key, seen_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (_signed(h), width, height, entry.blur, entry.key, time.time())
+            )
+            self._disk.commit()
+            self._disk_inserts += 1
+            if self._disk_inserts % DISK_TRIM_EVERY == 0:
+                self._disk.execute(
+                    "DELETE FROM phashes WHERE hash NOT IN "
+                    "(SELECT hash FROM phashes ORDER BY seen_at DESC LIMIT ?)",
+                    (self.max_entries,)
+                )
+                self._disk.commit()
+        except Exception as e:
+            logger.warning(f"Perceptual index write failed: {e}")
+
+    def lookup(self, image):
+        # Closest remembered entry within max_distance of the candidate, no
+        # smaller than it and of the same shape
+        h = image.phash
+        if h is None:
+            return None
+        width, height = image.size
+        aspect = width / height if height else 0
+
+        with self._lock:
+            best, best_distance = None, self.max_distance + 1
+            seen = set()
+            for band, mask in zip(self._bands, self._masks):
+                for other in band.get(h & mask, ()):
+                    if other in seen:
+                        continue
+                    seen.add(other)
+                    distance = hamming(h, other)
+                    if distance >= best_distance:
+                        continue
+                    w, ht = self._entries[other].size
+                    if not covers((w, ht), (width, height)):
+                        continue
+                    if abs(w / ht - aspect) <= MAX_ASPECT_DRIFT * aspect:
+                        best, best_distance = other, distance
+
+            if best is None:
+                return None
+            self._entries.move_to_end(best)
+            return self._entries[best]
+
+    def record(self, image, key=None, blur=None):
+        # Remember a freshly scored candidate (and its object key once
+        # stored); returns the entry, or None for unreadable images and
+        # those rejected on shape, whose blur was never measured
+        h = image.phash
+        if h is None:
+            return None
+        if blur is None and image.scored_blur is None:
+            return None
+        try:
+            entry = image.measure(blur)
+        except Exception:
+            return None
+        with self._lock:
+            previous = self._entries.get(h)
+            if key is None and previous is not None and previous.key and covers(previous.size, entry.size):
+                # Already stored at this size or larger: the index keeps that
+                # entry, the caller gets this copy's own measurements
+                self._entries.move_to_end(h)
+                return entry
+            # A larger copy than the stored one goes in without a key, so it
+            # is encoded and stored itself when it wins
+            entry.key = key
+            self._insert(h, entry)
+            self._persist(h, entry)
+        return entry
@@ -0,0 +1,52 @@
+from collections import deque
+
+from confluent_kafka import TopicPartition
+
+
+# Tracks consumed offsets until the enriched message derived from each one is
+# delivered. The commit point of a partition only advances past an offset
+# once it and everything before it is done, so a crash replays (never skips)
+# undelivered articles: at-least-once without flushing per message.
+class OffsetTracker:
+    def __init__(self):
+        self._partitions = {}
+        self._dirty = set()
+
+    def track(self, topic, partition, offset):
+        entries, index = self._partitions.setdefault((topic, partition), (deque(), {}))
+        entry = [offset, False]
+        entries.append(entry)
+        index[offset] = entry
+
+    def done(self, topic, partition, offset):
+        state = self._partitions.get((topic, partition))
+        if state is None:
+            return  # Partition was revoked meanwhile
+        entry = state[1].get(offset)
+        if entry is not None:
+            entry[1] = True
+            self._dirty.add((topic, partition))
+
+    def pending(self):
+        return sum(len(entries) for entries, _ in self._partitions.values())
+
+    def committable(self):
+        # TopicPartitions whose commit point moved since the last call
+        offsets = []
+        for key in self._dirty:
+            entries, index = self._partitions.get(key, (None, None))
+            if not entries:
+                continue
+            last = None
+            while entries and entries[0][1]:
+                last = entries.popleft()[0]
+                del index[last]
+            if last is not None:
+                offsets.append(TopicPartition(key[0], key[1], last + 1))
+        self._dirty.clear()
+        return offsets
+
+    def forget(self, partitions):
+        for tp in partitions:
+            self._partitions.pop((tp.topic, tp.partition), None)
+            self._dirty.discard((tp.topic, tp.partition))
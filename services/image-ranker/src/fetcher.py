@@ -0,0 +1,117 @@
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, wait
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from pycommon import metrics
+from ranker import DEADLINE, fetch_image
+from urlcache import HOST_FAILURES, URL_FAILURES
+
+
+# Downloads all candidates of an article concurrently over one keep-alive
+# session. Each host gets at most `per_host` parallel requests, the article as
+# a whole gets `deadline` seconds, and bodies over `max_bytes` are dropped.
+# Failed URLs are reported to `results` (a UrlResultCache) and host health to
+# `breaker` (a HostBreaker), which short-circuits hosts that keep failing.
+# With `probe`, images whose header shows them too small or badly shaped are
+# not downloaded past the header (see fetch_image).
+class CandidateFetcher:
+    def __init__(self, max_workers=8, per_host=2, deadline=8.0, timeout=5.0, max_bytes=15 * 1024 * 1024,
+                 results=None, breaker=None, probe=False):
+        self.per_host = per_host
+        self.deadline = deadline
+        self.timeout = timeout
+        self.max_bytes = max_bytes
+        self.results = results
+        self.breaker = breaker
+        self.probe = probe
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=32, pool_maxsize=max_workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="fetch")
+        self._host_slots = defaultdict(lambda: threading.BoundedSemaphore(self.per_host))
+        self._host_lock = threading.Lock()
+
+    def _slot(self, host):
+        with self._host_lock:
+            return self._host_slots[host]
+
+    def _fetch(self, url, referer, deadline):
+        host = urlsplit(url).hostname or ""
+        if self.breaker and not self.breaker.allow(host):
+            return None
+
+        outcome = DEADLINE
+        slot = self._slot(host)
+        remaining = deadline - time.monotonic()
+        try:
+            if remaining <= 0 or not slot.acquire(timeout=remaining):
+                return None
+            try:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                with metrics.timed('download'):
+                    body, outcome = fetch_image(
+                        url,
+                        referer,
+                        session=self.session,
+                        timeout=min(self.timeout, remaining),
+                        max_bytes=self.max_bytes,
+                        deadline=deadline,
+                        probe=self.probe,
+                    )
+                return body
+            finally:
+                slot.release()
+        finally:
+            self._report(url, host, outcome)
+
+    def _report(self, url, host, outcome):
+        if self.results and outcome in URL_FAILURES:
+            self.results.fail(url, outcome)
+        if self.breaker:
+            if outcome in HOST_FAILURES:
+                self.breaker.failure(host)
+            elif outcome == DEADLINE:
+                # Out of article budget says nothing about the host
+                self.breaker.release(host)
+            else:
+                self.breaker.success(host)
+
+    def fetch_all(self, candidates):
+        # Returns raw bytes, a MeasuredImage (rejected by the probe) or None
+        # for each candidate, in input order
+        deadline = time.monotonic() + self.deadline
+        futures = [
+            self._executor.submit(self._fetch, cand['url'], cand.get('referer'), deadline)
+            if cand.get('url') else None
+            for cand in candidates
+        ]
+
+        pending = [f for f in futures if f is not None]
+        wait(pending, timeout=max(0.0, deadline - time.monotonic()))
+
+        results = []
+        for future in futures:
+            if future is None or not future.done():
+                if future is not None:
+                    future.cancel()  # Late ones stop streaming at the deadline on their own
+                results.append(None)
+                continue
+            try:
+                results.append(future.result())
+            except Exception:
+                results.append(None)
+        return results
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self.session.close()
@@ -1,10 +1,22 @@
 import json
 import logging
+import hashlib
 import boto3
+import multiprocessing
+import signal
+import sys
 import time
 import os
-from confluent_kafka import Consumer, Producer
-from ranker import download_image, score_candidate, process_image
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from confluent_kafka import Consumer, Producer, TIMESTAMP_NOT_AVAILABLE
+from dedup import PerceptualIndex
+from delivery import OffsetTracker
+from fetcher import CandidateFetcher
+from pycommon import metrics, profiler
+from ranker import CandidateImage, MeasuredImage, score_candidate, process_image, output_size
+from storage import ProcessedImageStore
+from urlcache import HostBreaker, UrlResultCache
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -16,6 +28,55 @@ MINIO_ACCESS = os.getenv('MINIO_ACCESS_KEY', 'minio_user')
 MINIO_SECRET = os.getenv('MINIO_SECRET_KEY', 'minio_password')
 BUCKET_NAME = 'processed-images'
 
+# Candidate download limits
+FETCH_WORKERS = int(os.getenv('FETCH_WORKERS', '8'))
+FETCH_PER_HOST = int(os.getenv('FETCH_PER_HOST', '2'))
+FETCH_TIMEOUT = float(os.getenv('FETCH_TIMEOUT_SECONDS', '5'))
+ARTICLE_DEADLINE = float(os.getenv('ARTICLE_FETCH_DEADLINE_SECONDS', '8'))
+MAX_IMAGE_BYTES = int(os.getenv('MAX_IMAGE_BYTES', str(15 * 1024 * 1024)))
+# Read each candidate's header first and stop there for images too small or
+# badly shaped to win (icons, tracking pixels, banners)
+IMAGE_PROBE = os.getenv('IMAGE_PROBE', 'true').lower() == 'true'
+
+# URL result cache and host circuit breaker
+# Scored URLs are remembered for URL_CACHE_TTL_SECONDS; failed ones back off
+# from URL_FAIL_TTL_SECONDS, doubling per repeat failure up to
+# URL_FAIL_MAX_TTL_SECONDS. A host failing HOST_BREAKER_THRESHOLD times in a
+# row (5xx, timeouts, connection errors) is skipped for
+# HOST_BREAKER_COOLDOWN_SECONDS before a single probe is let through.
+URL_CACHE_SIZE = int(os.getenv('URL_CACHE_SIZE', '100000'))
+URL_CACHE_TTL = float(os.getenv('URL_CACHE_TTL_SECONDS', '3600'))
+URL_FAIL_TTL = float(os.getenv('URL_FAIL_TTL_SECONDS', '60'))
+URL_FAIL_MAX_TTL = float(os.getenv('URL_FAIL_MAX_TTL_SECONDS', '3600'))
+HOST_BREAKER_THRESHOLD = int(os.getenv('HOST_BREAKER_THRESHOLD', '5'))
+HOST_BREAKER_COOLDOWN = float(os.getenv('HOST_BREAKER_COOLDOWN_SECONDS', '60'))
+
+# Near-duplicate detection
+# Candidates whose perceptual hash is within PHASH_MAX_DISTANCE bits of an
+# already scored image reuse its score inputs and stored object.
+# PHASH_INDEX_PATH (optional) persists the index across restarts.
+PHASH_INDEX_SIZE = int(os.getenv('PHASH_INDEX_SIZE', '50000'))
+PHASH_MAX_DISTANCE = int(os.getenv('PHASH_MAX_DISTANCE', '6'))
+PHASH_INDEX_PATH = os.getenv('PHASH_INDEX_PATH') or None
+
+# Delivery pipelining
+# The producer batches for up to PRODUCER_LINGER_MS; offsets are committed
+# every COMMIT_INTERVAL_SECONDS once their enriched message is delivered.
+# MAX_IN_FLIGHT bounds undelivered messages before the loop waits.
+PRODUCER_LINGER_MS = int(os.getenv('PRODUCER_LINGER_MS', '50'))
+COMMIT_INTERVAL = float(os.getenv('COMMIT_INTERVAL_SECONDS', '2'))
+MAX_IN_FLIGHT = int(os.getenv('MAX_IN_FLIGHT', '1000'))
+MAX_DELIVERY_ATTEMPTS = 3
+
+# Worker pool
+# RANKER_WORKERS=0 processes articles inline on the consumer thread; N (or
+# "auto" for one per core) hands them to a process pool. Results are
+# re-sequenced per partition, so output order and commits are unchanged.
+_workers = os.getenv('RANKER_WORKERS', '0')
+RANKER_WORKERS = len(os.sched_getaffinity(0)) if _workers == 'auto' else int(_workers)
+# Articles dispatched but not yet published, per worker
+PENDING_PER_WORKER = int(os.getenv('RANKER_PENDING_PER_WORKER', '4'))
+
 # S3 Setup
 s3 = boto3.client('s3',
     endpoint_url=MINIO_ENDPOINT,
@@ -28,86 +89,374 @@ try:
 except:
     pass # Bucket likely exists
 
-# Kafka Setup
-c = Consumer({
-    'bootstrap.servers': KAFKA_BROKER,
-    'group.id': 'image-ranker-group',
-    'auto.offset.reset': 'earliest'
-})
-p = Producer({'bootstrap.servers': KAFKA_BROKER})
-
-def delivery_report(err, msg):
-    if err is not None:
-        logger.error(f'Message delivery failed: {err}')
-    else:
-        logger.debug(f'Message delivered to {msg.topic()} [{msg.partition()}]')
+store = ProcessedImageStore(s3, BUCKET_NAME)
 
-c.subscribe(['parsed-articles'])
+dedup = PerceptualIndex(
+    max_entries=PHASH_INDEX_SIZE,
+    max_distance=PHASH_MAX_DISTANCE,
+    disk_path=PHASH_INDEX_PATH,
+)
 
-logger.info("Image Ranker Service Started")
+url_results = UrlResultCache(
+    max_entries=URL_CACHE_SIZE,
+    ttl=URL_CACHE_TTL,
+    fail_ttl=URL_FAIL_TTL,
+    max_fail_ttl=URL_FAIL_MAX_TTL,
+)
 
-while True:
-    msg = c.poll(1.0)
+fetcher = CandidateFetcher(
+    max_workers=FETCH_WORKERS,
+    per_host=FETCH_PER_HOST,
+    deadline=ARTICLE_DEADLINE,
+    timeout=FETCH_TIMEOUT,
+    max_bytes=MAX_IMAGE_BYTES,
+    results=url_results,
+    breaker=HostBreaker(HOST_BREAKER_THRESHOLD, HOST_BREAKER_COOLDOWN),
+    probe=IMAGE_PROBE,
+)
 
-    if msg is None:
-        continue
-    if msg.error():
-        logger.error("Consumer error: {}".format(msg.error()))
-        continue
+def process_article(data):
+    candidates = data.get('imageCandidates', [])
+    metrics.observe_batch('candidates', len(candidates))
+    
+    logger.info(f"Processing {len(candidates)} images for {data.get('title', 'Unknown')}")
+    
+    best_score = -1
+    best_cand = None
+    best_image = None
+    best_known = None
 
-    try:
-        data = json.loads(msg.value().decode('utf-8'))
-        candidates = data.get('imageCandidates', [])
+    # URLs scored recently (or failing) are answered from the URL cache.
+    # The rest are downloaded concurrently and scored; only the final
+    # winner gets resized, encoded and uploaded.
+    cached = [url_results.get(cand['url']) if cand.get('url') else None for cand in candidates]
+    misses = [cand for cand, hit in zip(candidates, cached) if cand.get('url') and hit is None]
+    metrics.count_cache('url_results', sum(hit is not None for hit in cached), len(misses))
+    downloads = iter(fetcher.fetch_all(misses))
+    for cand, hit in zip(candidates, cached):
+        url = cand.get('url')
+        if not url: continue
         
-        logger.info(f"Processing {len(candidates)} images for {data.get('title', 'Unknown')}")
+        image = None
+        known = hit if isinstance(hit, MeasuredImage) else None
+        if hit is None:
+            raw_img = next(downloads)
+            if isinstance(raw_img, MeasuredImage):
+                # Rejected from its header; remember the size, not the bytes
+                known = raw_img
+                url_results.put(url, known)
+                raw_img = None
+            image = CandidateImage(raw_img) if raw_img else None
+            # A near-duplicate of an image seen before is scored from what
+            # the index remembers, without decoding it
+            if image:
+                with metrics.timed('dedup_lookup'):
+                    known = dedup.lookup(image)
+                metrics.count_cache('phash', int(known is not None), int(known is None))
+        scored = known
+        if image and known:
+            # A near-duplicate lends its blur; the size is this candidate's own
+            scored = MeasuredImage(*image.size, known.blur)
+        # Decodes and measures blur unless cached or a near-duplicate
+        with metrics.timed('score'):
+            score, reason = score_candidate(cand, scored or image)
+        if image:
+            remember(url, image, known)
         
-        best_score = -1
-        best_image_key = None
-        best_meta = {}
-
-        # Evaluate all candidates
-        for cand in candidates:
-            url = cand.get('url')
-            if not url: continue
-            
-            raw_img = download_image(url, cand.get('referer'))
-            score, reason = score_candidate(cand, raw_img)
-            
-            logger.info(f"Candidate {url}: Score={score} ({reason})")
-            
-            if score > best_score and score > 10: # Min threshold
-                best_score = score
-                # Process (Resize/WebP) and Upload
-                processed_img = process_image(raw_img)
-                
-                # S3 Key: hash of URL
-                import hashlib
-                key = hashlib.md5(url.encode()).hexdigest() + ".webp"
-                
-                s3.put_object(
-                    Bucket=BUCKET_NAME,
-                    Key=key,
-                    Body=processed_img,
-                    ContentType='image/webp'
-                )
-                
-                best_image_key = key
-                best_meta = {
-                    'width': 1200, # Approx
-                    'height': 0, # Should calculate real dims
-                    'url': f"{MINIO_ENDPOINT}/{BUCKET_NAME}/{key}", # Public URL
-                    'score': float(score)
-                }
-
-        # Enrich article with best image
-        data['bestImage'] = best_meta if best_image_key else None
+        logger.debug(f"Candidate {url}: Score={score} ({reason}{', cached' if hit else ''}{', near-duplicate' if image and known else ''})")
         
+        if score > best_score and score > 10: # Min threshold
+            if best_image:
+                best_image.release()
+            best_score = score
+            best_cand = cand
+            best_image = image
+            best_known = known
+        elif image:
+            image.release()
+
+    # Enrich article with best image
+    with metrics.timed('store'):
+        data['bestImage'] = store_winner(best_cand, best_image, best_score, best_known) if best_cand else None
+    return data
+
+def remember(url, image, known):
+    if known:
+        # The URL cache keeps this candidate's own size; store_winner finds
+        # the near-duplicate's object again through the index
+        entry = MeasuredImage(*image.size, known.blur)
+    else:
+        entry = dedup.record(image)
+    if entry is None:
+        try:
+            entry = image.measure()
+        except Exception:
+            return  # Unreadable; let it be retried
+    url_results.put(url, entry)
+
+def is_stored(known):
+    return bool(known and known.key and store.exists(known.key))
+
+def store_winner(cand, image, score, known=None):
+    stored = is_stored(known)
+    if image is None and not stored:
+        # Scored from the URL cache but never stored: download it now
+        raw_img = fetcher.fetch_all([cand])[0]
+        if not raw_img or isinstance(raw_img, MeasuredImage):
+            logger.warning(f"Winner {cand['url']} no longer downloadable")
+            return None
+        image = CandidateImage(raw_img)
+        # Its near-duplicate may have been stored in the meantime
+        known = dedup.lookup(image) or known
+        stored = is_stored(known)
+
+    if stored:
+        # Same photo already processed (under this or another URL), at
+        # least as large as this candidate
+        key = known.key
+        width, height = output_size(*known.size)
+        logger.debug(f"Reusing {key} for {cand['url']}")
+    else:
+        # S3 Key: hash of URL
+        key = hashlib.md5(cand['url'].encode()).hexdigest() + ".webp"
+        width, height = output_size(*image.size)
+
+        if store.exists(key):
+            logger.debug(f"Reusing existing {key}")
+        else:
+            # Process (Resize/WebP) and Upload
+            with metrics.timed('encode'):
+                body = process_image(image)
+            with metrics.timed('upload'):
+                store.put(key, body)
+        # Scored from the index if known, so carry its blur over
+        blur = known.blur if known else None
+        entry = dedup.record(image, key, blur=blur)
+        if entry is None:
+            entry = image.measure(blur)
+            entry.key = key
+        url_results.put(cand['url'], entry)
+    if image:
+        image.release()
+
+    return {
+        'width': width,
+        'height': height,
+        'url': f"{MINIO_ENDPOINT}/{BUCKET_NAME}/{key}", # Public URL
+        'score': float(score)
+    }
+
+def process_payload(value):
+    # Kafka value in, enriched value out; runs inline or in a pool worker
+    with metrics.timed('article'):
+        data = process_article(json.loads(value.decode('utf-8')))
+    return json.dumps(data).encode('utf-8')
+
+def init_worker():
+    # Ctrl-C is for the parent; it drains the pool itself
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    profiler.install('image-ranker-worker')
+
+def create_pool(workers):
+    # spawn: children import this module fresh (own S3 client, HTTP session)
+    # instead of inheriting librdkafka and fetcher threads through fork
+    pool = ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=init_worker,
+    )
+    # Start the workers now rather than on the first article
+    wait([pool.submit(time.sleep, 0) for _ in range(workers)])
+    return pool
+
+# Kafka Setup
+def create_consumer():
+    return Consumer({
+        'bootstrap.servers': KAFKA_BROKER,
+        'group.id': 'image-ranker-group',
+        'auto.offset.reset': 'earliest',
+        # Offsets are committed by hand once the enriched message is delivered
+        'enable.auto.commit': False,
+    })
+
+def create_producer():
+    return Producer({
+        'bootstrap.servers': KAFKA_BROKER,
+        'linger.ms': PRODUCER_LINGER_MS,
+        'batch.num.messages': 1000,
+        'compression.type': 'lz4',
+        # Keeps per-partition order across internal retries
+        'enable.idempotence': True,
+    })
+
+class Pipeline:
+    def __init__(self, consumer, producer, pool=None, max_pending=0):
+        self.c = consumer
+        self.p = producer
+        self.pool = pool
+        self.max_pending = max_pending
+        self.offsets = OffsetTracker()
+        self.failed = []
+        # Set when a delivery fails for good; the loop stops and the process
+        # exits without committing past that article, so it is reprocessed
+        self.undeliverable = None
+        self.last_commit = time.monotonic()
+        # (topic, partition) -> deque of (source, future) in offset order
+        self.inflight = {}
+
+    def publish(self, value, source, attempt=1):
+        # source is (topic, partition, offset) of the parsed article
+        def delivery_report(err, msg):
+            if err is None:
+                self.offsets.done(*source)
+            elif attempt < MAX_DELIVERY_ATTEMPTS:
+                logger.warning(f'Message delivery failed (attempt {attempt}), retrying: {err}')
+                self.failed.append((value, source, attempt + 1))
+            else:
+                # Never marked done: the commit point stays before it
+                logger.error(f'Message delivery failed after {attempt} attempts, stopping: {err}')
+                self.undeliverable = err
+
+        while True:
+            try:
+                self.p.produce('enriched-articles', value, callback=delivery_report)
+                break
+            except BufferError:
+                # Local queue full: wait for deliveries instead of sleeping blind
+                self.p.poll(0.5)
+
+    def service(self, timeout=0):
+        # Serve delivery callbacks, retry failed deliveries, apply backpressure
+        self.p.poll(timeout)
+        while self.failed:
+            self.publish(*self.failed.pop(0))
+        while len(self.p) >= MAX_IN_FLIGHT:
+            self.p.poll(0.1)
+
+    def commit(self, force=False):
+        if not force and time.monotonic() - self.last_commit < COMMIT_INTERVAL:
+            return
+        offsets = self.offsets.committable()
+        if offsets:
+            self.c.commit(offsets=offsets, asynchronous=not force)
+        self.last_commit = time.monotonic()
+
+    def on_revoke(self, consumer, partitions):
+        # Settle what we can before losing the partitions
+        self.drain(block=True)
+        self.p.flush(10)
+        self.service()
+        self.commit(force=True)
+        self.offsets.forget(partitions)
+
+    def handle(self, msg):
+        source = (msg.topic(), msg.partition(), msg.offset())
+        self.offsets.track(*source)
+        timestamp_type, timestamp = msg.timestamp()
+        if timestamp_type != TIMESTAMP_NOT_AVAILABLE:
+            metrics.observe_lag(msg.topic(), time.time() - timestamp / 1000.0)
+
+        if self.pool is None:
+            try:
+                self.complete(source, process_payload(msg.value()))
+            except Exception as e:
+                self.fail(source, e)
+            return
+
+        future = self.pool.submit(process_payload, msg.value())
+        self.inflight.setdefault(source[:2], deque()).append((source, future))
+        self.wait_for_slot()
+
+    def complete(self, source, value):
         # Publish to 'enriched-articles'
-        p.produce('enriched-articles', json.dumps(data).encode('utf-8'), callback=delivery_report)
-        p.flush()
-        
-        # Throttle to save CPU (reduced for catchup)
-        time.sleep(0.05)
+        self.publish(value, source)
+
+    def fail(self, source, error):
+        logger.error(f"Error processing message: {error}")
+        # Nothing to deliver; don't let it hold back the commit point
+        self.offsets.done(*source)
+
+    def pending(self):
+        return sum(len(queue) for queue in self.inflight.values())
+
+    def heads(self):
+        return [queue[0][1] for queue in self.inflight.values() if queue]
+
+    def publish_ready(self):
+        # Publish finished articles in offset order per partition; a finished
+        # article waits behind an unfinished one from the same partition
+        for queue in self.inflight.values():
+            while queue and queue[0][1].done():
+                source, future = queue.popleft()
+                try:
+                    self.complete(source, future.result())
+                except Exception as e:
+                    self.fail(source, e)
+
+    def wait_for_slot(self):
+        while self.pending() >= self.max_pending:
+            wait(self.heads(), return_when=FIRST_COMPLETED)
+            self.publish_ready()
+
+    def drain(self, block=False):
+        self.publish_ready()
+        while block and self.pending():
+            wait(self.heads())
+            self.publish_ready()
+
+    def shutdown(self):
+        self.drain(block=True)
+        remaining = self.p.flush(30)
+        if remaining:
+            logger.error(f"{remaining} enriched messages undelivered at shutdown")
+        self.service()
+        self.commit(force=True)
+        self.c.close()
+        if self.pool is not None:
+            self.pool.shutdown()
+
+def run():
+    # Before the pool: workers report into the same metrics directory
+    metrics.serve()
+    profiler.install('image-ranker')
+    pool = create_pool(RANKER_WORKERS) if RANKER_WORKERS > 0 else None
+    pipeline = Pipeline(
+        create_consumer(),
+        create_producer(),
+        pool=pool,
+        max_pending=RANKER_WORKERS * PENDING_PER_WORKER,
+    )
+    running = True
+
+    def stop(signum, frame):
+        nonlocal running
+        running = False
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    pipeline.c.subscribe(['parsed-articles'], on_revoke=pipeline.on_revoke)
+
+    logger.info(f"Image Ranker Service Started ({RANKER_WORKERS or 'inline'} workers)")
+
+    while running and pipeline.undeliverable is None:
+        msg = pipeline.c.poll(1.0)
+        pipeline.drain()
+        pipeline.service()
+        pipeline.commit()
+
+        if msg is None:
+            continue
+        if msg.error():
+            logger.error("Consumer error: {}".format(msg.error()))
+            continue
+
+        pipeline.handle(msg)
+
+    pipeline.shutdown()
+    if pipeline.undeliverable is not None:
+        # Restarted by the orchestrator; resumes from the last commit
+        sys.exit(1)
 
-    except Exception as e:
-        logger.error(f"Error processing message: {e}")
+if __name__ == "__main__":
+    run()
@@ -2,9 +2,44 @@ import cv2
 import numpy as np
 import requests
 from PIL import Image
+import struct
+import time
 from io import BytesIO
 
-def download_image(url, referer=None):
+CHUNK_SIZE = 64 * 1024
+
+# Header probing (fetch_image(probe=True)): the body is read PROBE_CHUNK_SIZE
+# at a time until the image header gives up its dimensions, for at most
+# PROBE_MAX_BYTES. A rejected image stops there; if what's left is no more
+# than PROBE_DRAIN_BYTES it is read anyway to keep the connection alive.
+PROBE_CHUNK_SIZE = 8 * 1024
+PROBE_MAX_BYTES = 256 * 1024
+PROBE_DRAIN_BYTES = 64 * 1024
+
+# Smallest image worth scoring, and the accepted width/height range
+MIN_WIDTH = 200
+MIN_HEIGHT = 150
+MIN_ASPECT = 0.5
+MAX_ASPECT = 3.0
+
+# Download outcomes (see fetch_image). Everything but OK, REJECTED and
+# DEADLINE says something about the URL; SERVER_ERROR, TIMEOUT and ERROR
+# also about the host.
+OK = 'ok'
+REJECTED = 'rejected'
+NOT_FOUND = 'not_found'
+SERVER_ERROR = 'server_error'
+TOO_LARGE = 'too_large'
+DEADLINE = 'deadline'
+TIMEOUT = 'timeout'
+ERROR = 'error'
+
+def fetch_image(url, referer=None, session=None, timeout=5, max_bytes=None, deadline=None, probe=False):
+    # Streams the body so oversized images and the article deadline can cut
+    # the transfer short instead of buffering everything first. With probe,
+    # images the header shows to be too small or badly shaped are cut short
+    # too, and come back as a MeasuredImage with outcome REJECTED.
+    # Returns (body or None, outcome).
     try:
         headers = {
             'User-Agent': 'NewsAggregatorBot/1.0',
@@ -12,43 +47,245 @@ def download_image(url, referer=None):
         }
         if referer:
             headers['Referer'] = referer
-        resp = requests.get(url, headers=headers, timeout=5)
-        if resp.status_code == 200:
-            return resp.content
-        return None
+        http = session or requests
+        with http.get(url, headers=headers, timeout=timeout, stream=True) as resp:
+            if resp.status_code >= 500:
+                return None, SERVER_ERROR
+            if resp.status_code != 200:
+                return None, NOT_FOUND
+
+            length = resp.headers.get('Content-Length')
+            if max_bytes and length and length.isdigit() and int(length) > max_bytes:
+                return None, TOO_LARGE
+
+            body = bytearray()
+            if probe:
+                for chunk in resp.iter_content(PROBE_CHUNK_SIZE):
+                    body.extend(chunk)
+                    if deadline and time.monotonic() > deadline:
+                        return None, DEADLINE
+                    size = header_size(body)
+                    if size and shape_reject_reason(*size):
+                        skip_rest(resp, length, len(body))
+                        return MeasuredImage(*size, None), REJECTED
+                    if size or len(body) >= PROBE_MAX_BYTES:
+                        break
+                else:
+                    return bytes(body), OK  # Whole body fit in the probe
+
+            for chunk in resp.iter_content(CHUNK_SIZE):
+                body.extend(chunk)
+                if max_bytes and len(body) > max_bytes:
+                    return None, TOO_LARGE
+                if deadline and time.monotonic() > deadline:
+                    return None, DEADLINE
+            return bytes(body), OK
+    except requests.Timeout:
+        return None, TIMEOUT
     except:
+        return None, ERROR
+
+def skip_rest(resp, length, received):
+    # Read out a small remainder so the keep-alive connection can be reused;
+    # a large (or unknown) one isn't worth the bytes, closing drops it
+    if not (length and length.isdigit() and int(length) - received <= PROBE_DRAIN_BYTES):
+        return
+    try:
+        for _ in resp.iter_content(CHUNK_SIZE):
+            pass
+    except Exception:
+        pass
+
+# Start-of-frame markers, which carry the dimensions. C4 (DHT), C8 (JPG) and
+# CC (DAC) sit in the same range but are not frames.
+JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+def header_size(data):
+    # (width, height) from the first bytes of a JPEG, PNG, GIF or WebP file;
+    # None until enough of the header has arrived, or for other formats
+    if data[:8] == b'\x89PNG\r\n\x1a\n':
+        if len(data) >= 24 and data[12:16] == b'IHDR':
+            return struct.unpack('>II', data[16:24])
         return None
+    if data[:6] in (b'GIF87a', b'GIF89a'):
+        return struct.unpack('<HH', data[6:10]) if len(data) >= 10 else None
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return webp_size(data)
+    if data[:2] == b'\xff\xd8':
+        return jpeg_size(data)
+    return None
+
+def jpeg_size(data):
+    # Walk the marker segments up to the first frame header; EXIF and ICC
+    # segments in front of it can run to tens of KB
+    i = 2
+    while i + 4 <= len(data):
+        if data[i] != 0xFF:
+            return None  # Not a marker: corrupt, leave it to the decoder
+        marker = data[i + 1]
+        if marker == 0xFF:
+            i += 1  # Fill byte
+            continue
+        if marker == 0x01 or 0xD0 <= marker <= 0xD7:
+            i += 2  # No payload
+            continue
+        if marker in JPEG_SOF_MARKERS:
+            if i + 9 > len(data):
+                return None
+            height, width = struct.unpack('>HH', data[i + 5:i + 9])
+            return width, height
+        i += 2 + struct.unpack('>H', data[i + 2:i + 4])[0]
+    return None
+
+def webp_size(data):
+    if len(data) < 30:
+        return None
+    chunk = data[12:16]
+    if chunk == b'VP8 ':
+        # Lossy: 14-bit sizes after the frame tag and start code
+        width, height = struct.unpack('<HH', data[26:30])
+        return width & 0x3FFF, height & 0x3FFF
+    if chunk == b'VP8L':
+        # Lossless: 14-bit width-1 and height-1 after the signature byte
+        bits = int.from_bytes(data[21:25], 'little')
+        return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+    if chunk == b'VP8X':
+        # Extended: 24-bit canvas width-1 and height-1
+        return int.from_bytes(data[24:27], 'little') + 1, int.from_bytes(data[27:30], 'little') + 1
+    return None
+
+# Output width of process_image; decoding never needs more than this
+MAX_WIDTH = 1200
 
-def get_blur_score(image_bytes):
+# Downloaded candidate, decoded at most once and shared by every stage.
+# The header (size/format) is read without decoding pixels; decode() then
+# uses the JPEG draft mode to decode at the smallest DCT scale that still
+# covers MAX_WIDTH, so a 4000px photo is never fully decoded.
+class CandidateImage:
+    def __init__(self, data):
+        self.data = data
+        self._img = None
+        self._decoded = None
+        self._size = None
+        self._blur = None
+        self._phash = None
+
+    def _header(self):
+        if self._img is None:
+            self._img = Image.open(BytesIO(self.data))
+            self._size = self._img.size
+        return self._img
+
+    @property
+    def size(self):
+        # Original dimensions, even after a reduced-scale decode
+        self._header()
+        return self._size
+
+    def decode(self):
+        if self._decoded is None:
+            img = self._header()
+            if img.format == 'JPEG' and img.width > MAX_WIDTH:
+                img.draft(img.mode, (MAX_WIDTH, -(-img.height * MAX_WIDTH // img.width)))
+            img.load()
+            self._decoded = img
+        return self._decoded
+
+    @property
+    def blur(self):
+        if self._blur is None:
+            self._blur = get_blur_score(self)
+        return self._blur
+
+    @property
+    def phash(self):
+        # Perceptual hash from its own tiny draft decode, so a near-duplicate
+        # hit never pays for the full-size decode; None if unreadable
+        if self._phash is None and self.data:
+            try:
+                self._phash = dhash(self.data)
+            except Exception:
+                self._phash = None
+        return self._phash
+
+    @property
+    def scored_blur(self):
+        # Blur if scoring got that far; None if rejected on size or aspect
+        return self._blur
+
+    def measure(self, blur=None):
+        # What the dedup index remembers; blur stays None if scoring never
+        # needed it (rejected on size or aspect) unless the caller knows it
+        width, height = self.size
+        return MeasuredImage(width, height, self._blur if blur is None else blur)
+
+    def release(self):
+        # Drop pixel and byte buffers once the candidate is out of the running
+        self._img = self._decoded = None
+        self.data = None
+
+# A previously scored image, as recalled from the dedup index: enough to
+# score it again without pixels, plus the object it was stored under
+class MeasuredImage:
+    def __init__(self, width, height, blur, key=None):
+        self.size = (width, height)
+        self.blur = blur or 0
+        self.key = key
+
+def dhash(data, hash_size=8):
+    # 64-bit difference hash: brightness gradient across a 9x8 thumbnail.
+    # Survives re-encoding, CDN resizes and mild recompression.
+    img = Image.open(BytesIO(data))
+    img.draft('L', (hash_size * 8, hash_size * 8))
+    small = img.convert('L').resize((hash_size + 1, hash_size), Image.Resampling.BOX)
+    pixels = np.asarray(small, dtype=np.int16)
+    bits = (pixels[:, 1:] > pixels[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+def as_candidate(image):
+    return image if isinstance(image, (CandidateImage, MeasuredImage)) else CandidateImage(image)
+
+def get_blur_score(image):
     try:
-        # Convert to numpy array
-        nparr = np.frombuffer(image_bytes, np.uint8)
-        img = cv2.imdecode(nparr, cv2.IMREAD_GRAYSCALE)
-        if img is None:
-            return 0
-        return cv2.Laplacian(img, cv2.CV_64F).var()
+        img = as_candidate(image).decode()
+        # Other formats have no draft mode; a box reduce to the same scale
+        # keeps the variance comparable with drafted JPEGs
+        factor = min(img.width // MAX_WIDTH, 8)
+        if factor >= 2:
+            img = img.reduce(factor)
+        gray = np.asarray(img.convert('L'))
+        return cv2.Laplacian(gray, cv2.CV_64F).var()
     except:
         return 0
 
+def shape_reject_reason(width, height):
+    # Rejections that need nothing but the dimensions
+    # 1. Reject tiny images (relaxed for better coverage)
+    if width < MIN_WIDTH or height < MIN_HEIGHT:
+        return "Too small"
+
+    # 2. Aspect Ratio (Favor Landscape)
+    aspect = width / height
+    if aspect < MIN_ASPECT or aspect > MAX_ASPECT: # Too tall or too wide
+        return "Bad aspect ratio"
+    return None
+
 def score_candidate(candidate, image_data):
     if not image_data:
         return 0, "Failed to download"
 
     try:
-        img = Image.open(BytesIO(image_data))
-        width, height = img.size
+        image = as_candidate(image_data)
+        width, height = image.size
         
-        # 1. Reject tiny images (relaxed for better coverage)
-        if width < 200 or height < 150:
-            return 0, "Too small"
-            
-        # 2. Aspect Ratio (Favor Landscape)
+        # 1-2. Size and aspect ratio
+        reason = shape_reject_reason(width, height)
+        if reason:
+            return 0, reason
         aspect = width / height
-        if aspect < 0.5 or aspect > 3.0: # Too tall or too wide
-            return 0, "Bad aspect ratio"
         
         # 3. Blur Detection
-        blur_score = get_blur_score(image_data)
+        blur_score = image.blur
         if blur_score < 50: # Very blurry
             return 0, "Too blurry"
 
@@ -69,15 +306,20 @@ def score_candidate(candidate, image_data):
     except Exception as e:
         return 0, f"Error: {str(e)}"
 
-def process_image(image_bytes):
-    # Resize and convert to WebP
-    img = Image.open(BytesIO(image_bytes))
+def output_size(width, height):
+    # Dimensions process_image produces for a source of this size
+    if width > MAX_WIDTH:
+        return MAX_WIDTH, int(height * (MAX_WIDTH / width))
+    return width, height
+
+def process_image(image):
+    # Resize and convert to WebP, reusing the pixels decoded for scoring
+    image = as_candidate(image)
+    img = image.decode()
     
-    # Resize to max width 1200 keeping aspect
-    if img.width > 1200:
-        ratio = 1200 / img.width
-        new_height = int(img.height * ratio)
-        img = img.resize((1200, new_height), Image.Resampling.LANCZOS)
+    # Resize to max width 1200 keeping aspect (of the original, not the draft)
+    if img.width > MAX_WIDTH:
+        img = img.resize(output_size(*image.size), Image.Resampling.LANCZOS)
         
     output = BytesIO()
     img.save(output, format="WEBP", quality=85)
@@ -0,0 +1,44 @@
+import logging
+import threading
+from collections import OrderedDict
+
+from botocore.exceptions import ClientError
+
+logger = logging.getLogger(__name__)
+
+
+# Uploads processed images, skipping keys that are already in the bucket.
+# Known keys are remembered in a bounded LRU so repeats cost no request at
+# all; unknown keys get a HEAD before the PUT.
+class ProcessedImageStore:
+    def __init__(self, s3, bucket, max_known_keys=100_000):
+        self.s3 = s3
+        self.bucket = bucket
+        self.max_known_keys = max_known_keys
+        self._known = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _remember(self, key):
+        with self._lock:
+            self._known[key] = True
+            self._known.move_to_end(key)
+            while len(self._known) > self.max_known_keys:
+                self._known.popitem(last=False)
+
+    def exists(self, key):
+        with self._lock:
+            if key in self._known:
+                self._known.move_to_end(key)
+                return True
+        try:
+            self.s3.head_object(Bucket=self.bucket, Key=key)
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+                return False
+            raise
+        self._remember(key)
+        return True
+
+    def put(self, key, body, content_type='image/webp'):
+        self.s3.put_object(Bucket=self.bucket, Key=key, Body=body, ContentType=content_type)
+        self._remember(key)
@@ -0,0 +1,103 @@
+import threading
+import time
+from collections import OrderedDict
+
+from ranker import NOT_FOUND, SERVER_ERROR, TOO_LARGE, TIMEOUT, ERROR
+
+# Outcomes that say the URL itself is bad for now
+URL_FAILURES = (NOT_FOUND, SERVER_ERROR, TOO_LARGE, TIMEOUT, ERROR)
+# Outcomes that say the host is unhealthy
+HOST_FAILURES = (SERVER_ERROR, TIMEOUT, ERROR)
+
+
+class _Failure:
+    def __init__(self, outcome, failures):
+        self.outcome = outcome
+        self.failures = failures
+
+
+# Per-URL download results with a TTL, bounded by entry count.
+# Positive entries hold the MeasuredImage a candidate was scored from, so a
+# URL seen for a sibling article is rescored without downloading it again.
+# Negative entries back off exponentially per consecutive failure; expired
+# ones are kept (until evicted) so the next failure remembers the streak.
+class UrlResultCache:
+    def __init__(self, max_entries=100_000, ttl=3600, fail_ttl=60, max_fail_ttl=3600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.fail_ttl = fail_ttl
+        self.max_fail_ttl = max_fail_ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _store(self, url, entry, expires):
+        self._entries[url] = (entry, expires)
+        self._entries.move_to_end(url)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get(self, url):
+        # MeasuredImage on a hit, the outcome string on a negative hit,
+        # None on a miss
+        with self._lock:
+            item = self._entries.get(url)
+            if item is not None and item[1] > time.monotonic():
+                entry = item[0]
+                self._entries.move_to_end(url)
+                if isinstance(entry, _Failure):
+                    return entry.outcome
+                return entry
+            return None
+
+    def put(self, url, measured):
+        with self._lock:
+            self._store(url, measured, time.monotonic() + self.ttl)
+
+    def fail(self, url, outcome):
+        with self._lock:
+            item = self._entries.get(url)
+            previous = item[0] if item else None
+            failures = previous.failures + 1 if isinstance(previous, _Failure) else 1
+            backoff = min(self.fail_ttl * 2 ** (failures - 1), self.max_fail_ttl)
+            self._store(url, _Failure(outcome, failures), time.monotonic() + backoff)
+
+
+# Per-host circuit breaker. After `threshold` consecutive host failures the
+# host is skipped for `cooldown` seconds; then a single probe request is let
+# through, closing the circuit on success and reopening it on failure.
+class HostBreaker:
+    def __init__(self, threshold=5, cooldown=60):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        # host -> [consecutive failures, open until, probe in flight]
+        self._hosts = {}
+        self._lock = threading.Lock()
+
+    def allow(self, host):
+        with self._lock:
+            state = self._hosts.get(host)
+            if state is None or state[0] < self.threshold:
+                return True
+            if time.monotonic() < state[1] or state[2]:
+                return False
+            state[2] = True
+            return True
+
+    def success(self, host):
+        with self._lock:
+            self._hosts.pop(host, None)
+
+    def failure(self, host):
+        with self._lock:
+            state = self._hosts.setdefault(host, [0, 0.0, False])
+            state[0] += 1
+            state[2] = False
+            if state[0] >= self.threshold:
+                state[1] = time.monotonic() + self.cooldown
+
+    def release(self, host):
+        # Probe ended without a verdict (e.g. article deadline)
+        with self._lock:
+            state = self._hosts.get(host)
+            if state is not None:
+                state[2] = False
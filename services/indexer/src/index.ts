@@ -17,6 +17,7 @@ const consumer = kafka.consumer({ groupId: 'indexer-group-1' });
 const DEFAULT_CLUSTER_DISTANCE_THRESHOLD = parseFloat(process.env.CLUSTER_DISTANCE_THRESHOLD || '0.22');
 const DEFAULT_CLUSTER_TIME_WINDOW_HOURS = parseInt(process.env.CLUSTER_TIME_WINDOW_HOURS || '24', 10);
 const DEFAULT_TEXT_SIMILARITY_THRESHOLD = parseFloat(process.env.TEXT_SIMILARITY_THRESHOLD || '0.45');
+const EMBEDDING_SERVICE_URL = process.env.EMBEDDING_SERVICE_URL || 'http://embedding-service:8000';
 
 let settingsCache = {
     updatedAt: 0,
@@ -64,6 +65,67 @@ async function getClusteringSettings(client: any) {
     return settingsCache;
 }
 
+// Nearest cluster to the vector in pgvector, under the distance threshold
+async function nearestCluster(client: any, embeddingVector: number[], distanceThreshold: number, timeWindowHours: number) {
+    const similarClusterRes = await client.query(
+        `SELECT id, title, (embedding <=> $1) as dist 
+         FROM clusters 
+         WHERE last_updated_at > NOW() - make_interval(hours => $2)
+         AND (embedding <=> $1) < $3
+         ORDER BY dist ASC 
+         LIMIT 1`,
+        [`[${embeddingVector.join(',')}]`, timeWindowHours, distanceThreshold]
+    );
+    return similarClusterRes.rows;
+}
+
+// Embeds the title and finds the nearest recent cluster under the distance
+// threshold. The embedding service answers hits from memory (/match); if it
+// can't (old version, index loading or not configured), embed and search in
+// pgvector. A miss is checked in pgvector too: a cluster registered with
+// another embedding worker isn't in this worker's index until its next sync.
+async function findSemanticCluster(client: any, title: string, distanceThreshold: number, timeWindowHours: number) {
+    let embeddingVector: number[] | null = null;
+    try {
+        const matchRes = await axios.post(`${EMBEDDING_SERVICE_URL}/match`, {
+            text: title,
+            max_distance: distanceThreshold,
+            window_hours: timeWindowHours,
+        });
+        embeddingVector = matchRes.data.vector;
+        if (matchRes.data.cluster_id != null) {
+            // The index may lag behind deletes; only trust ids that still exist
+            const clusterRes = await client.query('SELECT id, title FROM clusters WHERE id = $1', [matchRes.data.cluster_id]);
+            if (clusterRes.rows.length > 0) {
+                return { embeddingVector, rows: clusterRes.rows };
+            }
+        }
+    } catch (err) {
+        // Fall through to the embed + pgvector path
+    }
+
+    if (!embeddingVector) {
+        try {
+            const embedRes = await axios.post(`${EMBEDDING_SERVICE_URL}/embed`, { text: title });
+            embeddingVector = embedRes.data.vector as number[];
+        } catch (err) {
+            console.warn('Failed to get embedding:', err);
+            return { embeddingVector: null, rows: [] };
+        }
+    }
+
+    const rows = await nearestCluster(client, embeddingVector, distanceThreshold, timeWindowHours);
+    return { embeddingVector, rows };
+}
+
+// Makes a new cluster matchable by /match straight away instead of after the
+// embedding service's next sync. Best effort: the sync catches it up anyway.
+function registerCluster(clusterId: number, embeddingVector: number[] | null) {
+    if (!embeddingVector) return;
+    axios.post(`${EMBEDDING_SERVICE_URL}/clusters`, { id: Number(clusterId), vector: embeddingVector })
+        .catch(() => { });
+}
+
 async function saveArticle(data: any) {
     const client = await pool.connect();
     try {
@@ -98,35 +160,18 @@ async function saveArticle(data: any) {
         }
 
         // 2. Insert Cluster or Find Existing (Smart Semantic Clustering)
-        // First, get embedding for the title
-        let embeddingVector = null;
-        try {
-            const embedRes = await axios.post('http://embedding-service:8000/embed', { text: data.title });
-            embeddingVector = embedRes.data.vector;
-        } catch (err) {
-            console.warn('Failed to get embedding:', err);
-        }
-
         let clusterId;
-        let similarClusterRes: any = { rows: [] };
+        let createdCluster = false;
 
         const clusteringSettings = await getClusteringSettings(client);
         const distanceThreshold = clusteringSettings.distance;
         const timeWindowHours = clusteringSettings.hours;
         const textSimilarityThreshold = clusteringSettings.textSim;
 
-        // If we have a vector, use semantic search (time-windowed)
-        if (embeddingVector) {
-            similarClusterRes = await client.query(
-                `SELECT id, title, (embedding <=> $1) as dist 
-                 FROM clusters 
-                 WHERE last_updated_at > NOW() - make_interval(hours => $2)
-                 AND (embedding <=> $1) < $3
-                 ORDER BY dist ASC 
-                 LIMIT 1`,
-                [`[${embeddingVector.join(',')}]`, timeWindowHours, distanceThreshold]
-            );
-        }
+        // Semantic search (time-windowed) on the title embedding
+        const semantic = await findSemanticCluster(client, data.title, distanceThreshold, timeWindowHours);
+        const embeddingVector = semantic.embeddingVector;
+        let similarClusterRes: any = { rows: semantic.rows };
 
         // Fallback to text similarity if no vector (or no match found yet)
         if (similarClusterRes.rows.length === 0) {
@@ -156,6 +201,7 @@ async function saveArticle(data: any) {
                 [data.title, 'general', 10.0, vectorStr]
             );
             clusterId = clusterRes.rows[0].id;
+            createdCluster = true;
         }
 
         // 3. Insert Article
@@ -187,6 +233,7 @@ async function saveArticle(data: any) {
         }
 
         await client.query('COMMIT');
+        if (createdCluster) registerCluster(clusterId, embeddingVector);
         console.log(`Saved article: ${data.title} (ID: ${articleRes.rows[0].id})`);
 
     } catch (e) {
@@ -232,35 +279,17 @@ async function pollOrphans() {
 }
 
 async function clusterOrphan(article: any, client: any) {
-    // 1. Get embedding
-    let embeddingVector = null;
-    try {
-        const embedRes = await axios.post('http://embedding-service:8000/embed', { text: article.title });
-        embeddingVector = embedRes.data.vector;
-    } catch (err) {
-        // console.warn('Failed to get embedding:', err);
-    }
-
     let clusterId;
-    let similarClusterRes: any = { rows: [] };
 
     const clusteringSettings = await getClusteringSettings(client);
     const distanceThreshold = clusteringSettings.distance;
     const timeWindowHours = clusteringSettings.hours;
     const textSimilarityThreshold = clusteringSettings.textSim;
 
-    // 2. Find similar cluster (time-windowed)
-    if (embeddingVector) {
-        similarClusterRes = await client.query(
-            `SELECT id, title, (embedding <=> $1) as dist 
-             FROM clusters 
-             WHERE last_updated_at > NOW() - make_interval(hours => $2)
-             AND (embedding <=> $1) < $3
-             ORDER BY dist ASC 
-             LIMIT 1`,
-            [`[${embeddingVector.join(',')}]`, timeWindowHours, distanceThreshold]
-        );
-    }
+    // 1. Embed and find similar cluster (time-windowed)
+    const semantic = await findSemanticCluster(client, article.title, distanceThreshold, timeWindowHours);
+    const embeddingVector = semantic.embeddingVector;
+    let similarClusterRes: any = { rows: semantic.rows };
 
     if (similarClusterRes.rows.length === 0) {
         similarClusterRes = await client.query(
@@ -285,10 +314,11 @@ async function clusterOrphan(article: any, client: any) {
             [article.title, 'general', 10.0, vectorStr, article.id]
         );
         clusterId = clusterRes.rows[0].id;
+        registerCluster(clusterId, embeddingVector);
         console.log(`[Orphan] Created new cluster: "${article.title}"`);
     }
 
-    // 3. Update Article
+    // 2. Update Article
     await client.query('UPDATE articles SET cluster_id = $1 WHERE id = $2', [clusterId, article.id]);
 }
 
@@ -0,0 +1,3 @@
+# Helpers shared by the Python services. Images are built with ./services as
+# the context and copy this package next to the service's own modules; for
+# local runs put ./services on PYTHONPATH.
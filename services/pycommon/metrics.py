@@ -0,0 +1,90 @@
+import logging
+import os
+import shutil
+
+from prometheus_client import (
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    make_asgi_app,
+    multiprocess,
+    start_http_server,
+)
+
+logger = logging.getLogger(__name__)
+
+# Port for the /metrics thread (serve()); 0 turns it off
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9464"))
+# Set for services that fork or spawn workers: every process writes its
+# samples here and the scrape sums them up (prometheus_client multiprocess mode)
+MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+
+# From sub-millisecond cache lookups up to downloads that hit their deadline
+LATENCY_BUCKETS = (.001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10, 30)
+SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024)
+
+STAGE_SECONDS = Histogram(
+    "news_stage_seconds", "Wall time spent per pipeline stage",
+    ["stage"], buckets=LATENCY_BUCKETS,
+)
+BATCH_SIZE = Histogram(
+    "news_batch_size", "Items handled together per batch",
+    ["stage"], buckets=SIZE_BUCKETS,
+)
+QUEUE_LAG = Gauge(
+    "news_queue_lag_seconds", "How long the items last taken off a queue had been waiting",
+    ["queue"], multiprocess_mode="livemax",
+)
+CACHE_REQUESTS = Counter(
+    "news_cache_requests", "Cache lookups by result (hit or miss)",
+    ["cache", "result"],
+)
+
+
+def timed(stage):
+    # Context manager and decorator: records wall time under `stage`
+    return STAGE_SECONDS.labels(stage).time()
+
+
+def observe_batch(stage, size):
+    BATCH_SIZE.labels(stage).observe(size)
+
+
+def observe_lag(queue, seconds):
+    QUEUE_LAG.labels(queue).set(max(seconds, 0.0))
+
+
+def count_cache(cache, hits, misses):
+    # Hit rate is rate(hit) / rate(hit + miss) on the Prometheus side
+    if hits:
+        CACHE_REQUESTS.labels(cache, "hit").inc(hits)
+    if misses:
+        CACHE_REQUESTS.labels(cache, "miss").inc(misses)
+
+
+def registry():
+    if not MULTIPROC_DIR:
+        return REGISTRY
+    collected = CollectorRegistry()
+    multiprocess.MultiProcessCollector(collected)
+    return collected
+
+
+def serve(port=METRICS_PORT):
+    # Prometheus endpoint on a daemon thread, for services without an HTTP
+    # server of their own. In multiprocess mode call it before starting
+    # workers: it clears the files left by the previous run.
+    if not port:
+        return
+    if MULTIPROC_DIR:
+        shutil.rmtree(MULTIPROC_DIR, ignore_errors=True)
+        os.makedirs(MULTIPROC_DIR, exist_ok=True)
+    start_http_server(port, registry=registry())
+    logger.info(f"Metrics on :{port}/metrics")
+
+
+def asgi_app():
+    # For services that already run an ASGI app: app.mount("/metrics", ...)
+    return make_asgi_app(registry=registry())
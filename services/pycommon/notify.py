@@ -0,0 +1,58 @@
+import logging
+import select
+import time
+
+import psycopg2
+from psycopg2 import sql
+from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
+
+logger = logging.getLogger(__name__)
+
+
+# Blocks an idle worker until Postgres NOTIFYs its channel (triggers in
+# infra/postgres/16_work_notify.sql) or `timeout` passes. Polling stays the
+# fallback: on timeout, or if the listener connection is down, the caller
+# simply checks for work as it did before.
+class WorkListener:
+    def __init__(self, channel, **connect_kwargs):
+        self.channel = channel
+        self.connect_kwargs = connect_kwargs
+        self.conn = None
+
+    def _connect(self):
+        conn = psycopg2.connect(**self.connect_kwargs)
+        conn.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+        with conn.cursor() as cur:
+            cur.execute(sql.SQL("LISTEN {}").format(sql.Identifier(self.channel)))
+        self.conn = conn
+
+    def _drain(self):
+        # Notifications that arrived while the worker was busy count too
+        self.conn.poll()
+        woken = bool(self.conn.notifies)
+        self.conn.notifies.clear()
+        return woken
+
+    def wait(self, timeout):
+        # True when woken by a notification, False on timeout
+        try:
+            if self.conn is None or self.conn.closed:
+                self._connect()
+            if self._drain():
+                return True
+            if select.select([self.conn], [], [], timeout) == ([], [], []):
+                return False
+            return self._drain()
+        except (psycopg2.Error, OSError) as e:
+            logger.warning(f"LISTEN {self.channel} unavailable, polling: {e}")
+            self.close()
+            time.sleep(timeout)
+            return False
+
+    def close(self):
+        if self.conn is not None:
+            try:
+                self.conn.close()
+            except Exception:
+                pass
+            self.conn = None
@@ -0,0 +1,74 @@
+import atexit
+import logging
+import os
+import signal
+import sys
+import threading
+import time
+from collections import Counter
+
+logger = logging.getLogger(__name__)
+
+# Samples per second; 0 (the default) leaves the profiler off
+PROFILE_HZ = float(os.getenv("PROFILE_HZ", "0"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", "/tmp")
+
+
+# In-process sampling profiler. A daemon thread snapshots every thread's
+# stack PROFILE_HZ times a second and counts them in the collapsed ("folded")
+# format that flamegraph.pl and speedscope read. Cost is one stack walk per
+# thread per sample, so it can stay on in production at low rates.
+class SamplingProfiler:
+    def __init__(self, hz=PROFILE_HZ):
+        self.interval = 1.0 / hz
+        self.stacks = Counter()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        me = threading.get_ident()
+        names = {}
+        while True:
+            time.sleep(self.interval)
+            for thread in threading.enumerate():
+                names[thread.ident] = thread.name
+            samples = []
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                samples.append(";".join(reversed(stack)))
+            with self._lock:
+                self.stacks.update(samples)
+
+    def dump(self, path):
+        with self._lock:
+            stacks = self.stacks.most_common()
+        with open(path, "w") as f:
+            for stack, count in stacks:
+                f.write(f"{stack} {count}\n")
+        logger.info(f"Wrote {len(stacks)} sampled stacks to {path}")
+
+
+def install(service):
+    # Starts the profiler when PROFILE_HZ is set. The folded stacks go to
+    # PROFILE_DIR/<service>-<pid>.folded at exit and on SIGUSR1.
+    if PROFILE_HZ <= 0:
+        return None
+    profiler = SamplingProfiler(PROFILE_HZ)
+    profiler.start()
+    path = os.path.join(PROFILE_DIR, f"{service}-{os.getpid()}.folded")
+    atexit.register(profiler.dump, path)
+    if threading.current_thread() is threading.main_thread():
+        signal.signal(signal.SIGUSR1, lambda signum, frame: profiler.dump(path))
+    logger.info(f"Sampling profiler at {PROFILE_HZ:g} Hz, dumping to {path}")
+    return profiler
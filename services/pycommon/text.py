@@ -0,0 +1,7 @@
+import unicodedata
+
+
+def normalize_text(text):
+    # Same text modulo unicode form and whitespace -> same cache entry.
+    # Callers must process the normalized text so cache hits are exact.
+    return " ".join(unicodedata.normalize("NFC", text).split())
@@ -0,0 +1,155 @@
+import http.client
+import json
+import os
+import queue
+import socket
+import threading
+import time
+
+import uvicorn
+
+from replay import sqlshim
+from replay.fakes import FakeEncoder
+
+# Serves embedding-service's app with uvicorn on a local port and replays
+# article titles against it from --clients threads, as the indexer calls
+# it: POST /embed, or with --embed-endpoint match the /match flow, which
+# opens a cluster (a row in the shim plus POST /clusters) when no cluster
+# is close enough. ClusterSync reads the same shim. The indexer's pgvector
+# check after a miss is left out (SQLite has no vector distance).
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class Client:
+    def __init__(self, port):
+        self.port = port
+        self.conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+        self.rejected = 0
+
+    def post(self, path, body):
+        # Waits out 503s (queue full) the way a well-behaved caller would
+        payload = json.dumps(body)
+        while True:
+            self.conn.request("POST", path, payload, {"Content-Type": "application/json"})
+            resp = self.conn.getresponse()
+            data = resp.read()
+            if resp.status != 503:
+                break
+            self.rejected += 1
+            time.sleep(float(resp.getheader("Retry-After") or 1))
+        if resp.status >= 400:
+            raise RuntimeError(f"POST {path}: {resp.status} {data[:200]!r}")
+        return json.loads(data) if data else None
+
+    def ready(self):
+        try:
+            self.conn.request("GET", "/health")
+            resp = self.conn.getresponse()
+            resp.read()
+            return resp.status == 200
+        except (OSError, http.client.HTTPException):
+            self.conn.close()
+            return False
+
+
+def wait_ready(port, timeout):
+    client = Client(port)
+    deadline = time.monotonic() + timeout
+    while not client.ready():
+        if time.monotonic() > deadline:
+            raise RuntimeError(f"embedding service not ready after {timeout:.0f}s")
+        time.sleep(0.2)
+
+
+def replay(payloads, args, workdir):
+    db_path = os.path.join(workdir, "replay.db")
+    sqlshim.create(db_path)
+    round_trips = sqlshim.patch(db_path, rtt_ms=args.db_rtt_ms)
+    import main
+    from replay import report
+
+    if args.stub_models:
+        main.load_backend = lambda *a, **kw: FakeEncoder(main.DIMENSIONS)
+
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(main.app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, name="uvicorn", daemon=True)
+    thread.start()
+    # Model load and warm-up stay out of the measurement
+    wait_ready(port, args.ready_timeout)
+
+    titles = queue.Queue()
+    for payload in payloads:
+        titles.put(payload.get("title") or "untitled")
+    latencies = []
+    counts = {"created": 0, "matched": 0, "rejected": 0}
+    errors = []
+    lock = threading.Lock()
+
+    def work():
+        client = Client(port)
+        conn = sqlshim.Connection(db_path, rtt=args.db_rtt_ms / 1000.0, stats=round_trips)
+        created = matched = 0
+        try:
+            while True:
+                try:
+                    title = titles.get_nowait()
+                except queue.Empty:
+                    break
+                started = time.perf_counter()
+                if args.embed_endpoint == "embed":
+                    client.post("/embed", {"text": title})
+                else:
+                    found = client.post("/match", {"text": title, "max_distance": 0.22, "window_hours": 24})
+                    with conn.cursor() as cur:
+                        if found["cluster_id"] is None:
+                            cur.execute(
+                                "INSERT INTO clusters (title, embedding, last_updated_at) VALUES (%s, %s, NOW()) "
+                                "RETURNING id",
+                                (title, "[" + ",".join(map(str, found["vector"])) + "]"),
+                            )
+                            cluster_id = cur.fetchone()[0]
+                            conn.commit()
+                            client.post("/clusters", {"id": cluster_id, "vector": found["vector"]})
+                            created += 1
+                        else:
+                            cur.execute("UPDATE clusters SET last_updated_at = NOW() WHERE id = %s",
+                                        (found["cluster_id"],))
+                            conn.commit()
+                            matched += 1
+                with lock:
+                    latencies.append(time.perf_counter() - started)
+        except Exception as e:
+            errors.append(e)
+        finally:
+            conn.close()
+            with lock:
+                counts["created"] += created
+                counts["matched"] += matched
+                counts["rejected"] += client.rejected
+
+    start = time.perf_counter()
+    clients = [threading.Thread(target=work, name=f"client-{i}") for i in range(args.clients)]
+    for client in clients:
+        client.start()
+    for client in clients:
+        client.join()
+    seconds = time.perf_counter() - start
+
+    server.should_exit = True
+    thread.join(10)
+    if errors:
+        raise errors[0]
+
+    extra = {"endpoint": f"/{args.embed_endpoint}", "clients": args.clients, "rejected_503": counts["rejected"],
+             "model": "stub" if args.stub_models else "real"}
+    if args.embed_endpoint == "match":
+        extra.update(clusters_created=counts["created"], clusters_matched=counts["matched"],
+                     db_round_trips=round_trips.count)
+    return report.result("embedding-service", len(latencies), seconds, extra,
+                         samples={"client_request": latencies})
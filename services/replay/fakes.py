@@ -0,0 +1,198 @@
+import threading
+import time
+import zlib
+
+import numpy as np
+from botocore.exceptions import ClientError
+
+# In-process stand-ins for the confluent_kafka Consumer/Producer and the
+# boto3 S3 client, with the subset of each API the services call. Latencies
+# are charged per call so a replay can model a remote broker or bucket.
+# The model stand-ins (--stub-models) take the models out of the measurement
+# to isolate what the services themselves cost.
+
+# confluent_kafka.TIMESTAMP_CREATE_TIME
+TIMESTAMP_CREATE_TIME = 1
+
+
+class FakeMessage:
+    def __init__(self, topic, partition, offset, value, timestamp_ms):
+        self._topic = topic
+        self._partition = partition
+        self._offset = offset
+        self._value = value
+        self._timestamp = timestamp_ms
+
+    def topic(self):
+        return self._topic
+
+    def partition(self):
+        return self._partition
+
+    def offset(self):
+        return self._offset
+
+    def value(self):
+        return self._value
+
+    def error(self):
+        return None
+
+    def timestamp(self):
+        return TIMESTAMP_CREATE_TIME, self._timestamp
+
+
+# Hands out recorded values round-robin over `partitions`, with offsets per
+# partition and "now" as the create time. Once every message has been polled
+# and `done()` says the output side has caught up, on_exhausted is called
+# once (the replay uses it to stop the service's main loop).
+class FakeConsumer:
+    def __init__(self, values, topic, partitions=3, on_exhausted=None, done=None):
+        self.topic = topic
+        self.partitions = partitions
+        self.on_exhausted = on_exhausted
+        self.done = done or (lambda: True)
+        self.commits = 0
+        self.committed = {}
+        self._values = list(values)
+        self._position = 0
+        self._offsets = [0] * partitions
+        self._exhausted = False
+
+    def subscribe(self, topics, on_assign=None, on_revoke=None):
+        pass
+
+    def poll(self, timeout=None):
+        if self._position < len(self._values):
+            partition = self._position % self.partitions
+            offset = self._offsets[partition]
+            self._offsets[partition] += 1
+            value = self._values[self._position]
+            self._position += 1
+            return FakeMessage(self.topic, partition, offset, value, int(time.time() * 1000))
+        if not self._exhausted and self.done():
+            self._exhausted = True
+            if self.on_exhausted:
+                self.on_exhausted()
+        time.sleep(min(timeout or 0, 0.01))
+        return None
+
+    def commit(self, offsets=None, asynchronous=True):
+        self.commits += 1
+        for tp in offsets or ():
+            self.committed[(tp.topic, tp.partition)] = tp.offset
+
+    def close(self):
+        pass
+
+
+# Queues produce() calls and "delivers" them on poll()/flush() after
+# `latency` seconds, calling the delivery callbacks like librdkafka does.
+class FakeProducer:
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.delivered = []
+        self._queue = []
+        self._lock = threading.Lock()
+
+    def produce(self, topic, value, callback=None):
+        with self._lock:
+            self._queue.append((time.monotonic() + self.latency, topic, value, callback))
+
+    def poll(self, timeout=0):
+        deadline = time.monotonic() + (timeout or 0)
+        while True:
+            now = time.monotonic()
+            with self._lock:
+                ready = [item for item in self._queue if item[0] <= now]
+                self._queue = [item for item in self._queue if item[0] > now]
+            for _, topic, value, callback in ready:
+                self.delivered.append(value)
+                if callback:
+                    callback(None, None)
+            if ready or now >= deadline:
+                return len(ready)
+            time.sleep(min(deadline - now, 0.001))
+
+    def flush(self, timeout=None):
+        while len(self):
+            self.poll(0.01)
+        return 0
+
+    def __len__(self):
+        with self._lock:
+            return len(self._queue)
+
+
+# put_object/head_object/create_bucket against a dict, with per-request
+# latency; head_object misses raise the 404 ClientError boto3 would
+class FakeS3:
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.objects = {}
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def _request(self):
+        with self._lock:
+            self.requests += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def create_bucket(self, Bucket, **kwargs):
+        self._request()
+
+    def head_object(self, Bucket, Key, **kwargs):
+        self._request()
+        with self._lock:
+            size = self.objects.get((Bucket, Key))
+        if size is None:
+            raise ClientError({"Error": {"Code": "404", "Message": "Not Found"}}, "HeadObject")
+        return {"ContentLength": size}
+
+    def put_object(self, Bucket, Key, Body, **kwargs):
+        self._request()
+        with self._lock:
+            self.objects[(Bucket, Key)] = len(Body)
+        return {}
+
+
+# transformers sentiment pipeline: fixed cost per forward pass plus per text,
+# labels derived from the text
+class FakeSentimentPipeline:
+    labels = ("positive", "negative", "neutral")
+
+    def __init__(self, call_ms=8.0, text_ms=1.5):
+        self.call_s = call_ms / 1000.0
+        self.text_s = text_ms / 1000.0
+
+    def __call__(self, texts, batch_size=1, **kwargs):
+        single = isinstance(texts, str)
+        batch = [texts] if single else list(texts)
+        passes = -(-len(batch) // max(batch_size, 1))
+        time.sleep(self.call_s * passes + self.text_s * len(batch))
+        return [
+            {"label": self.labels[zlib.crc32(text.encode("utf-8")) % 3], "score": 0.5 + (len(text) % 50) / 100.0}
+            for text in batch
+        ]
+
+
+# Embedding backend (embedding-service backends.py interface): the same unit
+# vector for the same text, so near-identical titles do not match but
+# syndicated copies do
+class FakeEncoder:
+    cache_id = "replay:fake"
+
+    def __init__(self, dimensions=384, call_ms=5.0, text_ms=1.0):
+        self.dimensions = dimensions
+        self.call_s = call_ms / 1000.0
+        self.text_s = text_ms / 1000.0
+
+    def encode(self, texts, batch_size=32):
+        passes = -(-len(texts) // max(batch_size, 1))
+        time.sleep(self.call_s * passes + self.text_s * len(texts))
+        vectors = np.stack([
+            np.random.default_rng(zlib.crc32(text.encode("utf-8"))).standard_normal(self.dimensions)
+            for text in texts
+        ]).astype(np.float32)
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
@@ -0,0 +1,58 @@
+import json
+import os
+import signal
+import time
+
+import boto3
+
+from replay.fakes import FakeConsumer, FakeProducer, FakeS3
+
+# Runs image-ranker's own main loop (main.run) over the payloads: fake
+# Kafka in, fake Kafka and fake S3 out, candidate images from the fixture
+# hosts (their URLs are rewritten by the caller). The consumer stops the
+# loop with SIGTERM once it has handed out every message, which is the
+# service's normal shutdown: drain, flush, commit.
+
+
+def use_fake_s3():
+    # Before main is imported: it builds its S3 client at import time
+    latency = float(os.environ.get("REPLAY_S3_LATENCY_MS", "0")) / 1000.0
+    boto3.client = lambda *args, **kwargs: FakeS3(latency)
+
+
+def init_worker():
+    # Pool worker initializer (spawned processes import main afresh)
+    use_fake_s3()
+    import main
+    main.init_worker()
+
+
+def replay(payloads, args, workdir):
+    os.environ["REPLAY_S3_LATENCY_MS"] = str(args.s3_latency_ms)
+    use_fake_s3()
+    import main
+    from replay import report
+
+    values = [json.dumps(payload).encode("utf-8") for payload in payloads]
+    consumer = FakeConsumer(values, "parsed-articles", partitions=args.partitions,
+                            on_exhausted=lambda: signal.raise_signal(signal.SIGTERM))
+    producer = FakeProducer(latency=args.kafka_latency_ms / 1000.0)
+    main.create_consumer = lambda: consumer
+    main.create_producer = lambda: producer
+    main.init_worker = init_worker
+
+    start = time.perf_counter()
+    main.run()
+    seconds = time.perf_counter() - start
+
+    enriched = [json.loads(value) for value in producer.delivered]
+    extra = {
+        "workers": main.RANKER_WORKERS or "inline",
+        "delivered": len(enriched),
+        "with_image": sum(1 for article in enriched if article.get("bestImage")),
+        "commits": consumer.commits,
+    }
+    if not main.RANKER_WORKERS:
+        extra["s3_requests"] = main.s3.requests
+        extra["s3_objects"] = len(main.s3.objects)
+    return report.result("image-ranker", len(enriched), seconds, extra)
@@ -0,0 +1,197 @@
+import hashlib
+import os
+import sys
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+from urllib.parse import urlsplit
+
+import numpy as np
+from PIL import Image
+
+# What an image URL on a news page turns out to be, by share of candidates:
+# (kind, weight, format, sizes)
+KINDS = [
+    ("photo", 35, "JPEG", [(2400, 1350), (2048, 1152), (1600, 900)]),
+    ("medium", 20, "JPEG", [(1200, 675), (1024, 576), (800, 450)]),
+    ("webp", 10, "WEBP", [(1200, 675), (1600, 900)]),
+    ("png", 5, "PNG", [(1000, 563), (800, 800)]),
+    ("icon", 10, "PNG", [(64, 64), (120, 120), (32, 32)]),
+    ("banner", 5, "JPEG", [(1200, 120), (970, 90)]),
+    ("pixel", 5, "GIF", [(1, 1)]),
+    ("missing", 7, None, [(0, 0)]),
+    ("error", 3, None, [(0, 0)]),
+]
+TOTAL_WEIGHT = sum(kind[1] for kind in KINDS)
+
+# Distinct source photos and crops per photo. Two URLs that land on the same
+# (photo, crop) serve the same picture, possibly at another size: what
+# syndicated copies of a wire photo look like to the perceptual dedup.
+BASE_PHOTOS = 24
+CROPS = 200
+BASE_SIZE = (2600, 1600)
+
+
+def spec_for(url):
+    # (kind, format, width, height, photo, crop), stable per URL
+    digest = int.from_bytes(hashlib.sha1(url.encode("utf-8")).digest()[:8], "big")
+    pick = digest % TOTAL_WEIGHT
+    for kind, weight, fmt, sizes in KINDS:
+        if pick < weight:
+            break
+        pick -= weight
+    width, height = sizes[(digest >> 16) % len(sizes)]
+    return kind, fmt, width, height, (digest >> 24) % BASE_PHOTOS, (digest >> 32) % CROPS
+
+
+def base_photo(index):
+    # Photo-like: smooth gradients plus sensor noise, so blur scoring and
+    # JPEG sizes behave as they do on real pictures
+    width, height = BASE_SIZE
+    rng = np.random.default_rng(index)
+    x = np.arange(width, dtype=np.float32)
+    y = np.arange(height, dtype=np.float32)
+    phase = rng.uniform(0, 6.28, size=3)
+    scale = rng.uniform(200, 900, size=3)
+    pixels = np.empty((height, width, 3), dtype=np.uint8)
+    for c in range(3):
+        channel = 127 + 100 * np.outer(np.cos(y / scale[(c + 1) % 3]), np.sin(x / scale[c] + phase[c]))
+        channel += rng.integers(-30, 30, size=(height, width), dtype=np.int16)
+        pixels[..., c] = np.clip(channel, 0, 255)
+    return pixels
+
+
+def render(spec, pixels):
+    kind, fmt, width, height, photo, crop = spec
+    rng = np.random.default_rng(crop)
+    # Crop at the target aspect ratio, then scale to the target size
+    crop_w = min(BASE_SIZE[0], max(width, int(BASE_SIZE[1] * width / max(height, 1))))
+    crop_h = min(BASE_SIZE[1], max(1, int(crop_w * height / max(width, 1))))
+    left = int(rng.integers(0, BASE_SIZE[0] - crop_w + 1))
+    top = int(rng.integers(0, BASE_SIZE[1] - crop_h + 1))
+    image = Image.fromarray(pixels[top:top + crop_h, left:left + crop_w]).resize((width, height))
+    out = BytesIO()
+    image.save(out, format=fmt, quality=88)
+    return out.getvalue()
+
+
+# Rendered fixtures by spec, kept on disk under cache_dir between runs
+class ImageLibrary:
+    def __init__(self, cache_dir=None):
+        self.cache_dir = cache_dir
+        self._images = {}
+
+    def _path(self, spec):
+        return os.path.join(self.cache_dir, "-".join(str(part) for part in spec))
+
+    def prepare(self, specs, workers=None):
+        # Render everything up front so no replay pays for fixture
+        # generation; one base photo in memory at a time
+        by_photo = {}
+        for spec in set(specs):
+            if spec[1] is None:
+                self._images[spec] = None
+            elif spec not in self._images:
+                by_photo.setdefault(spec[4], []).append(spec)
+
+        with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+            for photo, group in sorted(by_photo.items()):
+                cached = [spec for spec in group if self.cache_dir and os.path.exists(self._path(spec))]
+                for spec in cached:
+                    with open(self._path(spec), "rb") as f:
+                        self._images[spec] = f.read()
+                group = [spec for spec in group if spec not in self._images]
+                if not group:
+                    continue
+                pixels = base_photo(photo)
+                for spec, body in zip(group, pool.map(lambda spec: render(spec, pixels), group)):
+                    self._images[spec] = body
+                    if self.cache_dir:
+                        os.makedirs(self.cache_dir, exist_ok=True)
+                        with open(self._path(spec), "wb") as f:
+                            f.write(body)
+
+    def get(self, spec):
+        return self._images.get(spec)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        hosts = self.server.hosts
+        spec = hosts.routes.get((self.server.index, self.path))
+        if hosts.latency:
+            time.sleep(hosts.latency)
+        if spec is None or spec[0] == "missing":
+            return self._reply(404, b"not found", "text/plain")
+        if spec[0] == "error":
+            return self._reply(503, b"unavailable", "text/plain")
+        fmt = spec[1].lower()
+        self._reply(200, hosts.library.get(spec), f"image/{fmt}")
+
+    def _reply(self, status, body, content_type):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        try:
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # Probe read the header and hung up
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Header probes and abandoned downloads reset the connection mid-request
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+# Local stand-ins for the image hosts behind recorded candidate URLs. Each
+# original host maps to one of `hosts` servers, bound to its own loopback
+# address (127.0.0.N) so per-host limits and the circuit breaker see
+# distinct hosts. Every response waits `latency` seconds first.
+class ImageHosts:
+    def __init__(self, hosts=8, latency=0.0, cache_dir=None):
+        self.latency = latency
+        self.library = ImageLibrary(cache_dir)
+        self.routes = {}
+        self._servers = []
+        for index in range(hosts):
+            try:
+                server = _Server((f"127.0.0.{index + 1}", 0), _Handler)
+            except OSError:
+                # Only 127.0.0.1 is configured (macOS): hosts differ by port
+                server = _Server(("127.0.0.1", 0), _Handler)
+            server.hosts = self
+            server.index = index
+            self._servers.append(server)
+
+    def rewrite(self, url):
+        # Fixture URL serving what `url` stands for, on the server its host maps to
+        index = zlib.crc32((urlsplit(url).hostname or "").encode("utf-8")) % len(self._servers)
+        path = "/" + hashlib.sha1(url.encode("utf-8")).hexdigest()[:20]
+        self.routes[(index, path)] = spec_for(url)
+        host, port = self._servers[index].server_address[:2]
+        return f"http://{host}:{port}{path}"
+
+    def prepare(self):
+        self.library.prepare(self.routes.values())
+
+    def start(self):
+        for server in self._servers:
+            threading.Thread(target=server.serve_forever, name="image-host", daemon=True).start()
+
+    def stop(self):
+        for server in self._servers:
+            server.shutdown()
+            server.server_close()
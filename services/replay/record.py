@@ -0,0 +1,154 @@
+"""Record parsed-articles payloads for replay, or generate synthetic ones.
+
+From Kafka: reads --count messages off the parsed-articles topic with a
+throwaway consumer group (nothing is committed, the live consumers are not
+affected) and writes one payload per line.
+
+    python -m replay.record --broker localhost:9092 --count 500 --out articles.jsonl
+
+--synthetic writes deterministic payloads in the parser's output shape
+instead (mixed languages, 1-8 image candidates, syndicated copies), which is
+also what replay.run uses when no --payloads file is given.
+
+    python -m replay.record --synthetic 500 --out articles.jsonl
+"""
+import argparse
+import json
+import random
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+WORDS = {
+    "en": ("government announces new measures to support the economy as markets rally after "
+           "election results storm forces evacuations along the coast court rules on merger "
+           "inflation cools ministers meet for budget talks wildfire spreads record heat").split(),
+    "ru": ("правительство объявило новые меры поддержки экономики выборы пройдут в сентябре "
+           "рынок акций вырос погода жара продлится до конца недели суд вынес решение").split(),
+    "es": ("el gobierno anuncia nuevas medidas para apoyar la economía mientras los mercados "
+           "suben tras las elecciones una tormenta obliga a evacuar la costa").split(),
+    "de": ("die regierung kündigt neue maßnahmen zur stützung der wirtschaft an die märkte "
+           "steigen nach der wahl ein sturm erzwingt evakuierungen an der küste").split(),
+    "fr": ("le gouvernement annonce de nouvelles mesures pour soutenir l'économie les marchés "
+           "progressent après les élections une tempête force des évacuations").split(),
+}
+# Share of articles per language
+LANGUAGES = [("en", 60), ("ru", 10), ("es", 12), ("de", 10), ("fr", 8)]
+SOURCES = ["example-news.com", "dailywire.example", "globalpost.example", "noticias.example",
+           "nachrichten.example", "novosti.example", "infos.example", "metro.example"]
+IMAGE_HOSTS = ["cdn.example-news.com", "images.dailywire.example", "static.globalpost.example",
+               "img.noticias.example", "media.nachrichten.example", "cdn.novosti.example",
+               "i.infos.example", "wire-photos.example"]
+SOURCE_TYPES = [("og", 1.0), ("twitter", 0.9), ("schema", 0.85), ("body", 0.5)]
+
+
+def sentence(rng, words, low, high):
+    return " ".join(rng.choice(words) for _ in range(rng.randint(low, high)))
+
+
+def candidates(rng, article_url):
+    result = []
+    for i in range(rng.randint(1, 8)):
+        # Meta tags first, then body images
+        source_type, modifier = SOURCE_TYPES[i] if i < 3 else SOURCE_TYPES[-1]
+        host = rng.choice(IMAGE_HOSTS)
+        name = uuid.UUID(int=rng.getrandbits(128)).hex[:16]
+        result.append({
+            "url": f"https://{host}/{rng.randint(2024, 2026)}/{rng.randint(1, 12):02d}/{name}.jpg",
+            "sourceType": source_type,
+            "scoreModifier": modifier,
+            "referer": article_url,
+        })
+    return result
+
+
+def synthetic(count, seed=7, duplicates=0.15):
+    rng = random.Random(seed)
+    start = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    languages = [lang for lang, share in LANGUAGES for _ in range(share)]
+    payloads = []
+    for i in range(count):
+        published = start + timedelta(minutes=7 * i)
+        if payloads and rng.random() < duplicates:
+            # Syndicated copy: same story and photos, another outlet and URL
+            copy = dict(rng.choice(payloads))
+            source = rng.randrange(len(SOURCES))
+            copy["originalUrl"] = f"https://{SOURCES[source]}/story/{i}"
+            copy["canonicalUrl"] = copy["originalUrl"]
+            copy["source_id"] = source + 1
+            copy["publishedTime"] = published.isoformat()
+            payloads.append(copy)
+            continue
+
+        words = WORDS[rng.choice(languages)]
+        source = rng.randrange(len(SOURCES))
+        url = f"https://{SOURCES[source]}/story/{i}"
+        paragraphs = [sentence(rng, words, 40, 90) for _ in range(rng.randint(3, 12))]
+        text = "\n\n".join(paragraphs)
+        payloads.append({
+            "title": sentence(rng, words, 6, 14).capitalize(),
+            "content": "".join(f"<p>{p}</p>" for p in paragraphs),
+            "textContent": text,
+            "excerpt": text[:300],
+            "author": None if rng.random() < 0.3 else f"Reporter {rng.randint(1, 40)}",
+            "publishedTime": published.isoformat(),
+            "canonicalUrl": url,
+            "imageCandidates": candidates(rng, url),
+            "originalUrl": url,
+            "source_id": source + 1,
+            "fetched_at": published.isoformat(),
+        })
+    return payloads
+
+
+def record(broker, count, timeout):
+    from confluent_kafka import Consumer
+
+    consumer = Consumer({
+        "bootstrap.servers": broker,
+        "group.id": f"replay-recorder-{uuid.uuid4().hex[:8]}",
+        "auto.offset.reset": "earliest",
+        "enable.auto.commit": False,
+    })
+    consumer.subscribe(["parsed-articles"])
+    payloads = []
+    deadline = time.monotonic() + timeout
+    try:
+        while len(payloads) < count and time.monotonic() < deadline:
+            msg = consumer.poll(1.0)
+            if msg is None or msg.error():
+                continue
+            payloads.append(json.loads(msg.value().decode("utf-8")))
+    finally:
+        consumer.close()
+    return payloads
+
+
+def load(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def save(payloads, path):
+    with open(path, "w", encoding="utf-8") as f:
+        for payload in payloads:
+            f.write(json.dumps(payload, ensure_ascii=False) + "\n")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Record parsed-articles payloads for replay")
+    parser.add_argument("--out", required=True)
+    parser.add_argument("--broker", default="localhost:9092")
+    parser.add_argument("--count", type=int, default=500)
+    parser.add_argument("--timeout", type=float, default=60, help="stop recording after this many seconds")
+    parser.add_argument("--synthetic", type=int, metavar="N", help="write N generated payloads instead")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    if args.synthetic:
+        payloads = synthetic(args.synthetic, args.seed)
+    else:
+        payloads = record(args.broker, args.count, args.timeout)
+    save(payloads, args.out)
+    print(f"Wrote {len(payloads)} payloads to {args.out}", file=sys.stderr)
@@ -0,0 +1,148 @@
+import json
+import resource
+import sys
+
+from pycommon import metrics
+
+# ru_maxrss is KiB on Linux, bytes on macOS
+RSS_UNIT = 1 if sys.platform == "darwin" else 1024
+
+
+def peak_rss_mib(who=resource.RUSAGE_SELF):
+    return resource.getrusage(who).ru_maxrss * RSS_UNIT / (1024 * 1024)
+
+
+def bucket_quantile(buckets, count, q):
+    # Linear interpolation inside the histogram bucket holding the q-th
+    # observation, as Prometheus' histogram_quantile does
+    rank = q * count
+    lower, below = 0.0, 0.0
+    for upper, cumulative in buckets:
+        if cumulative >= rank:
+            if upper == float("inf"):
+                return lower
+            inside = cumulative - below
+            return lower + (upper - lower) * ((rank - below) / inside if inside else 0)
+        lower, below = upper, cumulative
+    return lower
+
+
+def stage_stats():
+    # {stage: {...}} from the news_stage_seconds histogram the services record
+    # (pycommon.metrics), summed over processes in multiprocess mode
+    series = {}
+    for family in metrics.registry().collect():
+        if family.name != "news_stage_seconds":
+            continue
+        for sample in family.samples:
+            stage = series.setdefault(sample.labels["stage"], {"buckets": {}, "count": 0, "sum": 0.0})
+            if sample.name.endswith("_bucket"):
+                le = float(sample.labels["le"])
+                stage["buckets"][le] = stage["buckets"].get(le, 0) + sample.value
+            elif sample.name.endswith("_count"):
+                stage["count"] += sample.value
+            elif sample.name.endswith("_sum"):
+                stage["sum"] += sample.value
+
+    stats = {}
+    for name, stage in series.items():
+        count = int(stage["count"])
+        if not count:
+            continue
+        buckets = sorted(stage["buckets"].items())
+        stats[name] = {
+            "count": count,
+            "mean_ms": stage["sum"] / count * 1000,
+            "p50_ms": bucket_quantile(buckets, count, 0.5) * 1000,
+            "p95_ms": bucket_quantile(buckets, count, 0.95) * 1000,
+            "total_s": stage["sum"],
+        }
+    return stats
+
+
+def sample_stats(seconds):
+    # Same shape from exact samples (client-side timings)
+    values = sorted(seconds)
+    if not values:
+        return None
+
+    def pick(q):
+        return values[min(len(values) - 1, int(q * len(values)))] * 1000
+
+    return {
+        "count": len(values),
+        "mean_ms": sum(values) / len(values) * 1000,
+        "p50_ms": pick(0.5),
+        "p95_ms": pick(0.95),
+        "total_s": sum(values),
+    }
+
+
+def result(service, articles, seconds, extra=None, samples=None):
+    stages = stage_stats()
+    for name, values in (samples or {}).items():
+        stats = sample_stats(values)
+        if stats:
+            stages[name] = stats
+    return {
+        "service": service,
+        "articles": articles,
+        "seconds": seconds,
+        "articles_per_sec": articles / seconds if seconds else 0.0,
+        "peak_rss_mib": peak_rss_mib(),
+        "children_peak_rss_mib": peak_rss_mib(resource.RUSAGE_CHILDREN),
+        "stages": stages,
+        "extra": extra or {},
+    }
+
+
+def render(result, baseline=None):
+    lines = []
+    rss = f"peak RSS {result['peak_rss_mib']:.0f} MiB"
+    if result["children_peak_rss_mib"]:
+        rss += f" (largest worker {result['children_peak_rss_mib']:.0f} MiB)"
+    line = (f"{result['service']}: {result['articles']} articles in {result['seconds']:.2f}s = "
+            f"{result['articles_per_sec']:,.1f} articles/s, {rss}")
+    if baseline:
+        throughput = change(baseline["articles_per_sec"], result["articles_per_sec"])
+        rss_change = change(baseline["peak_rss_mib"], result["peak_rss_mib"])
+        line += f"  [{throughput} articles/s, {rss_change} RSS vs baseline]"
+    lines.append(line)
+    if result["extra"]:
+        lines.append("  " + ", ".join(f"{key}={value}" for key, value in result["extra"].items()))
+    if result["stages"]:
+        lines.append(f"  {'stage':<22} {'count':>7} {'mean ms':>9} {'p50 ms':>9} {'p95 ms':>9} {'total s':>9}")
+        for name, stage in sorted(result["stages"].items(), key=lambda item: -item[1]["total_s"]):
+            lines.append(f"  {name:<22} {stage['count']:>7} {stage['mean_ms']:>9.2f} {stage['p50_ms']:>9.2f} "
+                         f"{stage['p95_ms']:>9.2f} {stage['total_s']:>9.2f}")
+    return "\n".join(lines)
+
+
+def change(before, after):
+    if not before:
+        return "n/a"
+    return f"{(after - before) / before * 100:+.1f}%"
+
+
+def regressions(results, baseline, tolerance):
+    # Services slower, or heavier, than the baseline by more than tolerance
+    found = []
+    for name, current in results.items():
+        before = baseline.get(name)
+        if not before:
+            continue
+        if current["articles_per_sec"] < before["articles_per_sec"] * (1 - tolerance):
+            found.append(f"{name}: {change(before['articles_per_sec'], current['articles_per_sec'])} articles/s")
+        if current["peak_rss_mib"] > before["peak_rss_mib"] * (1 + tolerance):
+            found.append(f"{name}: {change(before['peak_rss_mib'], current['peak_rss_mib'])} peak RSS")
+    return found
+
+
+def save(results, path):
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+
+
+def load(path):
+    with open(path) as f:
+        return json.load(f)
@@ -0,0 +1,194 @@
+"""Offline replay benchmark for the Python services: articles/sec, per-stage
+latency and peak RSS, with no Kafka, MinIO, Postgres or translator needed.
+
+Recorded parsed-articles payloads (replay.record; synthetic ones by default)
+are pushed through each service's own main loop or worker function:
+
+    image-ranker        main.run() on fake Kafka and S3, images from local
+                        fixture hosts (--image-latency-ms per response)
+    sentiment-engine    run_worker() on the SQLite shim until idle
+    translation-engine  process_translations() on the shim, stub provider
+                        (--translate-latency-ms per request)
+    embedding-service   uvicorn + /embed (or the /match flow) from --clients
+
+Each service runs in a fresh process, so its peak RSS is its own. Stage
+latencies come from the news_stage_seconds histograms the services record
+(p50/p95 interpolated within buckets). Service settings are read from the
+environment as usual (e.g. RANKER_WORKERS, SENTIMENT_DB_BATCH_SIZE).
+
+--save writes the results as JSON; --baseline compares against a saved run
+and exits 1 if any service lost more than --tolerance of its throughput or
+grew its peak RSS by as much.
+
+    cd services && python -m replay.run [image-ranker sentiment-engine ...]
+        [--payloads articles.jsonl | --articles 200] [--stub-models]
+        [--save results.json] [--baseline results.json] [--tolerance 0.1]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from replay import record
+
+SERVICES_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# name -> (source dir, replay module)
+SERVICES = {
+    "image-ranker": ("image-ranker/src", "replay.image_ranker"),
+    "sentiment-engine": ("sentiment-engine", "replay.sentiment"),
+    "translation-engine": ("translation-engine", "replay.translation"),
+    "embedding-service": ("embedding-service/src", "replay.embedding"),
+}
+
+
+def child_env(service, args, workdir):
+    env = dict(os.environ)
+    # No metrics ports; the replay reads the registry in-process
+    env["METRICS_PORT"] = "0"
+    # The fixture hosts live on 127.0.0.N
+    env["no_proxy"] = ",".join(filter(None, [env.get("no_proxy"), "127.0.0.0/8", "localhost"]))
+    if service == "image-ranker":
+        env.setdefault("RANKER_WORKERS", str(args.ranker_workers))
+        # Pool workers report stage timings through files
+        env["PROMETHEUS_MULTIPROC_DIR"] = os.path.join(workdir, "metrics")
+        os.makedirs(env["PROMETHEUS_MULTIPROC_DIR"])
+    elif service == "sentiment-engine":
+        env["SENTIMENT_RUN_TRENDS"] = "false"
+    elif service == "translation-engine":
+        env["TRANSLATION_PROVIDER"] = "stub"
+        env.setdefault("TRANSLATION_PROVIDER_RATE", str(args.translate_rate))
+    elif service == "embedding-service":
+        # Any value turns ClusterSync on; psycopg2.connect goes to the shim
+        env["DATABASE_URL"] = "replay"
+    return env
+
+
+def prepare_images(payloads, args):
+    # Candidate URLs point at local fixture hosts from here on
+    from replay.images import ImageHosts
+
+    hosts = ImageHosts(hosts=args.image_hosts, latency=args.image_latency_ms / 1000.0,
+                       cache_dir=args.fixture_cache)
+    rewritten = []
+    for payload in payloads:
+        payload = dict(payload)
+        payload["imageCandidates"] = [
+            dict(cand, url=hosts.rewrite(cand["url"])) if cand.get("url") else cand
+            for cand in payload.get("imageCandidates") or []
+        ]
+        rewritten.append(payload)
+    start = time.perf_counter()
+    hosts.prepare()
+    print(f"Rendered {len(hosts.routes)} image fixtures in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+    hosts.start()
+    return hosts, rewritten
+
+
+def run_service(service, payloads, args):
+    with tempfile.TemporaryDirectory(prefix=f"replay-{service}-") as workdir:
+        hosts = None
+        if service == "image-ranker":
+            hosts, payloads = prepare_images(payloads, args)
+        try:
+            input_path = os.path.join(workdir, "input.json")
+            result_path = os.path.join(workdir, "result.json")
+            with open(input_path, "w") as f:
+                json.dump({"service": service, "args": vars(args), "payloads": payloads}, f)
+            output = None if args.verbose else subprocess.DEVNULL
+            proc = subprocess.run(
+                [sys.executable, "-m", "replay.run", "--child", input_path, result_path],
+                cwd=SERVICES_DIR, env=child_env(service, args, workdir),
+                stdout=output, stderr=None if args.verbose else subprocess.PIPE,
+            )
+            if proc.returncode != 0:
+                tail = (proc.stderr or b"").decode("utf-8", "replace")[-3000:]
+                raise SystemExit(f"{service} replay failed (exit {proc.returncode})\n{tail}")
+            with open(result_path) as f:
+                return json.load(f)
+        finally:
+            if hosts:
+                hosts.stop()
+
+
+def child(input_path, result_path):
+    with open(input_path) as f:
+        job = json.load(f)
+    source_dir, module_name = SERVICES[job["service"]]
+    sys.path.insert(0, os.path.join(SERVICES_DIR, source_dir))
+    module = __import__(module_name, fromlist=["replay"])
+    workdir = os.path.dirname(input_path)
+    result = module.replay(job["payloads"], argparse.Namespace(**job["args"]), workdir)
+    with open(result_path, "w") as f:
+        json.dump(result, f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline replay benchmark for the Python services")
+    parser.add_argument("services", nargs="*", metavar="service",
+                        help=f"services to replay: {', '.join(SERVICES)} (default: all)")
+    parser.add_argument("--payloads", help="recorded parsed-articles payloads, one JSON per line")
+    parser.add_argument("--articles", type=int, default=200, help="synthetic payloads when no --payloads")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--stub-models", action="store_true",
+                        help="stand-in sentiment and embedding models (no model download, excludes inference)")
+    parser.add_argument("--verbose", action="store_true", help="show service output")
+
+    images = parser.add_argument_group("image-ranker")
+    images.add_argument("--ranker-workers", type=int, default=0, help="RANKER_WORKERS unless set in the environment")
+    images.add_argument("--image-hosts", type=int, default=8)
+    images.add_argument("--image-latency-ms", type=float, default=20)
+    images.add_argument("--s3-latency-ms", type=float, default=5)
+    images.add_argument("--kafka-latency-ms", type=float, default=5)
+    images.add_argument("--partitions", type=int, default=3)
+    images.add_argument("--fixture-cache", default=os.path.join(tempfile.gettempdir(), "replay-images"),
+                        help="rendered images are kept here between runs")
+
+    workers = parser.add_argument_group("sentiment, translation and embedding")
+    workers.add_argument("--db-rtt-ms", type=float, default=0.5, help="added per database round trip")
+    workers.add_argument("--translate-latency-ms", type=float, default=50)
+    workers.add_argument("--translate-rate", type=float, default=0,
+                         help="TRANSLATION_PROVIDER_RATE unless set in the environment (0 = unlimited)")
+    workers.add_argument("--clients", type=int, default=8, help="concurrent embedding callers")
+    workers.add_argument("--embed-endpoint", choices=["embed", "match"], default="embed")
+    workers.add_argument("--ready-timeout", type=float, default=600, help="seconds to wait for the model")
+
+    output = parser.add_argument_group("results")
+    output.add_argument("--save", help="write results to this JSON file")
+    output.add_argument("--baseline", help="compare with results saved by an earlier run")
+    output.add_argument("--tolerance", type=float, default=0.1)
+    args = parser.parse_args()
+    unknown = [service for service in args.services if service not in SERVICES]
+    if unknown:
+        parser.error(f"unknown service {', '.join(unknown)}; choose from {', '.join(SERVICES)}")
+
+    from replay import report
+
+    payloads = record.load(args.payloads) if args.payloads else record.synthetic(args.articles, args.seed)
+    baseline = report.load(args.baseline) if args.baseline else {}
+    print(f"Replaying {len(payloads)} payloads{'' if args.payloads else ' (synthetic)'}", file=sys.stderr)
+
+    results = {}
+    for service in args.services or list(SERVICES):
+        results[service] = run_service(service, payloads, args)
+        print(report.render(results[service], baseline.get(service)))
+        print()
+
+    if args.save:
+        report.save(results, args.save)
+    if baseline:
+        found = report.regressions(results, baseline, args.tolerance)
+        for line in found:
+            print(f"REGRESSION {line}")
+        if found:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 4 and sys.argv[1] == "--child":
+        child(sys.argv[2], sys.argv[3])
+    else:
+        main()
@@ -0,0 +1,121 @@
+"""Regression scenarios replayed through image-ranker's process_article with
+fake S3 and in-memory image bytes (no network). Each scenario is a sequence
+of articles whose outcome once went wrong; the run exits 1 if any of them
+still does.
+
+    cd services && python -m replay.scenarios
+"""
+import hashlib
+import os
+import sys
+from io import BytesIO
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+SERVICES_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def photo(seed, size=(1600, 900)):
+    # Hard-edged blocks, so even a 400px rendition passes the blur check
+    rng = np.random.default_rng(seed)
+    img = Image.new("RGB", size, tuple(int(v) for v in rng.integers(0, 256, 3)))
+    draw = ImageDraw.Draw(img)
+    for _ in range(400):
+        x, y = rng.integers(0, size[0]), rng.integers(0, size[1])
+        w, h = rng.integers(20, 240, 2)
+        draw.rectangle([x, y, x + w, y + h], fill=tuple(int(v) for v in rng.integers(0, 256, 3)))
+    return img
+
+
+def encode(photo, size, quality=90):
+    out = BytesIO()
+    photo.resize(size, Image.Resampling.LANCZOS).save(out, "JPEG", quality=quality)
+    return out.getvalue()
+
+
+def same_hash_copies(sizes):
+    # Renditions of one fixture photo whose perceptual hashes are identical,
+    # as CDN sizes of a wire photo usually are
+    from ranker import dhash
+
+    for seed in range(50):
+        original = photo(seed)
+        copies = [encode(original, size) for size in sizes]
+        if len({dhash(data) for data in copies}) == 1:
+            return original, copies
+    raise RuntimeError("no fixture photo keeps one hash across sizes")
+
+
+def stored_key(url):
+    return hashlib.md5(url.encode()).hexdigest() + ".webp"
+
+
+def thumbnail_not_reused_for_larger_copy(main):
+    # 1. a 400px copy wins and is stored; 2. a 1600px copy is scored and
+    # loses; 3. the next 1600px copy must get its own object, not the
+    # thumbnail stretched to a 1200px claim; 4. a later 400px copy may
+    # reuse that larger object
+    original, (small, large) = same_hash_copies([(400, 225), (1600, 900)])
+    images = {
+        "http://cdn.a.example/400.jpg": small,
+        "http://cdn.b.example/1600.jpg": large,
+        "http://cdn.b.example/other.jpg": encode(photo(1000), (1600, 900)),
+        "http://cdn.c.example/1600.jpg": encode(original, (1600, 900), quality=80),
+        "http://cdn.d.example/400.jpg": encode(original, (400, 225), quality=80),
+    }
+    main.fetcher.fetch_all = lambda cands: [images.get(cand.get("url")) for cand in cands]
+
+    def best(*candidates):
+        article = {"title": "scenario", "imageCandidates": [
+            {"url": url, "scoreModifier": modifier} for url, modifier in candidates
+        ]}
+        return main.process_article(article)["bestImage"]
+
+    first = best(("http://cdn.a.example/400.jpg", 1.0))
+    second = best(("http://cdn.b.example/1600.jpg", 0.0), ("http://cdn.b.example/other.jpg", 1.0))
+    third = best(("http://cdn.c.example/1600.jpg", 1.0))
+    fourth = best(("http://cdn.d.example/400.jpg", 1.0))
+
+    problems = []
+    if not first or not first["url"].endswith(stored_key("http://cdn.a.example/400.jpg")):
+        problems.append(f"400px copy not stored under its own key: {first}")
+    if not second or not second["url"].endswith(stored_key("http://cdn.b.example/other.jpg")):
+        problems.append(f"unexpected winner for the losing 1600px copy: {second}")
+    if not third or not third["url"].endswith(stored_key("http://cdn.c.example/1600.jpg")):
+        problems.append(f"1600px copy served from another object: {third}")
+    elif (third["width"], third["height"]) != (1200, 675):
+        problems.append(f"1600px copy stored at {third['width']}x{third['height']}")
+    if not fourth or fourth["url"] != third["url"] or fourth["width"] != 1200:
+        problems.append(f"later 400px copy did not reuse the 1200px object: {fourth}")
+    return problems
+
+
+SCENARIOS = [thumbnail_not_reused_for_larger_copy]
+
+
+def main():
+    os.environ.setdefault("METRICS_PORT", "0")
+    sys.path.insert(0, os.path.join(SERVICES_DIR, "image-ranker/src"))
+    from replay.image_ranker import use_fake_s3
+
+    use_fake_s3()
+    import main as ranker
+
+    failed = 0
+    for scenario in SCENARIOS:
+        # Each scenario starts from empty caches
+        ranker.dedup = ranker.PerceptualIndex(max_distance=ranker.PHASH_MAX_DISTANCE)
+        ranker.url_results = ranker.UrlResultCache()
+        ranker.store = ranker.ProcessedImageStore(ranker.s3, ranker.BUCKET_NAME)
+        problems = scenario(ranker)
+        print(f"{'FAIL' if problems else 'ok'}  {scenario.__name__}")
+        for problem in problems:
+            print(f"      {problem}")
+        failed += bool(problems)
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+import os
+import time
+
+from replay import sqlshim
+from replay.fakes import FakeSentimentPipeline
+
+# Runs sentiment-engine's run_worker over articles seeded from the payloads.
+# The database is the SQLite shim; the worker stops at its first idle wait,
+# i.e. once every article is analyzed and no stale rows are left.
+
+
+# BaseExceptions, so the worker loop's `except Exception` lets them through
+class Drained(BaseException):
+    pass
+
+
+class ReplayFailed(BaseException):
+    pass
+
+
+class StopWhenIdle:
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def wait(self, timeout):
+        raise Drained()
+
+
+def fail_fast(process_batch):
+    # The worker logs errors and retries forever; a replay should stop
+    def wrapper(*args, **kwargs):
+        try:
+            return process_batch(*args, **kwargs)
+        except Exception as e:
+            raise ReplayFailed(f"process_batch failed: {e!r}") from e
+    return wrapper
+
+
+def replay(payloads, args, workdir):
+    db_path = os.path.join(workdir, "replay.db")
+    sqlshim.create(db_path)
+    seeded = sqlshim.seed(db_path, payloads)
+    round_trips = sqlshim.patch(db_path, rtt_ms=args.db_rtt_ms)
+    import main
+    from replay import report
+
+    # Loaded before the clock starts, like a worker that is up and waiting
+    pipeline = FakeSentimentPipeline() if args.stub_models else main.load_pipeline()
+    main.load_pipeline = lambda: pipeline
+    main.WorkListener = StopWhenIdle
+    main.process_batch = fail_fast(main.process_batch)
+
+    start = time.perf_counter()
+    try:
+        main.run_worker()
+    except Drained:
+        pass
+    seconds = time.perf_counter() - start
+
+    conn = sqlshim.Connection(db_path)
+    with conn.cursor() as cur:
+        cur.execute("SELECT count(*) FROM articles WHERE sentiment_processed_at IS NOT NULL")
+        analyzed = cur.fetchone()[0]
+    conn.close()
+    extra = {
+        "seeded": seeded,
+        "db_round_trips": round_trips.count,
+        "model": "stub" if args.stub_models else "real",
+    }
+    return report.result("sentiment-engine", analyzed, seconds, extra)
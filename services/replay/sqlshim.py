@@ -0,0 +1,402 @@
+import json
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from datetime import date, datetime, timezone
+from decimal import Decimal
+
+import psycopg2
+from psycopg2 import extensions
+
+# Throwaway stand-in for Postgres: a psycopg2-shaped connection over a SQLite
+# file, with just enough of the Postgres dialect translated for the queries
+# the Python services actually run (lease claims, UPDATE ... FROM (VALUES),
+# savepoints, the translation cache, the cluster sync). Timestamps are
+# stored as epoch seconds and come back as aware datetimes for *_at columns.
+# patch() points psycopg2.connect at it, so pools, Database and ClusterSync
+# all end up here unchanged.
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sources (
+    id INTEGER PRIMARY KEY,
+    domain TEXT UNIQUE NOT NULL,
+    name TEXT,
+    should_translate BOOLEAN DEFAULT FALSE
+);
+CREATE TABLE IF NOT EXISTS clusters (
+    id INTEGER PRIMARY KEY,
+    primary_article_id INTEGER,
+    title TEXT,
+    embedding TEXT,
+    created_at REAL DEFAULT ((julianday('now') - 2440587.5) * 86400.0),
+    last_updated_at REAL DEFAULT ((julianday('now') - 2440587.5) * 86400.0)
+);
+CREATE TABLE IF NOT EXISTS articles (
+    id INTEGER PRIMARY KEY,
+    cluster_id INTEGER,
+    source_id INTEGER,
+    url TEXT UNIQUE NOT NULL,
+    title TEXT NOT NULL,
+    snippet TEXT,
+    author TEXT,
+    published_at REAL,
+    created_at REAL DEFAULT ((julianday('now') - 2440587.5) * 86400.0),
+    best_image_url TEXT,
+    best_image_width INTEGER,
+    best_image_height INTEGER,
+    image_quality_score REAL,
+    language TEXT,
+    original_title TEXT,
+    original_snippet TEXT,
+    translation_leased_at REAL,
+    translation_lease_owner TEXT,
+    sentiment_score REAL,
+    sentiment_label TEXT,
+    virality_score INTEGER,
+    emotion_tags TEXT,
+    sentiment_model_label TEXT,
+    sentiment_model_score REAL,
+    sentiment_scoring_version INTEGER,
+    sentiment_processed_at REAL,
+    sentiment_leased_at REAL,
+    sentiment_lease_owner TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_articles_published ON articles(published_at);
+CREATE INDEX IF NOT EXISTS idx_articles_created ON articles(created_at);
+CREATE INDEX IF NOT EXISTS idx_clusters_updated ON clusters(last_updated_at);
+CREATE TABLE IF NOT EXISTS translation_cache (
+    key BLOB PRIMARY KEY,
+    source_lang TEXT NOT NULL,
+    target_lang TEXT NOT NULL,
+    translated TEXT NOT NULL,
+    detected_lang TEXT,
+    created_at REAL DEFAULT ((julianday('now') - 2440587.5) * 86400.0)
+);
+"""
+
+ARRAY_COLUMNS = {"emotion_tags"}
+
+PLACEHOLDER = re.compile(r"(\bIN\s+)?(%\((\w+)\)s|%s|%%)")
+STRING_LITERAL = re.compile(r"((?:[xX])?'(?:[^']|'')*')")
+
+# Applied outside string literals, in order
+REWRITES = [
+    (re.compile(r"=\s*ANY\s*\(\s*(%\(\w+\)s|%s)\s*\)", re.I), r"IN \1"),
+    (re.compile(r"::\w+(\s+precision)?(\[\])?"), ""),
+    (re.compile(r"make_interval\(\s*secs\s*=>\s*([^)]*)\)", re.I), r"(\1)"),
+    (re.compile(r"extract\(\s*epoch\s+FROM\s+([\w.]+)\s*\)", re.I), r"CAST(\1 AS REAL)"),
+    (re.compile(r"FOR\s+UPDATE(\s+OF\s+\w+)?(\s+SKIP\s+LOCKED)?", re.I), ""),
+    (re.compile(r"IS\s+NOT\s+DISTINCT\s+FROM", re.I), "IS"),
+    (re.compile(r"IS\s+DISTINCT\s+FROM", re.I), "IS NOT"),
+]
+RETURNING = re.compile(r"\bRETURNING\b(.*)$", re.I | re.S)
+QUALIFIER = re.compile(r"\b\w+\.(?=\w)")
+VALUES_ALIAS = re.compile(r"\s*AS\s+(\w+)\s*\(([^)]*)\)", re.I)
+
+
+def literal(value, in_list=False):
+    # Python value -> SQLite literal, as psycopg2 would adapt it for Postgres
+    if value is None:
+        return "NULL"
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, (int, float, Decimal)) or hasattr(value, "item"):
+        return str(value.item() if hasattr(value, "item") else value)
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return f"X'{bytes(value).hex()}'"
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return repr(value.timestamp())
+    if isinstance(value, date):
+        return literal(datetime(value.year, value.month, value.day, tzinfo=timezone.utc))
+    if isinstance(value, (list, tuple)):
+        if in_list:
+            return "(" + ", ".join(literal(v) for v in value) + ")" if value else "(NULL)"
+        return literal(json.dumps(list(value)))
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def outside_strings(sql, fn):
+    parts = STRING_LITERAL.split(sql)
+    return "".join(part if i % 2 else fn(part) for i, part in enumerate(parts))
+
+
+def rewrite_values_alias(sql):
+    # Postgres names the columns of a VALUES list in its alias:
+    #   (VALUES ...) AS v (id, score)
+    # SQLite calls them column1..N, so select them under those names.
+    start = 0
+    while True:
+        at = sql.upper().find("(VALUES", start)
+        if at < 0:
+            return sql
+        depth, i, quoted = 0, at, False
+        while i < len(sql):
+            ch = sql[i]
+            if ch == "'":
+                quoted = not quoted
+            elif not quoted and ch == "(":
+                depth += 1
+            elif not quoted and ch == ")":
+                depth -= 1
+                if depth == 0:
+                    break
+            i += 1
+        alias = VALUES_ALIAS.match(sql, i + 1)
+        if not alias:
+            start = i
+            continue
+        columns = [c.strip() for c in alias.group(2).split(",")]
+        select = ", ".join(f"column{n} AS {name}" for n, name in enumerate(columns, 1))
+        replacement = f"(SELECT {select} FROM {sql[at:i + 1]}) AS {alias.group(1)}"
+        sql = sql[:at] + replacement + sql[alias.end():]
+        start = at + len(replacement)
+
+
+def translate(sql):
+    sql = outside_strings(sql, lambda part: _apply(REWRITES, part))
+    sql = rewrite_values_alias(sql)
+    # SQLite's RETURNING only sees the target table, and unqualified
+    returning = RETURNING.search(sql)
+    if returning:
+        sql = sql[:returning.start(1)] + QUALIFIER.sub("", returning.group(1))
+    return sql
+
+
+def _apply(rewrites, text):
+    for pattern, replacement in rewrites:
+        text = pattern.sub(replacement, text)
+    return text
+
+
+def mogrify(sql, params):
+    # psycopg2 only interpolates when params are given; %% is a literal %
+    if params is None:
+        return sql
+
+    def bind(match):
+        if match.group(2) == "%%":
+            return "%"
+        value = params[match.group(3)] if match.group(3) else next(positional)
+        return (match.group(1) or "") + literal(value, in_list=bool(match.group(1)))
+
+    positional = iter(params if isinstance(params, (list, tuple)) else ())
+    return PLACEHOLDER.sub(bind, sql)
+
+
+def as_value(name, value):
+    # Epoch seconds back to datetimes, as psycopg2 returns timestamptz, and
+    # JSON back to lists for array columns
+    if name.endswith("_at") and isinstance(value, (int, float)):
+        return datetime.fromtimestamp(value, timezone.utc)
+    if name in ARRAY_COLUMNS and isinstance(value, str):
+        return json.loads(value)
+    return value
+
+
+def as_row(description, values):
+    return tuple(as_value(d[0], v) for d, v in zip(description, values))
+
+
+class Cursor:
+    def __init__(self, conn, dict_rows=False):
+        self.connection = conn
+        self.dict_rows = dict_rows
+        self.description = None
+        self.rowcount = -1
+        self._rows = []
+
+    def mogrify(self, sql, params=None):
+        if isinstance(sql, bytes):
+            sql = sql.decode("utf-8")
+        return mogrify(sql, params).encode("utf-8")
+
+    def execute(self, sql, params=None):
+        # Translated before binding, so parameter values are never rewritten
+        if isinstance(sql, bytes):
+            sql = sql.decode("utf-8")
+        sql = translate(sql)
+        self.connection._round_trip()
+        try:
+            cur = self.connection._execute(mogrify(sql, params))
+        except sqlite3.Error as e:
+            raise psycopg2.DatabaseError(f"{e}\n{sql}") from e
+        self.rowcount = cur.rowcount
+        self.description = cur.description
+        rows = cur.fetchall() if cur.description else []
+        if cur.description:
+            rows = [as_row(cur.description, row) for row in rows]
+            if self.dict_rows:
+                names = [d[0] for d in cur.description]
+                rows = [dict(zip(names, row)) for row in rows]
+            self.rowcount = len(rows)
+        self._rows = rows
+
+    def fetchone(self):
+        return self._rows.pop(0) if self._rows else None
+
+    def fetchmany(self, size=1):
+        rows, self._rows = self._rows[:size], self._rows[size:]
+        return rows
+
+    def fetchall(self):
+        rows, self._rows = self._rows, []
+        return rows
+
+    def __iter__(self):
+        while self._rows:
+            yield self._rows.pop(0)
+
+    def close(self):
+        self._rows = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class _Info:
+    def __init__(self, conn):
+        self._conn = conn
+
+    @property
+    def transaction_status(self):
+        if self._conn.closed:
+            return extensions.TRANSACTION_STATUS_UNKNOWN
+        if self._conn._db.in_transaction:
+            return extensions.TRANSACTION_STATUS_INTRANS
+        return extensions.TRANSACTION_STATUS_IDLE
+
+
+class Connection:
+    encoding = "UTF8"
+
+    def __init__(self, path, rtt=0.0, stats=None):
+        self._db = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=OFF")
+        self._db.create_function("now", 0, time.time)
+        self._db.create_function("to_timestamp", 1, lambda seconds: seconds)
+        self._rtt = rtt
+        self._stats = stats
+        self._lock = threading.Lock()
+        self.autocommit = False
+        self.closed = 0
+        self.notifies = []
+        self.info = _Info(self)
+
+    def _round_trip(self):
+        # Network latency to a real server; SQLite itself has none
+        if self._stats is not None:
+            self._stats.round_trip()
+        if self._rtt:
+            time.sleep(self._rtt)
+
+    def _execute(self, sql):
+        with self._lock:
+            # psycopg2 opens a transaction before the first statement unless
+            # autocommit; IMMEDIATE so concurrent writers queue instead of
+            # failing to upgrade a read lock
+            if not self.autocommit and not self._db.in_transaction:
+                self._db.execute("BEGIN IMMEDIATE")
+            return self._db.execute(sql)
+
+    def cursor(self, cursor_factory=None):
+        return Cursor(self, dict_rows=cursor_factory is not None)
+
+    def set_isolation_level(self, level):
+        self.autocommit = level == extensions.ISOLATION_LEVEL_AUTOCOMMIT
+
+    def commit(self):
+        self._round_trip()
+        with self._lock:
+            if self._db.in_transaction:
+                self._db.execute("COMMIT")
+
+    def rollback(self):
+        self._round_trip()
+        with self._lock:
+            if self._db.in_transaction:
+                self._db.execute("ROLLBACK")
+
+    def close(self):
+        if not self.closed:
+            self._db.close()
+            self.closed = 1
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.rollback()
+
+
+class RoundTrips:
+    def __init__(self):
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def round_trip(self):
+        with self._lock:
+            self.count += 1
+
+
+def create(path):
+    db = sqlite3.connect(path)
+    db.executescript(SCHEMA)
+    db.close()
+
+
+def patch(path, rtt_ms=0.0):
+    # Every psycopg2.connect() in this process now opens the SQLite file,
+    # whatever DSN or parameters it is given. Returns the round-trip counter.
+    stats = RoundTrips()
+
+    def connect(*args, **kwargs):
+        return Connection(path, rtt=rtt_ms / 1000.0, stats=stats)
+
+    psycopg2.connect = connect
+    return stats
+
+
+def seed(path, payloads, translate_sources=True):
+    # One articles row per payload, as the indexer would insert it, plus a
+    # sources row per source_id. Image quality comes from bestImage when the
+    # payload was recorded after image-ranker, else a stable stand-in.
+    db = sqlite3.connect(path)
+    sources = {payload.get("source_id") or 1 for payload in payloads}
+    db.executemany(
+        "INSERT OR IGNORE INTO sources (id, domain, should_translate) VALUES (?, ?, ?)",
+        [(source, f"source-{source}.example", translate_sources) for source in sources],
+    )
+    rows = []
+    now = time.time()
+    for i, payload in enumerate(payloads):
+        best = payload.get("bestImage") or {}
+        quality = best.get("score")
+        if quality is None:
+            quality = zlib.crc32(payload.get("title", "").encode("utf-8")) % 100
+        rows.append((
+            payload.get("source_id") or 1,
+            f"{payload.get('originalUrl') or 'replay'}#{i}",
+            payload.get("title") or "",
+            (payload.get("excerpt") or "")[:200],
+            now - i,
+            float(quality),
+        ))
+    db.executemany(
+        "INSERT INTO articles (source_id, url, title, snippet, published_at, image_quality_score) "
+        "VALUES (?, ?, ?, ?, ?, ?)",
+        rows,
+    )
+    db.commit()
+    db.close()
+    return len(rows)
@@ -0,0 +1,41 @@
+import os
+import time
+
+from replay import sqlshim
+
+# Runs translation-engine's process_translations the way its __main__ loop
+# does (until a call finds nothing to write) over articles seeded from the
+# payloads. Providers are translators.StubTranslator, charging a fixed round
+# trip per request; the database is the SQLite shim.
+
+
+def replay(payloads, args, workdir):
+    db_path = os.path.join(workdir, "replay.db")
+    sqlshim.create(db_path)
+    seeded = sqlshim.seed(db_path, payloads)
+    round_trips = sqlshim.patch(db_path, rtt_ms=args.db_rtt_ms)
+    import main
+    from replay import report
+    from translators import StubTranslator
+
+    StubTranslator.latency = args.translate_latency_ms / 1000.0
+    main.langid.load_profiles()
+    main.db.connect()
+
+    start = time.perf_counter()
+    while main.process_translations():
+        pass
+    seconds = time.perf_counter() - start
+    main.executor.shutdown()
+
+    with main.db.conn.cursor() as cur:
+        cur.execute("SELECT count(*), count(original_title) FROM articles WHERE language IS NOT NULL")
+        written, translated = cur.fetchone()
+    extra = {
+        "seeded": seeded,
+        "translated": translated,
+        "db_round_trips": round_trips.count,
+    }
+    if written < seeded:
+        extra["unwritten"] = seeded - written
+    return report.result("translation-engine", written, seconds, extra)
@@ -0,0 +1,172 @@
+"""Sentiment worker throughput in articles/sec against a local stand-in DB.
+
+The stand-in database keeps articles in memory and charges a fixed latency per
+round trip (--rtt-ms), which is what separates one UPDATE per row from one
+UPDATE ... FROM (VALUES ...) per batch. Inference uses a stub pipeline with a
+fixed per-call and per-text cost unless --model names a real transformers
+model.
+
+    python bench/bench_worker.py [--articles 2000] [--rtt-ms 1.0] [--model NAME]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(1, os.path.join(os.path.dirname(__file__), "..", ".."))  # pycommon
+import main  # noqa: E402
+from scoring import analyze_virality, to_polarity  # noqa: E402
+
+LABELS = ("positive", "negative", "neutral")
+
+
+class StubPipeline:
+    # Models a padded forward pass: fixed overhead per call plus per-text cost
+    def __init__(self, call_ms, text_ms):
+        self.call_s = call_ms / 1000.0
+        self.text_s = text_ms / 1000.0
+
+    def __call__(self, texts, **kwargs):
+        single = isinstance(texts, str)
+        batch = [texts] if single else texts
+        batch_size = kwargs.get("batch_size") or 1
+        passes = -(-len(batch) // batch_size)
+        time.sleep(self.call_s * passes + self.text_s * len(batch))
+        results = [{"label": LABELS[len(t) % 3], "score": 0.5 + (len(t) % 50) / 100.0} for t in batch]
+        return results if not single else results[:1]
+
+
+class StandInCursor:
+    def __init__(self, db):
+        self.db = db
+        self.connection = db
+        self._result = []
+
+    def mogrify(self, sql, args):
+        return repr(args).encode()
+
+    def execute(self, sql, params=None):
+        self.db.round_trip()
+        text = sql.decode() if isinstance(sql, bytes) else sql
+        # Plain SELECT (legacy) or the lease claim, both hand out pending rows
+        if text.lstrip().upper().startswith("SELECT") or "RETURNING" in text:
+            limit = params[-1] if params else 50
+            self._result = self.db.pending(limit)
+        else:
+            self._result = []
+
+    def fetchall(self):
+        return self._result
+
+    def close(self):
+        pass
+
+
+# In-memory `articles` with per-round-trip latency. Rows handed out by the
+# last SELECT/claim are done once the transaction commits.
+class StandInDB:
+    encoding = "UTF8"
+
+    def __init__(self, articles, rtt_ms):
+        self.rows = articles
+        self.rtt_s = rtt_ms / 1000.0
+        self.cursor_pos = 0
+        self.outstanding = 0
+        self.round_trips = 0
+
+    def round_trip(self):
+        self.round_trips += 1
+        time.sleep(self.rtt_s)
+
+    def pending(self, limit):
+        batch = self.rows[self.cursor_pos:self.cursor_pos + limit]
+        self.outstanding = len(batch)
+        return batch
+
+    def cursor(self, cursor_factory=None):
+        return StandInCursor(self)
+
+    def commit(self):
+        self.round_trip()
+        self.cursor_pos += self.outstanding
+        self.outstanding = 0
+
+    def rollback(self):
+        self.outstanding = 0
+
+    def close(self):
+        pass
+
+
+def make_articles(count):
+    rng = random.Random(42)
+    words = "market storm election team court vaccine rally crisis deal record growth".split()
+    return [{
+        "id": i,
+        "title": " ".join(rng.choices(words, k=rng.randint(6, 14))).capitalize(),
+        "snippet": " ".join(rng.choices(words, k=rng.randint(15, 40))),
+        "image_quality_score": rng.uniform(0, 100),
+        "created_at": datetime.now(timezone.utc),
+    } for i in range(1, count + 1)]
+
+
+def legacy_batch(conn, sentiment_pipeline):
+    # The pre-batching worker: one pipeline call and one UPDATE per row
+    cur = conn.cursor()
+    cur.execute("SELECT ... LIMIT %s", (main.DB_BATCH_SIZE,))
+    rows = cur.fetchall()
+    if not rows:
+        return 0
+    for row in rows:
+        text = f"{row['title']} {row['snippet'] or ''}".strip()
+        result = sentiment_pipeline(text[:512])[0]
+        polarity = to_polarity(result["label"], result["score"])
+        analyze_virality(polarity, row.get("image_quality_score") or 0)
+        cur.execute("UPDATE articles ... WHERE id = %s", (row["id"],))
+    conn.commit()
+    return len(rows)
+
+
+def run(process, articles, rtt_ms, sentiment_pipeline):
+    db = StandInDB(articles, rtt_ms)
+    done = 0
+    start = time.perf_counter()
+    while True:
+        n = process(db, sentiment_pipeline)
+        if not n:
+            break
+        done += n
+    elapsed = time.perf_counter() - start
+    return done, elapsed, db.round_trips
+
+
+def run_benchmark():
+    parser = argparse.ArgumentParser(description="Sentiment worker throughput benchmark")
+    parser.add_argument("--articles", type=int, default=2000)
+    parser.add_argument("--rtt-ms", type=float, default=1.0, help="stand-in DB latency per round trip")
+    parser.add_argument("--call-ms", type=float, default=8.0, help="stub pipeline cost per call")
+    parser.add_argument("--text-ms", type=float, default=1.5, help="stub pipeline cost per text")
+    parser.add_argument("--model", help="real transformers model instead of the stub")
+    args = parser.parse_args()
+
+    if args.model:
+        from transformers import pipeline
+        sentiment_pipeline = pipeline("sentiment-analysis", model=args.model)
+    else:
+        sentiment_pipeline = StubPipeline(args.call_ms, args.text_ms)
+
+    articles = make_articles(args.articles)
+    print(f"articles={args.articles} db_batch={main.DB_BATCH_SIZE} infer_batch={main.INFER_BATCH_SIZE} "
+          f"rtt={args.rtt_ms}ms pipeline={args.model or 'stub'}")
+
+    for name, process in (("per-row", legacy_batch), ("batched", main.process_batch)):
+        done, elapsed, trips = run(process, articles, args.rtt_ms, sentiment_pipeline)
+        print(f"{name:>8}: {done} articles in {elapsed:.2f}s = {done / elapsed:,.0f} articles/sec "
+              f"({trips} DB round trips)")
+
+
+if __name__ == "__main__":
+    run_benchmark()
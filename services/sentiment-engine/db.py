@@ -0,0 +1,61 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import psycopg2
+from psycopg2.pool import ThreadedConnectionPool
+
+# Config
+DB_HOST = os.getenv("DB_HOST", "postgres")
+DB_NAME = os.getenv("DB_NAME", "news_db")
+DB_USER = os.getenv("DB_USER", "news_user")
+DB_PASS = os.getenv("DB_PASS", "news_password")
+DB_PORT = os.getenv("DB_PORT", "5432")
+DB_POOL_SIZE = int(os.getenv("SENTIMENT_DB_POOL_SIZE", "4"))
+
+DB_PARAMS = dict(
+    host=DB_HOST,
+    database=DB_NAME,
+    user=DB_USER,
+    password=DB_PASS,
+    port=DB_PORT
+)
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadedConnectionPool(1, DB_POOL_SIZE, **DB_PARAMS)
+        return _pool
+
+@contextmanager
+def db_connection():
+    # Borrow a pooled connection. Connections that hit a connection-level
+    # error are discarded instead of going back to the pool.
+    pool = get_pool()
+    conn = pool.getconn()
+    broken = False
+    try:
+        yield conn
+    except (psycopg2.InterfaceError, psycopg2.OperationalError):
+        broken = True
+        raise
+    except Exception:
+        if not conn.closed:
+            conn.rollback()
+        raise
+    finally:
+        pool.putconn(conn, close=broken or bool(conn.closed))
+
+def wait_for_pool():
+    # Block until the first connection can be made
+    while True:
+        try:
+            return get_pool()
+        except Exception as e:
+            print(f"Error connecting to DB: {e}")
+            time.sleep(5)
@@ -1,205 +1,178 @@
 import os
+import socket
 import time
-import psycopg2
 from transformers import pipeline
-from psycopg2.extras import RealDictCursor
+from psycopg2.extras import RealDictCursor, execute_values
+from db import DB_PARAMS, db_connection, wait_for_pool
+from pycommon import metrics, profiler
+from pycommon.notify import WorkListener
+from recompute import rescore_stale
+from scoring import SCORING_VERSION, score
+from trends import start_trend_thread
 
-# Config
-DB_HOST = os.getenv("DB_HOST", "postgres")
-DB_NAME = os.getenv("DB_NAME", "news_db")
-DB_USER = os.getenv("DB_USER", "news_user")
-DB_PASS = os.getenv("DB_PASS", "news_password")
-DB_PORT = os.getenv("DB_PORT", "5432")
+# Batching
+# Rows fetched and written per DB round trip vs texts per forward pass
+DB_BATCH_SIZE = int(os.getenv("SENTIMENT_DB_BATCH_SIZE", "50"))
+INFER_BATCH_SIZE = int(os.getenv("SENTIMENT_INFER_BATCH_SIZE", "16"))
 
-def get_db_connection():
+# Trend analysis runs on its own schedule (see trends.py); turn it off here
+# when it is deployed as a separate `python trends.py` process
+RUN_TRENDS = os.getenv("SENTIMENT_RUN_TRENDS", "true").lower() == "true"
+
+# Leasing
+# Claimed rows belong to this worker until processed or the lease expires,
+# so replicas never analyze the same article twice
+LEASE_SECONDS = int(os.getenv("SENTIMENT_LEASE_SECONDS", "300"))
+LEASE_OWNER = os.getenv("SENTIMENT_LEASE_OWNER", f"{socket.gethostname()}:{os.getpid()}")
+
+# Idle workers block on LISTEN sentiment_work and wake on new articles;
+# IDLE_POLL_SECONDS is only the fallback poll interval
+IDLE_POLL_SECONDS = float(os.getenv("SENTIMENT_IDLE_POLL_SECONDS", "60"))
+
+# Rows marked stale (image quality changed after analysis) rescored per
+# pass from the stored model output when there is nothing to analyze
+RESCORE_BATCH_SIZE = int(os.getenv("SENTIMENT_RESCORE_BATCH_SIZE", "1000"))
+
+def score_rows(rows, sentiment_pipeline):
+    # One padded, batched pass over all texts instead of a call per row
+    texts = [f"{row['title']} {row['snippet'] or ''}".strip()[:512] for row in rows]
+    results = sentiment_pipeline(texts, batch_size=INFER_BATCH_SIZE, truncation=True)
+
+    # The raw model output is stored too, so scoring changes can be
+    # recomputed without inference (recompute.py)
+    updates = []
+    for row, result in zip(rows, results):
+        model_label = result.get('label', '')
+        model_score = float(result.get('score', 0))
+        image_quality = row.get('image_quality_score')
+        polarity, label, virality, emotion_tags = score(model_label, model_score, image_quality)
+        updates.append((row['id'], LEASE_OWNER, image_quality, polarity, label, virality, emotion_tags,
+                        model_label, model_score, SCORING_VERSION))
+    return updates
+
+def claim_batch(cur):
+    # Lease unprocessed rows (or rows whose lease expired) in one statement.
+    # SKIP LOCKED lets replicas claim disjoint batches concurrently.
+    cur.execute("""
+        UPDATE articles AS a
+        SET sentiment_leased_at = NOW(),
+            sentiment_lease_owner = %s
+        FROM (
+            SELECT id
+            FROM articles
+            WHERE sentiment_processed_at IS NULL
+              AND (sentiment_leased_at IS NULL
+                   OR sentiment_leased_at < NOW() - make_interval(secs => %s))
+            ORDER BY published_at DESC
+            LIMIT %s
+            FOR UPDATE SKIP LOCKED
+        ) AS claimed
+        WHERE a.id = claimed.id
+        RETURNING a.id, a.title, a.snippet, a.image_quality_score, a.created_at
+    """, (LEASE_OWNER, LEASE_SECONDS, DB_BATCH_SIZE))
+    return cur.fetchall()
+
+def write_results(cur, updates):
+    # Single UPDATE ... FROM (VALUES ...) round trip for the whole batch.
+    # Rows whose lease was lost to another worker are left alone. If the
+    # image quality changed during inference the scores are written stale
+    # (version NULL) for the idle sweep to redo.
+    execute_values(cur, """
+        UPDATE articles AS a
+        SET sentiment_score = v.sentiment_score,
+            sentiment_label = v.sentiment_label,
+            virality_score = v.virality_score,
+            emotion_tags = v.emotion_tags,
+            sentiment_model_label = v.model_label,
+            sentiment_model_score = v.model_score,
+            sentiment_scoring_version = CASE
+                WHEN a.image_quality_score IS NOT DISTINCT FROM v.image_quality THEN v.version
+            END,
+            sentiment_processed_at = NOW(),
+            sentiment_leased_at = NULL,
+            sentiment_lease_owner = NULL
+        FROM (VALUES %s) AS v (id, lease_owner, image_quality, sentiment_score, sentiment_label, virality_score,
+                               emotion_tags, model_label, model_score, version)
+        WHERE a.id = v.id
+          AND a.sentiment_lease_owner = v.lease_owner
+    """, updates, template="(%s::bigint, %s, %s::float, %s::float, %s, %s::int, %s::text[], %s, %s::float, %s::int)",
+        page_size=len(updates))
+
+def release_leases(cur, ids):
+    cur.execute("""
+        UPDATE articles
+        SET sentiment_leased_at = NULL,
+            sentiment_lease_owner = NULL
+        WHERE id = ANY(%s) AND sentiment_lease_owner = %s
+    """, (ids, LEASE_OWNER))
+
+def process_batch(conn, sentiment_pipeline):
+    # Returns the number of articles analyzed (0 when there is no work)
+    cur = conn.cursor(cursor_factory=RealDictCursor)
+
+    # Claim and commit right away so no row locks are held during inference
+    with metrics.timed('claim'):
+        rows = claim_batch(cur)
+        conn.commit()
+    if not rows:
+        return 0
+
+    metrics.observe_batch('sentiment', len(rows))
+    created = [row['created_at'] for row in rows if row['created_at']]
+    if created:
+        metrics.observe_lag('sentiment', time.time() - min(created).timestamp())
+    print(f"🧠 Analyzing {len(rows)} articles...")
     try:
-        conn = psycopg2.connect(
-            host=DB_HOST,
-            database=DB_NAME,
-            user=DB_USER,
-            password=DB_PASS,
-            port=DB_PORT
-        )
-        return conn
-    except Exception as e:
-        print(f"Error connecting to DB: {e}")
-        return None
-
-def analyze_virality(sentiment_score, image_quality_score):
-    # Align with spec: abs(sentiment) * image quality bonus
-    # sentiment_score in [-1, 1], image_quality_score in [0, 100]
-    sentiment_strength = min(abs(sentiment_score), 1.0)
-    image_bonus = 0.5 + (max(image_quality_score, 0) / 100.0) * 0.5  # 0.5 -> 1.0
-    score = sentiment_strength * 100 * image_bonus
-    return min(int(score), 100)
-
-def get_sentiment_label(polarity):
-    if polarity > 0.1: return 'POSITIVE'
-    if polarity < -0.1: return 'NEGATIVE'
-    return 'NEUTRAL'
+        with metrics.timed('inference'):
+            updates = score_rows(rows, sentiment_pipeline)
+    except Exception:
+        # Hand the rows back rather than waiting out the lease
+        release_leases(cur, [row['id'] for row in rows])
+        conn.commit()
+        raise
+
+    with metrics.timed('db_write'):
+        write_results(cur, updates)
+        conn.commit()
+    return len(rows)
+
+def load_pipeline():
+    model_name = os.getenv("SENTIMENT_MODEL", "cardiffnlp/twitter-roberta-base-sentiment-latest")
+    return pipeline("sentiment-analysis", model=model_name)
 
 def run_worker():
     print("🚀 Sentiment Engine Started...")
+    metrics.serve()
+    profiler.install('sentiment-engine')
 
     # Load transformer model once
-    model_name = os.getenv("SENTIMENT_MODEL", "cardiffnlp/twitter-roberta-base-sentiment-latest")
-    sentiment_pipeline = pipeline("sentiment-analysis", model=model_name)
+    sentiment_pipeline = load_pipeline()
+    wait_for_pool()
+    if RUN_TRENDS:
+        start_trend_thread()
+    listener = WorkListener("sentiment_work", **DB_PARAMS)
     
     while True:
-        conn = get_db_connection()
-        if not conn:
-            time.sleep(5)
-            continue
-            
         try:
-            cur = conn.cursor(cursor_factory=RealDictCursor)
-            
-            # Fetch batch of unprocessed articles
-            # We check for sentiment_score = 0 AND sentiment_label = 'NEUTRAL' (default)
-            # A better check is if we had a separate 'processed' flag, but for now we look for default label 'NEUTRAL' 
-            # and score 0, OR we can check if it was never touched. 
-            # Since default is 0/NEUTRAL, we might re-process neutral ones.
-            # Let's assume newly added columns are NULL if we didn't set defaults in migration?
-            # Creating migration set defaults.
-            # Best way: Check if virality_score is 0 AND sentiment_label is 'NEUTRAL' (approx)
-            # Or just check last 100 articles regardless to keep it simple for now, or use a 'processed_at'
-            # Let's rely on `sentiment_label = 'NEUTRAL' AND sentiment_score = 0` implies "pending or actually neutral".
-            # To avoid re-processing true neutrals, we can rely on ID order or random sample for now.
-            # A cleaner approach for MVP: process most recent articles that have default values.
-            
-            cur.execute("""
-                SELECT id, title, snippet, image_quality_score
-                FROM articles 
-                WHERE sentiment_processed_at IS NULL
-                ORDER BY published_at DESC 
-                LIMIT 50
-            """)
-            
-            rows = cur.fetchall()
-            
-            if not rows:
-                print("💤 No pending articles. Sleeping...")
-                time.sleep(10)
-                continue
-                
-            print(f"🧠 Analyzing {len(rows)} articles...")
-            
-            for row in rows:
-                text = f"{row['title']} {row['snippet'] or ''}".strip()
-                result = sentiment_pipeline(text[:512])[0]
-                label_raw = result.get('label', '').upper()
-                score_raw = float(result.get('score', 0))
-
-                # Map model label to signed polarity
-                if label_raw.startswith('POS'):
-                    polarity = score_raw
-                elif label_raw.startswith('NEG'):
-                    polarity = -score_raw
-                else:
-                    polarity = 0.0
-
-                label = get_sentiment_label(polarity)
-                image_quality = row.get('image_quality_score') or 0
-                virality = analyze_virality(polarity, image_quality)
-                
-                # Determine emotion tags (simple mapping)
-                emotion_tags = []
-                if polarity > 0.5: emotion_tags.append('joyful')
-                elif polarity < -0.5: emotion_tags.append('angry')
-                
-                cur.execute("""
-                    UPDATE articles 
-                    SET sentiment_score = %s,
-                        sentiment_label = %s,
-                        virality_score = %s,
-                        emotion_tags = %s,
-                        sentiment_processed_at = NOW()
-                    WHERE id = %s
-                """, (polarity, label, virality, emotion_tags, row['id']))
-                
-            conn.commit()
-            print("✅ Batch complete.")
-            
+            with db_connection() as conn:
+                analyzed = process_batch(conn, sentiment_pipeline)
+                if not analyzed:
+                    with metrics.timed('rescore'):
+                        analyzed = rescore_stale(conn, RESCORE_BATCH_SIZE)
+                    if analyzed:
+                        print(f"🔁 Rescored {analyzed} articles after image quality changes")
         except Exception as e:
             print(f"Error in worker loop: {e}")
-            if conn: conn.rollback()
-        finally:
-            if conn: conn.close()
-            
-        # Run Trend Analysis every 10 iterations (approx every 30-60s)
-        try:
-             analyze_trends()
-        except Exception as e:
-             print(f"Error in trend analysis: {e}")
+            time.sleep(5)
+            continue
 
-        time.sleep(2)
+        if not analyzed:
+            print("💤 No pending articles. Waiting for work...")
+            listener.wait(IDLE_POLL_SECONDS)
+            continue
 
-def analyze_trends():
-    conn = get_db_connection()
-    if not conn: return
-    
-    try:
-        from sklearn.linear_model import LinearRegression
-        import numpy as np
-        
-        cur = conn.cursor(cursor_factory=RealDictCursor)
-        
-        # Get active clusters (updated in last 24h)
-        cur.execute("""
-            SELECT id FROM clusters 
-            WHERE last_updated_at > NOW() - INTERVAL '24 hours' 
-            ORDER BY last_updated_at DESC 
-            LIMIT 50
-        """)
-        clusters = cur.fetchall()
-        
-        if not clusters: return
-
-        print(f"📈 Analyzing trends for {len(clusters)} clusters...")
-        
-        for cluster in clusters:
-            # Get article timestamps for this cluster
-            cur.execute("""
-                SELECT extract(epoch from published_at) as ts 
-                FROM articles 
-                WHERE cluster_id = %s
-                ORDER BY published_at ASC
-            """, (cluster['id'],))
-            
-            articles = cur.fetchall()
-            if len(articles) < 3: continue # Need data points
-            
-            timestamps = [a['ts'] for a in articles]
-            
-            # Create cumulative count (Growth Curve)
-            # X = Time (minutes from start), Y = Article Count
-            start_time = timestamps[0]
-            X = np.array([(t - start_time) / 3600 for t in timestamps]).reshape(-1, 1) # Hours
-            y = np.array(range(1, len(timestamps) + 1))
-            
-            # Fit Linear Regression
-            model = LinearRegression()
-            model.fit(X, y)
-            
-            slope = model.coef_[0] # Articles per hour
-            
-            # Simple Prediction: Next 24h growth
-            # This is a velocity metric.
-            
-            cur.execute("""
-                UPDATE clusters 
-                SET trend_slope = %s,
-                    predicted_growth = %s
-                WHERE id = %s
-            """, (float(slope), float(slope * 24), cluster['id']))
-            
-        conn.commit()
-        print("✅ Trend analysis complete.")
-        
-    except Exception as e:
-        print(f"Trend Analysis Failed: {e}")
-    finally:
-        conn.close()
+        # Keep draining while there is work
+        print("✅ Batch complete.")
 
 if __name__ == "__main__":
     run_worker()
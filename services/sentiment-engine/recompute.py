@@ -0,0 +1,166 @@
+"""Rescore analyzed articles from their stored model output, without inference.
+
+Recomputes sentiment_score, sentiment_label, virality_score and emotion_tags
+with a scoring version from scoring.py (default: the current one) for every
+article whose stored version differs. The id space is split across --jobs
+connections, each walking its range in keyset order --chunk rows per round
+trip and committing per chunk, so it can run next to the live workers.
+
+--from-polarity first fills in the model output of articles analyzed before
+it was stored, from their sentiment_score (exact for the POSITIVE/NEGATIVE
+confidence; NEUTRAL rows keep no score). --all rescores every row, whatever
+its version.
+
+    python recompute.py [--version N] [--jobs 4] [--chunk 5000] [--all]
+        [--from-polarity] [--dry-run]
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import psycopg2
+from psycopg2.extras import execute_values
+
+import scoring
+from db import DB_PARAMS
+
+SELECT_SQL = """
+    SELECT id, sentiment_model_label, sentiment_model_score, image_quality_score,
+           sentiment_score, sentiment_label, virality_score, emotion_tags
+    FROM articles
+    WHERE id > %(after)s AND id <= %(until)s
+      AND sentiment_model_label IS NOT NULL
+      {filter}
+    ORDER BY id
+    LIMIT %(limit)s
+"""
+# Rows whose version differs from the target (NULL = marked stale)
+OUTDATED = "AND sentiment_scoring_version IS DISTINCT FROM %(version)s"
+# Just the stale ones, what the worker sweeps (idx_articles_sentiment_stale)
+STALE = "AND sentiment_scoring_version IS NULL"
+
+# Image quality is part of the input: a row whose quality changed since it
+# was read is left for the next pass instead of getting a stale score
+UPDATE_SQL = """
+    UPDATE articles AS a
+    SET sentiment_score = v.sentiment_score,
+        sentiment_label = v.sentiment_label,
+        virality_score = v.virality_score,
+        emotion_tags = v.emotion_tags,
+        sentiment_scoring_version = v.version
+    FROM (VALUES %s) AS v (id, image_quality, sentiment_score, sentiment_label, virality_score, emotion_tags, version)
+    WHERE a.id = v.id
+      AND a.image_quality_score IS NOT DISTINCT FROM v.image_quality
+"""
+UPDATE_TEMPLATE = "(%s::bigint, %s::float, %s::float, %s, %s::int, %s::text[], %s::int)"
+
+# Articles analyzed before the raw output was stored
+FROM_POLARITY_SQL = """
+    UPDATE articles
+    SET sentiment_model_label = CASE
+            WHEN sentiment_score > 0 THEN 'positive'
+            WHEN sentiment_score < 0 THEN 'negative'
+            ELSE 'neutral' END,
+        sentiment_model_score = CASE WHEN sentiment_score <> 0 THEN abs(sentiment_score) END,
+        sentiment_scoring_version = NULL
+    WHERE id > %(after)s AND id <= %(until)s
+      AND sentiment_processed_at IS NOT NULL
+      AND sentiment_model_label IS NULL
+"""
+
+
+def rescore_chunk(cur, after, until, limit, version=None, stale_only=False, every_row=False, dry_run=False):
+    # Rescores up to `limit` rows with ids in (after, until] with scoring
+    # `version` (default: current). Returns (last id seen, or None when the
+    # range is done, rows scanned, rows whose values changed).
+    target = version or scoring.SCORING_VERSION
+    query = SELECT_SQL.format(filter="" if every_row else STALE if stale_only else OUTDATED)
+    cur.execute(query, {"after": after, "until": until, "limit": limit, "version": target})
+    rows = cur.fetchall()
+    if not rows:
+        return None, 0, 0
+
+    updates = []
+    changed = 0
+    for (article_id, model_label, model_score, image_quality,
+         old_score, old_label, old_virality, old_tags) in rows:
+        polarity, label, virality, tags = scoring.score(model_label, model_score, image_quality, target)
+        if (polarity, label, virality, tags) != (old_score, old_label, old_virality, old_tags or []):
+            changed += 1
+        updates.append((article_id, image_quality, polarity, label, virality, tags, target))
+
+    if not dry_run:
+        execute_values(cur, UPDATE_SQL, updates, template=UPDATE_TEMPLATE, page_size=len(updates))
+    return rows[-1][0], len(rows), changed
+
+
+def rescore_stale(conn, limit=1000):
+    # One chunk of rows marked stale (image quality changed); returns how
+    # many were rescored
+    with conn.cursor() as cur:
+        _, scanned, _ = rescore_chunk(cur, 0, 2 ** 62, limit, stale_only=True)
+    conn.commit()
+    return scanned
+
+
+def id_ranges(jobs):
+    # (after, until] id ranges of about equal width, one per job
+    conn = psycopg2.connect(**DB_PARAMS)
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT COALESCE(MIN(id), 1) - 1, COALESCE(MAX(id), 0) FROM articles")
+            low, high = cur.fetchone()
+    finally:
+        conn.close()
+    step = max(1, -(-(high - low) // jobs))
+    return [(start, min(start + step, high)) for start in range(low, high, step)]
+
+
+def run_range(args, after, until):
+    scanned = changed = 0
+    conn = psycopg2.connect(**DB_PARAMS)
+    try:
+        with conn.cursor() as cur:
+            if args.from_polarity and not args.dry_run:
+                cur.execute(FROM_POLARITY_SQL, {"after": after, "until": until})
+                conn.commit()
+            while after is not None:
+                after, n, c = rescore_chunk(
+                    cur, after, until, args.chunk,
+                    version=args.version, every_row=args.all, dry_run=args.dry_run,
+                )
+                conn.commit()
+                scanned += n
+                changed += c
+    finally:
+        conn.close()
+    return scanned, changed
+
+
+def run(args):
+    if args.version not in scoring.SCORERS:
+        raise SystemExit(f"Unknown scoring version {args.version}; known: {sorted(scoring.SCORERS)}")
+
+    start = time.perf_counter()
+    ranges = id_ranges(args.jobs)
+    with ThreadPoolExecutor(max_workers=args.jobs) as pool:
+        results = list(pool.map(lambda r: run_range(args, *r), ranges))
+    elapsed = time.perf_counter() - start
+
+    scanned = sum(r[0] for r in results)
+    changed = sum(r[1] for r in results)
+    verb = "would change" if args.dry_run else "changed"
+    print(f"🔁 Rescored {scanned} articles with scoring v{args.version} in {elapsed:.1f}s "
+          f"({scanned / max(elapsed, 1e-9):,.0f}/s), {verb} {changed}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recompute sentiment scores from stored model output")
+    parser.add_argument("--version", type=int, default=scoring.SCORING_VERSION)
+    parser.add_argument("--jobs", type=int, default=4, help="parallel connections, one id range each")
+    parser.add_argument("--chunk", type=int, default=5000, help="rows per round trip")
+    parser.add_argument("--all", action="store_true", help="rescore rows already on --version too")
+    parser.add_argument("--from-polarity", action="store_true",
+                        help="first fill in model output for rows analyzed before it was stored")
+    parser.add_argument("--dry-run", action="store_true")
+    run(parser.parse_args())
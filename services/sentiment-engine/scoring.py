@@ -0,0 +1,58 @@
+import os
+
+# Versioned scoring: raw model output (label, score) plus the article's image
+# quality -> (polarity, label, virality, emotion tags). The model output is
+# stored per article, so a new formula needs no inference: add it to SCORERS
+# under the next version number and run recompute.py to backfill.
+
+
+def analyze_virality(sentiment_score, image_quality_score):
+    # Align with spec: abs(sentiment) * image quality bonus
+    # sentiment_score in [-1, 1], image_quality_score in [0, 100]
+    sentiment_strength = min(abs(sentiment_score), 1.0)
+    image_bonus = 0.5 + (max(image_quality_score, 0) / 100.0) * 0.5  # 0.5 -> 1.0
+    score = sentiment_strength * 100 * image_bonus
+    return min(int(score), 100)
+
+def get_sentiment_label(polarity):
+    if polarity > 0.1: return 'POSITIVE'
+    if polarity < -0.1: return 'NEGATIVE'
+    return 'NEUTRAL'
+
+def to_polarity(model_label, model_score):
+    label_raw = (model_label or '').upper()
+    score_raw = float(model_score or 0)
+
+    # Map model label to signed polarity
+    if label_raw.startswith('POS'):
+        return score_raw
+    elif label_raw.startswith('NEG'):
+        return -score_raw
+    return 0.0
+
+def get_emotion_tags(polarity):
+    # Determine emotion tags (simple mapping)
+    emotion_tags = []
+    if polarity > 0.5: emotion_tags.append('joyful')
+    elif polarity < -0.5: emotion_tags.append('angry')
+    return emotion_tags
+
+def score_v1(model_label, model_score, image_quality):
+    polarity = to_polarity(model_label, model_score)
+    return (
+        polarity,
+        get_sentiment_label(polarity),
+        analyze_virality(polarity, image_quality),
+        get_emotion_tags(polarity),
+    )
+
+SCORERS = {
+    1: score_v1,
+}
+
+# Version written by the worker and targeted by recompute.py; pin it to roll
+# a new formula out after the backfill rather than before
+SCORING_VERSION = int(os.getenv("SENTIMENT_SCORING_VERSION", str(max(SCORERS))))
+
+def score(model_label, model_score, image_quality, version=SCORING_VERSION):
+    return SCORERS[version](model_label, model_score, image_quality or 0)
@@ -0,0 +1,113 @@
+import os
+import threading
+import time
+from db import db_connection, wait_for_pool
+
+# Trend engine config
+TREND_INTERVAL_SECONDS = float(os.getenv("TREND_INTERVAL_SECONDS", "60"))
+# Articles folded in per statement; a full batch means more are waiting
+TREND_BATCH_LIMIT = int(os.getenv("TREND_BATCH_LIMIT", "5000"))
+# Clusters need this many articles before a slope is published
+TREND_MIN_ARTICLES = int(os.getenv("TREND_MIN_ARTICLES", "3"))
+
+# Folds newly clustered articles into the per-cluster running sums.
+# Within a batch, y continues each cluster's cumulative count in publish order.
+ACCUMULATE_SQL = """
+    WITH batch AS (
+        SELECT id, cluster_id, extract(epoch FROM COALESCE(published_at, created_at)) AS ts
+        FROM articles
+        WHERE trend_counted_at IS NULL AND cluster_id IS NOT NULL
+        ORDER BY id
+        LIMIT %(limit)s
+        FOR UPDATE SKIP LOCKED
+    ),
+    marked AS (
+        UPDATE articles a
+        SET trend_counted_at = NOW()
+        FROM batch b
+        WHERE a.id = b.id
+    ),
+    ranked AS (
+        SELECT b.cluster_id,
+               b.ts,
+               COALESCE(s.origin_ts, MIN(b.ts) OVER (PARTITION BY b.cluster_id)) AS origin_ts,
+               COALESCE(s.n, 0) + row_number() OVER (PARTITION BY b.cluster_id ORDER BY b.ts, b.id) AS y
+        FROM batch b
+        LEFT JOIN cluster_trend_stats s ON s.cluster_id = b.cluster_id
+    ),
+    points AS (
+        SELECT cluster_id, origin_ts, (ts - origin_ts) / 3600.0 AS x, y
+        FROM ranked
+    ),
+    upserted AS (
+        INSERT INTO cluster_trend_stats AS s (cluster_id, origin_ts, n, sum_x, sum_y, sum_xy, sum_xx, updated_at)
+        SELECT cluster_id, MIN(origin_ts), COUNT(*), SUM(x), SUM(y), SUM(x * y), SUM(x * x), NOW()
+        FROM points
+        GROUP BY cluster_id
+        ON CONFLICT (cluster_id) DO UPDATE
+        SET n = s.n + EXCLUDED.n,
+            sum_x = s.sum_x + EXCLUDED.sum_x,
+            sum_y = s.sum_y + EXCLUDED.sum_y,
+            sum_xy = s.sum_xy + EXCLUDED.sum_xy,
+            sum_xx = s.sum_xx + EXCLUDED.sum_xx,
+            updated_at = NOW()
+        RETURNING s.cluster_id
+    )
+    SELECT (SELECT COUNT(*) FROM batch) AS counted,
+           COALESCE((SELECT array_agg(cluster_id) FROM upserted), '{}') AS clusters
+"""
+
+# Closed-form least-squares slope (articles/hour) for every touched cluster,
+# written in one statement. A zero-variance x gives a flat slope, as before.
+PUBLISH_SQL = """
+    UPDATE clusters c
+    SET trend_slope = t.slope,
+        predicted_growth = t.slope * 24
+    FROM (
+        SELECT cluster_id,
+               COALESCE((n * sum_xy - sum_x * sum_y) / NULLIF(n * sum_xx - sum_x * sum_x, 0), 0) AS slope
+        FROM cluster_trend_stats
+        WHERE cluster_id = ANY(%(clusters)s) AND n >= %(min_articles)s
+    ) AS t
+    WHERE c.id = t.cluster_id
+"""
+
+def update_trends(conn):
+    # One incremental step. Returns (articles folded in, clusters updated).
+    cur = conn.cursor()
+    cur.execute(ACCUMULATE_SQL, {"limit": TREND_BATCH_LIMIT})
+    counted, touched = cur.fetchone()
+    published = 0
+    if touched:
+        cur.execute(PUBLISH_SQL, {"clusters": touched, "min_articles": TREND_MIN_ARTICLES})
+        published = cur.rowcount
+    conn.commit()
+    return counted, published
+
+def run_trend_loop():
+    print(f"📈 Trend engine started (every {TREND_INTERVAL_SECONDS:.0f}s)")
+    wait_for_pool()
+    while True:
+        try:
+            with db_connection() as conn:
+                while True:
+                    started = time.monotonic()
+                    counted, published = update_trends(conn)
+                    if counted:
+                        print(f"📈 Folded {counted} articles into {published} cluster trends "
+                              f"in {time.monotonic() - started:.2f}s")
+                    # Keep draining while there's a backlog (first run, spikes)
+                    if counted < TREND_BATCH_LIMIT:
+                        break
+        except Exception as e:
+            print(f"Trend Analysis Failed: {e}")
+
+        time.sleep(TREND_INTERVAL_SECONDS)
+
+def start_trend_thread():
+    thread = threading.Thread(target=run_trend_loop, name="trend-engine", daemon=True)
+    thread.start()
+    return thread
+
+if __name__ == "__main__":
+    run_trend_loop()
@@ -0,0 +1,108 @@
+"""Translation throughput in articles/sec against the offline stub provider.
+
+Compares the old flow (two blocking provider calls per article, one article
+after another) with the current one: local language ID drops English texts,
+the rest are packed per language and sent TRANSLATION_CONCURRENCY at a time
+under the provider rate limit. The stub charges --latency-ms per request,
+which is what dominates against Google. --english sets the share of
+articles that are English already.
+
+    python bench/bench_translate.py [--articles 200] [--latency-ms 200]
+        [--concurrency 4] [--rate 0] [--duplicates 0.2] [--english 0.5]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(1, os.path.join(os.path.dirname(__file__), "..", ".."))  # pycommon
+
+WORDS = [
+    "правительство", "объявило", "новые", "меры", "поддержки", "экономики",
+    "выборы", "пройдут", "в", "сентябре", "рынок", "акций", "вырос",
+    "погода", "жара", "продлится", "до", "конца", "недели", "спорт",
+]
+ENGLISH_WORDS = [
+    "government", "announces", "new", "measures", "to", "support", "the",
+    "economy", "election", "will", "be", "held", "in", "september", "stock",
+    "market", "rose", "heatwave", "expected", "until", "end", "of", "week",
+]
+
+
+def make_articles(count, duplicates, english, rng):
+    articles = []
+    for i in range(count):
+        if articles and rng.random() < duplicates:
+            # Syndicated copy of an earlier story
+            articles.append(dict(rng.choice(articles), id=i))
+            continue
+        words = ENGLISH_WORDS if rng.random() < english else WORDS
+        title = " ".join(rng.choice(words) for _ in range(rng.randint(6, 12)))
+        snippet = " ".join(rng.choice(words) for _ in range(rng.randint(25, 45)))
+        articles.append({"id": i, "title": title, "snippet": snippet})
+    return articles
+
+
+def counting(provider):
+    calls = [0]
+    translate = provider.translate
+
+    def wrapped(*args, **kwargs):
+        calls[0] += 1
+        return translate(*args, **kwargs)
+
+    provider.translate = wrapped
+    return calls
+
+
+def run_benchmark(args):
+    os.environ["TRANSLATION_PROVIDER"] = "stub"
+    os.environ["TRANSLATION_CONCURRENCY"] = str(args.concurrency)
+    os.environ["TRANSLATION_PROVIDER_RATE"] = str(args.rate)
+    import main
+    from translators import StubTranslator
+
+    StubTranslator.latency = args.latency_ms / 1000.0
+    rng = random.Random(args.seed)
+    articles = make_articles(args.articles, args.duplicates, args.english, rng)
+    main.langid.load_profiles()
+    calls = counting(main.primary)
+
+    start = time.perf_counter()
+    for article in articles:
+        main.translate_text(article["title"])
+        main.translate_text(article["snippet"])
+    legacy = time.perf_counter() - start
+    legacy_calls, calls[0] = calls[0], 0
+
+    start = time.perf_counter()
+    texts = []
+    for article in articles:
+        texts.append(main.normalize_text(article["title"]))
+        texts.append(main.normalize_text(article["snippet"]))
+    unique = list(dict.fromkeys(texts))
+    results, plan = main.route(unique)
+    results.update(main.translate_many(plan))
+    current = time.perf_counter() - start
+    assert len(results) == len(unique)
+
+    print(f"Articles: {len(articles)}  unique texts: {len(unique)} ({len(unique) - len(plan)} English)  latency: {args.latency_ms}ms  "
+          f"concurrency: {args.concurrency}  rate: {args.rate or 'unlimited'}/s")
+    print(f"sequential: {len(articles) / legacy:8.1f} articles/s  {legacy_calls} provider calls")
+    print(f"batched:    {len(articles) / current:8.1f} articles/s  {calls[0]} provider calls  "
+          f"({legacy / current:.1f}x)")
+    main.executor.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Translation provider throughput")
+    parser.add_argument("--articles", type=int, default=200)
+    parser.add_argument("--latency-ms", type=float, default=200)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--rate", type=float, default=0, help="requests/sec per provider, 0 = unlimited")
+    parser.add_argument("--duplicates", type=float, default=0.2)
+    parser.add_argument("--english", type=float, default=0.5)
+    parser.add_argument("--seed", type=int, default=7)
+    run_benchmark(parser.parse_args())
@@ -0,0 +1,41 @@
+import os
+from functools import lru_cache
+
+from langdetect import DetectorFactory, detect_langs
+from langdetect.detector_factory import init_factory
+
+# Same text, same answer on every run (langdetect samples randomly otherwise)
+DetectorFactory.seed = 0
+
+# Confidence needed to skip the provider for English text, and to call it
+# with an explicit source language; anything in between goes out as 'auto'
+ENGLISH_MIN_PROB = float(os.getenv("LANGID_ENGLISH_MIN_PROB", "0.9"))
+FOREIGN_MIN_PROB = float(os.getenv("LANGID_FOREIGN_MIN_PROB", "0.9"))
+CACHE_SIZE = int(os.getenv("LANGID_CACHE_SIZE", "20000"))
+
+
+def load_profiles():
+    # The n-gram profiles load lazily on the first detect; do it once up
+    # front instead of inside the first (possibly concurrent) batch
+    init_factory()
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def classify(text):
+    # (language code, probability) of the most likely language
+    try:
+        best = detect_langs(text)[0]
+        return best.lang, best.prob
+    except Exception:
+        return 'unknown', 0.0
+
+
+def route(text):
+    # (source for the provider, detected language); source is None for
+    # text that is (mostly) English already
+    lang, prob = classify(text)
+    if lang == 'en' and prob >= ENGLISH_MIN_PROB:
+        return None, 'en'
+    if lang not in ('en', 'unknown') and prob >= FOREIGN_MIN_PROB:
+        return lang, lang
+    return 'auto', lang
@@ -1,10 +1,16 @@
 import os
+import socket
 import time
 import psycopg2
 from textblob import TextBlob
-from psycopg2.extras import RealDictCursor
-from deep_translator import GoogleTranslator
-from langdetect import detect
+from psycopg2.extras import RealDictCursor, execute_values
+from concurrent.futures import ThreadPoolExecutor
+import langid
+from pycommon import metrics, profiler
+from pycommon.notify import WorkListener
+from pycommon.text import normalize_text
+from translation_cache import TranslationCache
+from translators import load_providers
 
 # Config
 DB_HOST = os.getenv("DB_HOST", "postgres")
@@ -13,6 +19,41 @@ DB_USER = os.getenv("DB_USER", "news_user")
 DB_PASS = os.getenv("DB_PASS", "news_password")
 DB_PORT = os.getenv("DB_PORT", "5432")
 
+DB_PARAMS = dict(
+    host=DB_HOST,
+    database=DB_NAME,
+    user=DB_USER,
+    password=DB_PASS,
+    port=DB_PORT
+)
+TRANSLATION_CACHE_SIZE = int(os.getenv("TRANSLATION_CACHE_SIZE", "50000"))
+
+# Provider calls
+# google (with MyMemory as fallback) or stub for offline runs. Requests run
+# TRANSLATION_CONCURRENCY at a time, each provider held to
+# TRANSLATION_PROVIDER_RATE requests/sec (bursts of TRANSLATION_PROVIDER_BURST).
+# Texts in the same language are packed into one newline-joined request of
+# up to TRANSLATION_PACK_MAX_CHARS.
+TRANSLATION_PROVIDER = os.getenv("TRANSLATION_PROVIDER", "google")
+TRANSLATION_CONCURRENCY = int(os.getenv("TRANSLATION_CONCURRENCY", "4"))
+PROVIDER_RATE = float(os.getenv("TRANSLATION_PROVIDER_RATE", "5"))
+PROVIDER_BURST = int(os.getenv("TRANSLATION_PROVIDER_BURST", "5"))
+PACK_MAX_CHARS = int(os.getenv("TRANSLATION_PACK_MAX_CHARS", "4500"))
+
+# Leasing
+# Rows are claimed and committed up front, so no locks are held while the
+# providers are called; unfinished leases expire after LEASE_SECONDS
+BATCH_SIZE = int(os.getenv("TRANSLATION_BATCH_SIZE", "20"))
+LEASE_SECONDS = int(os.getenv("TRANSLATION_LEASE_SECONDS", "300"))
+LEASE_OWNER = os.getenv("TRANSLATION_LEASE_OWNER", f"{socket.gethostname()}:{os.getpid()}")
+
+# Idle workers block on LISTEN translation_work and wake on new articles;
+# IDLE_POLL_SECONDS is only the fallback poll interval
+IDLE_POLL_SECONDS = float(os.getenv("TRANSLATION_IDLE_POLL_SECONDS", "60"))
+
+# Connection-level failures; anything else leaves the connection usable
+CONNECTION_ERRORS = (psycopg2.InterfaceError, psycopg2.OperationalError)
+
 class Database:
     def __init__(self):
         self.conn = None
@@ -26,13 +67,7 @@ class Database:
             
         while True:
             try:
-                self.conn = psycopg2.connect(
-                    host=DB_HOST,
-                    database=DB_NAME,
-                    user=DB_USER,
-                    password=DB_PASS,
-                    port=DB_PORT
-                )
+                self.conn = psycopg2.connect(**DB_PARAMS)
                 print("✅ Connected to Database")
                 return self.conn
             except Exception as e:
@@ -40,134 +75,324 @@ class Database:
                 time.sleep(5)
 
     def get_cursor(self):
+        # No health-check round trip; callers reconnect on CONNECTION_ERRORS
         if not self.conn or self.conn.closed:
             self.connect()
-        try:
-            # Check connection health
-            with self.conn.cursor() as cur:
-                cur.execute('SELECT 1')
-            return self.conn.cursor(cursor_factory=RealDictCursor)
-        except (psycopg2.InterfaceError, psycopg2.OperationalError):
-            print("🔄 Connection lost, reconnecting...")
-            self.connect()
-            return self.conn.cursor(cursor_factory=RealDictCursor)
+        return self.conn.cursor(cursor_factory=RealDictCursor)
 
 db = Database()
+cache = TranslationCache(TRANSLATION_CACHE_SIZE)
+primary, fallback = load_providers(TRANSLATION_PROVIDER, PROVIDER_RATE, PROVIDER_BURST)
+executor = ThreadPoolExecutor(max_workers=max(TRANSLATION_CONCURRENCY, 1))
 
-from deep_translator import GoogleTranslator, MyMemoryTranslator
-
-# ... existing code ...
-
-def translate_text(text, target='en'):
-    if not text: return ""
+def translate_text(text, target='en', detected_code=None, source='auto'):
+    # Returns (translated, detected source language); detection runs once
+    # and serves both the mixed-text retry and the language column
+    if not text: return "", None
+    if detected_code is None:
+        detected_code = langid.classify(text)[0]
     
-    # 1. Try Google (Auto)
+    # 1. Try Google (explicit source when language ID is confident)
     try:
-        translated = GoogleTranslator(source='auto', target=target).translate(text)
+        translated = primary.translate(text, source, target)
         
         # Check if translation effectively did nothing but text looks foreign
         # (e.g. "Weather: <Hindi Text>" -> returns "Weather: <Hindi Text>" because 'auto' got confused)
-        if translated == text:
+        if (translated == text and source == 'auto' and detected_code not in ('en', 'unknown')
+                and primary.supports(detected_code)):
             try:
-                # Detect actual language
-                detected_code = detect(text) 
-                if detected_code != 'en':
-                    print(f"  ⚠️ 'Auto' skipped mixed text. Retrying with explicit source='{detected_code}'...")
-                    translated = GoogleTranslator(source=detected_code, target=target).translate(text)
+                print(f"  ⚠️ 'Auto' skipped mixed text. Retrying with explicit source='{detected_code}'...")
+                translated = primary.translate(text, detected_code, target)
             except:
                 pass
                 
-        return translated
+        return translated, detected_code
     except Exception as e:
-        print(f"  ⚠️ Google Translate failed: {e}. Trying Fallback (MyMemory)...")
+        print(f"  ⚠️ {primary.name} failed: {e}. Trying Fallback ({fallback.name})...")
         
     # 2. Try MyMemory (Fallback)
     try:
-        return MyMemoryTranslator(source='auto', target=target).translate(text)
+        return fallback.translate(text, 'auto', target), detected_code
     except Exception as e:
         print(f"  ❌ Fallback failed: {e}")
         raise e
 
-def process_translations():
-    try:
-        cur = db.get_cursor()
-        
-        # CORE AGENDA CHANGE: 
-        # 1. Prioritize sources marked for translation (should_translate = TRUE)
-        # 2. Still process others if identified as non-English, but maybe with lower priority?
-        # User said "Target one particular source... then translate only on that particular source"
-        # So we will ONLY fetch articles from sources with should_translate = TRUE
-        # OR articles that have explicitly been marked as non-English by detection (hybrid)
-        
-        cur.execute("""
-            SELECT a.id, a.title, a.snippet, a.language
+def pack(plan):
+    # plan: {text: (source, detected)}. Requests never mix languages, even
+    # under 'auto', and are filled up to PACK_MAX_CHARS.
+    groups = {}
+    for text, step in plan.items():
+        groups.setdefault(step, []).append(text)
+
+    chunks = []
+    for (source, _), group in groups.items():
+        chunk, size = [], 0
+        for text in group:
+            if chunk and size + len(text) + 1 > PACK_MAX_CHARS:
+                chunks.append((source, chunk))
+                chunk, size = [], 0
+            chunk.append(text)
+            size += len(text) + 1
+        if chunk:
+            chunks.append((source, chunk))
+    return chunks
+
+def translate_chunk(source, chunk, plan, target='en'):
+    # Normalized texts never contain newlines, so a packed request splits
+    # back line for line; if the provider merged or dropped lines (or the
+    # request failed) the chunk is translated one text at a time
+    if len(chunk) > 1:
+        try:
+            lines = primary.translate("\n".join(chunk), source, target).split("\n")
+        except Exception as e:
+            print(f"  ⚠️ Packed request failed: {e}. Translating one by one...")
+            lines = []
+        if len(lines) == len(chunk):
+            results = {}
+            for text, line in zip(chunk, lines):
+                line = line.strip()
+                code = plan[text][1]
+                if line == text and source == 'auto' and code not in ('en', 'unknown') and primary.supports(code):
+                    # Mixed text 'auto' left alone; same retry as translate_text
+                    try:
+                        line = primary.translate(text, code, target)
+                    except:
+                        pass
+                results[text] = (line, code)
+            return results
+
+    results = {}
+    for text in chunk:
+        try:
+            results[text] = translate_text(text, target, plan[text][1], source)
+        except Exception as e:
+            print(f"  ❌ Translation failed: {e}")
+    return results
+
+def route(texts):
+    # Local language ID ahead of any provider call. Returns results for
+    # texts that are English already (left as they are) and a plan of
+    # {text: (source, detected)} for the rest.
+    english = {}
+    plan = {}
+    for text in texts:
+        source, detected = langid.route(text)
+        if source is None:
+            english[text] = (text, detected)
+        else:
+            plan[text] = (source, detected)
+    return english, plan
+
+def translate_many(plan, target='en'):
+    # Provider results for a plan from route(): packed per source language,
+    # sent concurrently
+    results = {}
+    for chunk_results in executor.map(lambda job: translate_chunk(*job, plan, target), pack(plan)):
+        results.update(chunk_results)
+    return results
+
+def translate_batch(conn, texts):
+    # {normalized text: (translated, detected)} for a batch of unique texts.
+    # English texts stop at language ID, known ones come from the cache;
+    # only the rest reach the provider.
+    with metrics.timed('langid'):
+        results, plan = route(texts)
+    english = len(results)
+    # Cached per routed source, so a text sent as 'auto' and the same text
+    # sent with an explicit language are separate entries
+    sources = {text: source for text, (source, _) in plan.items()}
+    cached = cache.get_many(conn, sources)
+    # End the read's transaction; none is held through the provider calls
+    conn.commit()
+    metrics.count_cache('translation', len(cached), len(plan) - len(cached))
+    results.update(cached)
+    with metrics.timed('translate'):
+        fresh = translate_many({text: step for text, step in plan.items() if text not in cached})
+    cache.put_many(conn, fresh, sources)
+    results.update(fresh)
+    print(f"  🗃️ {len(texts)} unique texts, {english} English, {len(cached)} cached, {len(fresh)} translated")
+    return results
+
+def claim_batch(cur):
+    # Lease a batch and return it. Rows are picked as before:
+    # 1. Sources marked for translation (should_translate = TRUE)
+    # 2. Articles already detected as non-English but not yet translated
+    # Expired leases, and our own from before a reconnect, are fair game.
+    cur.execute("""
+        UPDATE articles AS a
+        SET translation_leased_at = NOW(),
+            translation_lease_owner = %s
+        FROM (
+            SELECT a.id
             FROM articles a
             JOIN sources s ON a.source_id = s.id
-            WHERE 
-                (s.should_translate = TRUE AND a.language IS NULL)
-                OR 
-                (a.language != 'en' AND a.original_title IS NULL AND a.language IS NOT NULL)
+            WHERE a.original_title IS NULL
+              AND ((s.should_translate = TRUE AND a.language IS NULL)
+                   OR a.language != 'en')
+              AND (a.translation_leased_at IS NULL
+                   OR a.translation_leased_at < NOW() - make_interval(secs => %s)
+                   OR a.translation_lease_owner = %s)
             ORDER BY a.created_at DESC 
-            LIMIT 20
-            FOR UPDATE SKIP LOCKED
-        """)
-        articles = cur.fetchall()
+            LIMIT %s
+            FOR UPDATE OF a SKIP LOCKED
+        ) AS claimed
+        WHERE a.id = claimed.id
+        RETURNING a.id, a.title, a.snippet, a.language, a.created_at
+    """, (LEASE_OWNER, LEASE_SECONDS, LEASE_OWNER, BATCH_SIZE))
+    return cur.fetchall()
+
+def build_update(article, results):
+    # Row for write_results, or None if a text has no translation
+    text_title = article['title'] or ""
+    text_snippet = article['snippet'] or ""
+    title_key = normalize_text(text_title)
+    snippet_key = normalize_text(text_snippet)
+    for key in (title_key, snippet_key):
+        if key and key not in results:
+            return None
+
+    translated_title, detected_lang = results.get(title_key, ("", None))
+    translated_snippet = results.get(snippet_key, ("", None))[0]
+
+    if translated_title and translated_title != title_key:
+        # Language of the ORIGINAL title, for record keeping
+        return (article['id'], LEASE_OWNER, True, detected_lang or 'unknown',
+                text_title, text_snippet, translated_title, translated_snippet)
+    # It was likely already English or failed to change
+    return (article['id'], LEASE_OWNER, False, 'en', None, None, None, None)
+
+WRITE_SQL = """
+    UPDATE articles AS a
+    SET language = v.language,
+        original_title = CASE WHEN v.translated THEN v.original_title ELSE a.original_title END,
+        original_snippet = CASE WHEN v.translated THEN v.original_snippet ELSE a.original_snippet END,
+        title = CASE WHEN v.translated THEN v.title ELSE a.title END,
+        snippet = CASE WHEN v.translated THEN v.snippet ELSE a.snippet END,
+        translation_leased_at = NULL,
+        translation_lease_owner = NULL
+    FROM (VALUES %s) AS v (id, lease_owner, translated, language, original_title, original_snippet, title, snippet)
+    WHERE a.id = v.id
+      AND a.translation_lease_owner = v.lease_owner
+"""
+WRITE_TEMPLATE = "(%s::bigint, %s, %s::boolean, %s, %s, %s, %s, %s)"
+
+def write_results(cur, updates):
+    # One UPDATE ... FROM (VALUES ...) for the batch. If it fails (e.g. one
+    # bad value), rows are retried one by one under savepoints so the rest
+    # still land. Rows whose lease was lost are left alone.
+    # Returns the ids that could not be written.
+    cur.execute("SAVEPOINT write_batch")
+    try:
+        execute_values(cur, WRITE_SQL, updates, template=WRITE_TEMPLATE, page_size=len(updates))
+        cur.execute("RELEASE SAVEPOINT write_batch")
+        return []
+    except CONNECTION_ERRORS:
+        raise
+    except psycopg2.Error as e:
+        print(f"  ⚠️ Bulk update failed ({e}). Writing rows one by one...")
+        cur.execute("ROLLBACK TO SAVEPOINT write_batch")
+
+    failed = []
+    for update in updates:
+        cur.execute("SAVEPOINT write_row")
+        try:
+            execute_values(cur, WRITE_SQL, [update], template=WRITE_TEMPLATE)
+            cur.execute("RELEASE SAVEPOINT write_row")
+        except CONNECTION_ERRORS:
+            raise
+        except psycopg2.Error as e:
+            print(f"  ❌ Failed to process {update[0]}: {e}")
+            cur.execute("ROLLBACK TO SAVEPOINT write_row")
+            failed.append(update[0])
+    return failed
+
+def release_leases(cur, ids):
+    if not ids:
+        return
+    cur.execute("""
+        UPDATE articles
+        SET translation_leased_at = NULL,
+            translation_lease_owner = NULL
+        WHERE id = ANY(%s) AND translation_lease_owner = %s
+    """, (ids, LEASE_OWNER))
+
+def process_translations():
+    # Returns the number of articles written (0 when there is no work or
+    # nothing could be written, so failing rows don't spin the loop)
+    try:
+        cur = db.get_cursor()
+
+        # Claim and commit right away so no row locks are held during the
+        # (slow) provider calls
+        with metrics.timed('claim'):
+            articles = claim_batch(cur)
+            db.conn.commit()
         
         if not articles:
-            time.sleep(5) # Sleep longer if no priority work
-            return
+            return 0
 
+        metrics.observe_batch('translation', len(articles))
+        created = [article['created_at'] for article in articles if article['created_at']]
+        if created:
+            metrics.observe_lag('translation', time.time() - min(created).timestamp())
         print(f"🌍 Translating batch of {len(articles)} targeted articles...")
-        
+
+        try:
+            # Identical titles/snippets (syndicated stories) are translated once
+            texts = []
+            for article in articles:
+                texts.append(normalize_text(article['title'] or ""))
+                texts.append(normalize_text(article['snippet'] or ""))
+            results = translate_batch(db.conn, [t for t in dict.fromkeys(texts) if t])
+            db.conn.commit()
+        except CONNECTION_ERRORS:
+            raise
+        except Exception:
+            # Hand the rows back rather than waiting out the lease
+            db.conn.rollback()
+            release_leases(cur, [article['id'] for article in articles])
+            db.conn.commit()
+            raise
+
+        updates = []
+        failed = []
         for article in articles:
-            try:
-                # If source is forced, we assume it NEEDS translation or at least checking
-                # We can still detect to be safe
-                text_title = article['title'] or ""
-                text_snippet = article['snippet'] or ""
-                
-                # Perform Translation
-                print(f"  📝 Translating {article['id']}...")
-                
-                translated_title = translate_text(text_title)
-                translated_snippet = translate_text(text_snippet)
-                
-                # Detect language of ORIGINAL text for record keeping
-                try:
-                    detected_lang = detect(text_title)
-                except:
-                    detected_lang = 'unknown'
-
-                if translated_title and translated_title != text_title:
-                    # Update DB
-                    cur.execute("""
-                        UPDATE articles 
-                        SET language = %s,
-                            original_title = %s,
-                            original_snippet = %s,
-                            title = %s,
-                            snippet = %s
-                        WHERE id = %s
-                    """, (detected_lang, text_title, text_snippet, translated_title, translated_snippet, article['id']))
-                else:
-                    # It was likely already English or failed to change
-                    cur.execute("UPDATE articles SET language = 'en' WHERE id = %s", (article['id'],))
-                    
-            except Exception as e:
-                print(f"  ❌ Failed to process {article['id']}: {e}")
-                db.conn.rollback() 
-                
-        db.conn.commit()
-        print("✅ Batch complete.")
+            update = build_update(article, results)
+            if update is None:
+                print(f"  ❌ Failed to process {article['id']}: translation unavailable")
+                failed.append(article['id'])
+            else:
+                updates.append(update)
+
+        with metrics.timed('db_write'):
+            if updates:
+                failed += write_results(cur, updates)
+            release_leases(cur, failed)
+            db.conn.commit()
+        print(f"✅ Batch complete ({len(articles) - len(failed)} written, {len(failed)} failed).")
         cur.close()
-        
+        return len(articles) - len(failed)
+
+    except CONNECTION_ERRORS as e:
+        print(f"🔄 Connection lost, reconnecting... ({e})")
+        db.connect()
     except Exception as e:
         print(f"Worker Failed: {e}")
-        # ... error handling
+        try:
+            db.conn.rollback()
+        except Exception:
+            pass
+        time.sleep(5)
+    return 0
 
 if __name__ == "__main__":
     print("🚀 Translation Engine Started (v3 - Cleaned)...")
+    metrics.serve()
+    profiler.install('translation-engine')
+    langid.load_profiles()
     db.connect()
+    listener = WorkListener("translation_work", **DB_PARAMS)
     while True:
-        process_translations()
-        time.sleep(1)
+        # Keep draining while there is work, then wait for a notification
+        if not process_translations():
+            listener.wait(IDLE_POLL_SECONDS)
@@ -0,0 +1,87 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+from psycopg2.extras import execute_values
+
+
+# Translation results keyed by (normalized text, source lang, target lang).
+# An in-process LRU sits in front of the translation_cache table; values are
+# (translated text, detected source language).
+class TranslationCache:
+    def __init__(self, max_entries=50000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.db_hits = 0
+        self.misses = 0
+
+    def key(self, text, source, target):
+        return hashlib.sha256(f"{source}\0{target}\0{text}".encode("utf-8")).digest()
+
+    def _remember(self, key, value):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get_many(self, conn, sources, target="en"):
+        # sources: {text: source language it is routed with ('auto' or a
+        # langdetect code)}. Returns {text: (translated, detected)} for every
+        # text we already know; one round trip for whatever the LRU doesn't have
+        found = {}
+        wanted = {}
+        with self._lock:
+            for text, source in sources.items():
+                key = self.key(text, source, target)
+                value = self._entries.get(key)
+                if value is not None:
+                    self._entries.move_to_end(key)
+                    found[text] = value
+                    self.hits += 1
+                else:
+                    wanted[key] = text
+
+        if wanted:
+            with conn.cursor() as cur:
+                cur.execute(
+                    "SELECT key, translated, detected_lang FROM translation_cache WHERE key = ANY(%s)",
+                    ([bytes(k) for k in wanted],)
+                )
+                rows = cur.fetchall()
+            with self._lock:
+                for key, translated, detected in rows:
+                    key = bytes(key)
+                    self._remember(key, (translated, detected))
+                    found[wanted[key]] = (translated, detected)
+                self.db_hits += len(rows)
+                self.misses += len(wanted) - len(rows)
+        return found
+
+    def put_many(self, conn, results, sources, target="en"):
+        # results: {text: (translated, detected)}; sources as for get_many
+        if not results:
+            return
+        rows = []
+        with self._lock:
+            for text, (translated, detected) in results.items():
+                source = sources[text]
+                key = self.key(text, source, target)
+                self._remember(key, (translated, detected))
+                rows.append((key, source, target, translated, detected))
+        with conn.cursor() as cur:
+            execute_values(cur, """
+                INSERT INTO translation_cache (key, source_lang, target_lang, translated, detected_lang)
+                VALUES %s
+                ON CONFLICT (key) DO NOTHING
+            """, rows)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "db_hits": self.db_hits,
+                "misses": self.misses,
+            }
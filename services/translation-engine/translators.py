@@ -0,0 +1,115 @@
+import threading
+import time
+
+from deep_translator import GoogleTranslator, MyMemoryTranslator
+from deep_translator.constants import GOOGLE_LANGUAGES_TO_CODES, MY_MEMORY_LANGUAGES_TO_CODES
+
+from pycommon import metrics
+
+
+# Token bucket shared by every thread calling one provider
+class RateLimiter:
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        if self.rate <= 0:
+            return
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+# Offline stand-in with the deep_translator interface, for benchmarks and
+# local runs (TRANSLATION_PROVIDER=stub). Charges a fixed round trip per call
+# plus a per-character cost, and marks non-ASCII text as translated.
+class StubTranslator:
+    latency = 0.2
+    per_char = 0.0
+
+    def __init__(self, source='auto', target='en'):
+        self.source = source
+        self.target = target
+
+    def translate(self, text):
+        time.sleep(self.latency + self.per_char * len(text))
+        return "\n".join(
+            line if line.isascii() else f"[{self.target}] {line}"
+            for line in text.split("\n")
+        )
+
+
+# langdetect codes a provider may only know under another one
+# (Google still calls Hebrew 'iw'; MyMemory has Norwegian as 'nb-NO')
+ALIASES = {'he': ('iw',), 'no': ('nb',)}
+
+
+def _bare(code):
+    return code.split('-')[0].lower()
+
+
+# A translation backend plus the rate limit it is called under. Languages
+# come in as langdetect codes ('zh-cn', 'he') and go out in the provider's
+# own (`codes`; None passes them through): exact matches first, then by bare
+# language for region-qualified codes like MyMemory's 'fr-FR'.
+class Provider:
+    def __init__(self, name, factory, rate, burst, codes=None):
+        self.name = name
+        self.factory = factory
+        self.limiter = RateLimiter(rate, burst)
+        self.codes = None
+        if codes is not None:
+            self.codes = {}
+            codes = list(codes)
+            for code in codes:
+                self.codes.setdefault(code.lower(), code)
+            # 'fr' is 'fr-FR' rather than whichever 'fr-*' comes first
+            home = [code for code in codes if code.lower() == f"{_bare(code)}-{_bare(code)}"]
+            for code in home + codes:
+                self.codes.setdefault(_bare(code), code)
+
+    def code(self, lang):
+        # The provider's code for a langdetect code, None if it has none
+        if self.codes is None:
+            return lang
+        for candidate in (lang,) + ALIASES.get(lang, ()):
+            code = self.codes.get(candidate.lower())
+            if code:
+                return code
+        return None
+
+    def supports(self, lang):
+        return self.code(lang) is not None
+
+    def translate(self, text, source='auto', target='en'):
+        # A source the provider doesn't know is left to its own detection
+        if source != 'auto':
+            source = self.code(source) or 'auto'
+        target = self.code(target) or target
+        self.limiter.acquire()
+        with metrics.timed(f"provider_{self.name}"):
+            return self.factory(source=source, target=target).translate(text)
+
+
+def load_providers(name, rate, burst):
+    # (primary, fallback) for TRANSLATION_PROVIDER
+    if name == 'stub':
+        stub = Provider('stub', StubTranslator, rate, burst)
+        return stub, stub
+    if name == 'google':
+        return (
+            Provider('google', GoogleTranslator, rate, burst, GOOGLE_LANGUAGES_TO_CODES.values()),
+            Provider('mymemory', MyMemoryTranslator, rate, burst, MY_MEMORY_LANGUAGES_TO_CODES.values()),
+        )
+    raise ValueError(f"Unknown translation provider: {name}")